@@ -0,0 +1,5 @@
+import time
+
+# when the first autobot module was imported; run_bot.py measures its
+# startup time, imports included, from here
+STARTED = time.perf_counter()
@@ -1,21 +1,39 @@
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
+from contextlib import nullcontext
 from dataclasses import dataclass
 from operator import attrgetter
-from typing import Any
-import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 import re
+import threading
 import time
 
+from autobot.checkpoint import Checkpoint
 from autobot.config import Settings
-from autobot.models import Activity, DataStore, Submission
-from autobot.util.messages.templater import MessageBuilder
-from autobot.util.reddit_util import SubredditTool
+from autobot.leader import Lease, NotLeader
+from autobot.metrics import (
+    ActionSLO, cycle_api_calls, cycle_interval_seconds, last_cycle_seconds,
+    timed
+)
+from autobot.models import (
+    Activity, DataStore, PostVolume, SeenFilter, Submission
+)
+from autobot.profiling import CycleProfiler
+from autobot.util.gate import IdleGate
+from autobot.util.messages.templater import MessageBuilder, SubredditMessages
+from autobot.util.scope import spending
 
 from prometheus_client import Counter
-import praw
 import redis
 import structlog
 
+if TYPE_CHECKING:
+    # praw (and requests under it) takes a while to import; run_bot.py
+    # does that on a warm-up thread while it's waiting on Redis and Mako
+    import praw
+
+    from autobot.util.reddit_util import SubredditTool
+
 
 run_counter = Counter("scans", "Number of times bot has scanned for posts")
 post_counter = Counter("posts_processed", "Number of posts processed")
@@ -54,6 +72,15 @@ class PostMetadata:
         )
         return any(bad_things)
 
+    def broken_rules(self) -> list[str]:
+        rules = {
+            "long_paragraphs": self.has_long_paragraphs,
+            "codeblocks": self.has_codeblocks,
+            "nsfw_title": self.has_nsfw_title,
+            "invalid_tags": self.invalid_tags,
+        }
+        return [r for r, broken in rules.items() if broken]
+
     def is_serial(self) -> bool:
         return self.is_series or self.is_final
 
@@ -146,7 +173,8 @@ class PostAnalyzer:
                 return True
         return False
 
-    def analyze(self, post: praw.models.Submission) -> PostMetadata:
+    @timed("analyzer")
+    def analyze(self, post: "praw.models.Submission") -> PostMetadata:
         paragraphs = re.split(r"(?:\n\s*\n|[ \t]{2,}\n|\t\n)", post.selftext)
         series, final, bad_tags = self.categorize_tags(post.title)
         if not series:
@@ -165,42 +193,147 @@ class PostAnalyzer:
         return meta
 
 
+class ModeratedSubreddit:
+    """One subreddit's settings, analyzer and Redis keyspace."""
+
+    def __init__(
+        self,
+        cfg: Settings,
+        db: redis.Redis,
+        *,
+        legacy_keys: bool = False
+    ) -> None:
+        self.name = cfg.subreddit
+        self.cfg = cfg
+        self.post_db = DataStore(
+            db, Submission, cfg.subreddit, legacy=legacy_keys
+        )
+        self.activity_db = DataStore(
+            db, Activity, cfg.subreddit, legacy=legacy_keys
+        )
+        self.volume = PostVolume(
+            db, cfg.subreddit, retention=cfg.post_volume_retention
+        )
+        if legacy_keys:
+            moved = (
+                self.post_db.migrate_legacy()
+                + self.activity_db.migrate_legacy()
+            )
+            if moved:
+                logger.info(
+                    "Moved legacy keys to the subreddit's namespace",
+                    subreddit=self.name,
+                    moved=moved
+                )
+        self.analyzer = PostAnalyzer(cfg.series_flair_name)
+        self.cache_ttl = cfg.post_timelimit * 2
+        # answers "never seen" for most new posts without a Redis lookup
+        self.seen: SeenFilter | None = None
+        if cfg.seen_filter:
+            self.seen = SeenFilter(
+                self.post_db,
+                cfg.subreddit,
+                window=self.cache_ttl,
+                capacity=cfg.seen_filter_capacity,
+                fp_rate=cfg.seen_filter_fp_rate,
+                partitions=cfg.seen_filter_partitions,
+                snapshot_interval=cfg.seen_filter_snapshot_interval
+            )
+
+
 class AutoBot:
+    """Moderates every subreddit in `cfg.subreddits()`. They share one
+    SubredditTool, which reads a single combined /new listing and search
+    per cycle; each post is handled with its own subreddit's settings."""
+
     def __init__(
-        self, cfg: Settings, db: redis.Redis, msg_builder: MessageBuilder
+        self,
+        cfg: Settings,
+        db: redis.Redis,
+        msg_builder: MessageBuilder,
+        reddit: "SubredditTool | None" = None,
+        clock: Callable[[], float] = time.time,
+        lease: Lease | None = None,
+        gate: IdleGate | None = None,
     ):
         self.cfg = cfg
-        self.post_db = DataStore(db, Submission)
-        self.activity_db = DataStore(db, Activity)
+        self.clock = clock
+        # keys from before subreddits were namespaced belong to the one
+        # subreddit the bot used to run
+        self.subreddits = {
+            name.lower(): ModeratedSubreddit(
+                cfg.for_subreddit(name), db, legacy_keys=(i == 0)
+            )
+            for i, name in enumerate(cfg.subreddits())
+        }
         self.msg_bld = msg_builder
-        self.reddit = SubredditTool(cfg)
-        self.analyzer = PostAnalyzer(cfg.series_flair_name)
-        self.cache_ttl = cfg.post_timelimit * 2
-        self.series_flair_name = cfg.series_flair_name
+        # lowercased subreddit name -> its messages; built on first use
+        # so they come from the SubredditTool in place by then
+        self.messages: dict[str, SubredditMessages] = {}
+        if reddit is None:
+            from autobot.util.reddit_util import SubredditTool
+
+            reddit = SubredditTool(cfg, db, gate=gate)
+        self.reddit = reddit
+        # other threads sharing the Reddit client (the report service in
+        # the combined runtime) wait while a cycle runs
+        self.gate = gate
         self.latest_post = None
+        # the /new cursor and the actions taken on the post being handled,
+        # which the first cycle as leader resumes from
+        self.checkpoint = Checkpoint(
+            db, cfg.subreddit, fence=lease.check if lease else None
+        )
+        self.resume_pending = True
+        # set by `stop`; the bot finishes the post in hand and returns
+        self.stopping = threading.Event()
+        self.stop_requested: float | None = None
+        # with a lease, only the instance holding it moderates and every
+        # side effect is fenced by its token; the others stand by
+        self.lease = lease
+        self.lease_poll = cfg.leader_poll_interval
+        if lease:
+            self.reddit.fence = lease.check
+        self.profiler: CycleProfiler | None = None
+        # called once, on the first pass through `run`, before this
+        # instance tries for the lease; a standby may wait much longer
+        self.on_started: Callable[[], object] | None = None
+        self.slo = ActionSLO(
+            cfg.action_latency_target,
+            cfg.action_latency_objective,
+            cfg.action_slo_window,
+            clock=clock,
+        )
 
-    def reject_by_timelimit(self, post: praw.models.Submission) -> bool:
+    def subreddit_for(
+        self,
+        post: "praw.models.Submission"
+    ) -> ModeratedSubreddit | None:
+        return self.subreddits.get(post.subreddit.display_name.lower())
+
+    def reject_by_timelimit(self, post: "praw.models.Submission") -> bool:
         """Determine if a submission should be removed based on a time-limit
         for submissions for a subreddit.
 
         If a post is rejected, add a comment to the post."""
-        if not self.cfg.enforce_timelimit:
+        sub = self.subreddit_for(post)
+        if not sub or not sub.cfg.enforce_timelimit:
             return False
 
-        now = int(time.time())
-        if (now - post.created_utc) > self.cfg.post_timelimit:
+        now = int(self.clock())
+        if (now - post.created_utc) > sub.cfg.post_timelimit:
             return False
 
         rejected = False
         # look in the cache to see if this user has recent activity
-        act = self.activity_db.get(post.author.name)
+        act = sub.activity_db.get(post.author.name)
         if (
             act
             and act.last_post_id != post.id
             and not self.reddit.is_post_deleted(act.last_post_id)
         ):
             td = post.created_utc - int(act.last_post_time.timestamp())
-            allowed_when = self.cfg.post_timelimit - td
+            allowed_when = sub.cfg.post_timelimit - td
             if allowed_when > 0:
                 rejected = True
                 human_fmt = englishify_time(allowed_when)
@@ -217,71 +350,128 @@ class AutoBot:
                 logger.info(
                     "Rejecting post and notifying author", **log_params
                 )
-                msg = self.msg_bld.create_post_a_day_msg(
+                msgs = self.messages_for(sub.name)
+                msg = msgs.builder.create_post_a_day_msg(
                     post.shortlink,
                     human_fmt,
-                    self.reddit.create_modmail_link(),
+                    msgs.modmail_link,
+                )
+                self._act(
+                    post, "comment", self.reddit.add_comment,
+                    post, msg, distinguish=True
                 )
-                self.reddit.add_comment(post, msg, distinguish=True)
                 delete_counter.inc()
-                self.reddit.delete_post(post)
+                self._act(
+                    post, "remove", self.reddit.delete_post, post,
+                    slo=["timelimit"]
+                )
 
         return rejected
 
-    def gen_series_reminder(self, post: praw.models.Submission) -> str:
-        q = {
-            "to": "UpdateMeBot",
-            "subject": "Subscribe",
-            "message": (
-                "SubscribeMe! "
-                f"/r/{self.reddit.subreddit_name()} /u/{post.author}"
-            ),
-        }
-        sub_url = self.reddit.gen_compose_url(q)
-        return self.msg_bld.create_series_comment(sub_url)
-
-    def prepare_delete_message(
-        self, post: praw.models.Submission, post_meta: PostMetadata
-    ) -> str:
-
-        modmail_link = self.reddit.create_modmail_link()
-
-        if post_meta.invalid_tags:
-            reapproval_msg = self.msg_bld.create_title_approval_msg(
-                post.shortlink
+    def _act(
+        self,
+        post: "praw.models.Submission",
+        action: str,
+        method: Callable[..., Any],
+        *args: Any,
+        slo: Iterable[str] | None = None,
+        **kwargs: Any
+    ) -> None:
+        """Takes one action on a post being handled and records it in the
+        checkpoint, unless it was already taken before a restart. With
+        `slo`, the rules that caused it, its latency is recorded once it
+        has succeeded."""
+        if self.checkpoint.done(post.id, action):
+            logger.info(
+                "Skipping action taken before restart",
+                action=action,
+                post_id=post.id
             )
-        else:
-            reapproval_msg = self.msg_bld.create_approval_msg(post.shortlink)
+            return
+        method(*args, **kwargs)
+        self.checkpoint.step(post.id, action)
+        if slo is not None:
+            self._observe(action, post.created_utc, slo)
+
+    def _observe(
+        self,
+        action: str,
+        created: float,
+        rules: Iterable[str]
+    ) -> None:
+        """Records an action's latency against the SLO, unless nothing was
+        actually done because the bot is read-only."""
+        if not self.reddit.read_only:
+            self.slo.observe(action, created, rules)
+
+    def messages_for(self, name: str) -> SubredditMessages:
+        """The messages for subreddit `name`, in any case: callers pass
+        either the configured name or a post's display name."""
+        key = name.lower()
+        msgs = self.messages.get(key)
+        if msgs is None:
+            sub = self.subreddits.get(key)
+            # the configured name, so the messages don't depend on which
+            # spelling asked first
+            name = sub.name if sub else name
+            cfg = sub.cfg if sub else None
+            template_dir = cfg.template_dir if cfg else None
+            builder = self.msg_bld.for_subreddit(
+                name,
+                Path(template_dir) if template_dir else None,
+                rules_url=cfg.rules_url if cfg else None,
+                guide_links=cfg.guide_links if cfg else None
+            )
+            msgs = SubredditMessages(builder, self.reddit, name)
+            self.messages[key] = msgs
+        return msgs
 
-        reapproval_link = self.reddit.create_modmail_link(
-            "Please reapprove submission", reapproval_msg
-        )
+    def gen_series_reminder(self, post: "praw.models.Submission") -> str:
+        msgs = self.messages_for(post.subreddit.display_name)
+        return msgs.series_reminder(post.author)
 
-        return self.msg_bld.create_deleted_post_msg(
+    def prepare_delete_message(
+        self, post: "praw.models.Submission", post_meta: PostMetadata
+    ) -> str:
+        msgs = self.messages_for(post.subreddit.display_name)
+        return msgs.builder.create_deleted_post_msg(
             post.shortlink,
-            modmail_link=modmail_link,
-            reapproval_modmail=reapproval_link,
+            modmail_link=msgs.modmail_link,
+            reapproval_modmail=msgs.reapproval_link(
+                post.shortlink, title=bool(post_meta.invalid_tags)
+            ),
             has_nsfw_title=post_meta.has_nsfw_title,
             has_codeblocks=post_meta.has_codeblocks,
             long_paragraphs=post_meta.has_long_paragraphs,
             invalid_tags=post_meta.bad_tags(),
         )
 
-    def post_series_reminder(self, submission: praw.models.Submission) -> None:
+    def post_series_reminder(
+        self,
+        submission: "praw.models.Submission"
+    ) -> None:
         """Convenience method that posts the 'this is a series' comment
         on submissions."""
         series_comment = self.gen_series_reminder(submission)
         self.reddit.post_series_reminder(submission, series_comment)
+        self._observe("series_comment", submission.created_utc, ["series"])
 
-    def send_series_pm(self, submission: praw.models.Submission) -> None:
+    def send_series_pm(self, submission: "praw.models.Submission") -> None:
         """Convenience method that DMs an author the series reminder text."""
-        msg = self.msg_bld.create_series_msg(submission.shortlink)
+        msgs = self.messages_for(submission.subreddit.display_name)
+        msg = msgs.builder.create_series_msg(submission.shortlink)
         self.reddit.send_series_pm(submission, msg)
 
-    def cache_activity_maybe(self, submission: praw.models.Submission) -> None:
+    def cache_activity_maybe(
+        self,
+        submission: "praw.models.Submission"
+    ) -> None:
+        sub = self.subreddit_for(submission)
+        if not sub:
+            return
         # only store activity if the post was created in the timelimit
-        tl = self.cfg.post_timelimit
-        now = int(time.time())
+        tl = sub.cfg.post_timelimit
+        now = int(self.clock())
         if (diff := now - submission.created_utc) < tl:
             activity = Activity(
                 author=submission.author.name,
@@ -291,7 +481,7 @@ class AutoBot:
             )
             ttl = tl - int(diff)
             logger.info("Caching activity", info=activity, ttl=ttl)
-            self.activity_db.persist(activity.author, activity, ttl=ttl)
+            sub.activity_db.persist(activity.author, activity, ttl=ttl)
         else:
             logger.info(
                 "Not caching activity for post outside timelimit",
@@ -300,6 +490,37 @@ class AutoBot:
                 id=submission.id,
             )
 
+    def _route(
+        self,
+        posts: Iterable["praw.models.Submission"]
+    ) -> list[tuple["praw.models.Submission", ModeratedSubreddit, Any]]:
+        """Pairs each post with its subreddit and cached Submission (if
+        any), keeping the posts' order. Each subreddit's cache is read in
+        one round trip, for just the posts its seen filter may have seen."""
+        routed = []
+        for p in posts:
+            # prevention for issue 102
+            if (sub := self.subreddit_for(p)) is None:
+                logger.warn(
+                    "Found post from other subreddit!",
+                    subreddit=p.subreddit.display_name,
+                    submission=p.id,
+                )
+                continue
+            routed.append((p, sub))
+
+        cached: dict[str, Submission | None] = {}
+        for sub in self.subreddits.values():
+            ids = [p.id for p, s in routed if s is sub]
+            if sub.seen:
+                ids = sub.seen.maybe_seen(ids)
+            found = list(sub.post_db.get_many(ids))
+            if sub.seen:
+                sub.seen.false_positives(found.count(None))
+            cached.update(zip(ids, found))
+        return [(p, sub, cached.get(p.id)) for p, sub in routed]
+
+    @timed("cycle")
     def process_previous(self):
         # for all submissions, check to see if any of them should be rejected
         # based on the time limit.
@@ -316,9 +537,9 @@ class AutoBot:
             posts_found=len(posts),
         )
 
-        cached_res = self.post_db.get_many([p.id for p in posts])
-
-        for p, cached in zip(posts, cached_res):
+        for p, sub, cached in self._route(posts):
+            if self.stopping.is_set():
+                break
             if not cached:
                 logger.info("Skipping unprocessed post", submission=p.id)
                 continue
@@ -340,7 +561,7 @@ class AutoBot:
                 try:
                     if (
                         p.link_flair_css_class.lower()
-                        == self.cfg.series_flair_name.lower()
+                        == sub.cfg.series_flair_name.lower()
                     ):
                         logger.info(
                             "Post was flaired 'Series' after the fact. Posting message",
@@ -352,10 +573,13 @@ class AutoBot:
 
                         cached.series = True
                         cached.sent_series_pm = True
-                        self.post_db.update(cached.id, cached)
+                        sub.post_db.update(
+                            cached.id, cached, ttl=sub.cache_ttl
+                        )
                 except AttributeError:
                     pass
 
+    @timed("cycle")
     def fetch_new(self) -> None:
         """This method uses the subreddit/new API to get new submissions.
         /new has submissions immediately upon posting, so this endpoint is
@@ -365,25 +589,45 @@ class AutoBot:
             self.reddit.retrieve_new_posts(before=self.latest_post),
             key=attrgetter("created_utc"),
         )
-        cached_res = self.post_db.get_many([s.id for s in listing])
-        for s, cached in zip(listing, cached_res):
-            if cached:
-                logger.debug("Skipping previously seen post", submission=s.id)
-                continue
+        try:
+            self._process_listing(self._route(listing))
+        finally:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered post volume counts and the /new cursor, and
+        the seen filters when they're due or the bot is stopping."""
+        saved = True
+        for sub in self.subreddits.values():
+            sub.volume.flush()
+            if sub.seen:
+                saved &= sub.seen.snapshot(force=self.stopping.is_set())
+        latest = self.latest_post
+        self.checkpoint.save(
+            latest.id if latest is not None else None, clear=saved
+        )
 
-            # prevention for issue 102
-            if s.subreddit.display_name != self.reddit.subreddit_name():
-                logger.warn(
-                    "Found post from other subreddit!",
-                    subreddit=s.subreddit.display_name,
-                    submission=s.id,
+    def _process_listing(
+        self,
+        routed: Iterable[
+            tuple["praw.models.Submission", ModeratedSubreddit, Any]
+        ]
+    ) -> None:
+        for s, moderated, cached in routed:
+            if self.stopping.is_set():
+                logger.info(
+                    "Stopping, leaving the rest of /new for the next start"
                 )
+                break
+            if cached:
+                logger.debug("Skipping previously seen post", submission=s.id)
                 continue
 
+            cfg = moderated.cfg
             # filter for issue 119
-            if self.cfg.ignore_old_posts:
-                now = int(time.time())
-                if (now - s.created_utc) > self.cfg.ignore_older_than:
+            if cfg.ignore_old_posts:
+                now = int(self.clock())
+                if (now - s.created_utc) > cfg.ignore_older_than:
                     logger.info("Ignoring older /new post", submission=s.id)
                     continue
 
@@ -391,12 +635,14 @@ class AutoBot:
                 id=s.id, author=s.author.name, submitted=s.created_utc
             )
             extra_log: dict[str, Any] = {}
+            self.checkpoint.begin(s.id)
 
             if self.reject_by_timelimit(s):
                 sub.deleted = True
+                moderated.volume.record(s.created_utc, removed_timelimit=1)
             else:
                 # Here we want all the formatting and tag issues
-                meta = self.analyzer.analyze(s)
+                meta = moderated.analyzer.analyze(s)
                 extra_log["invalid_tags"] = meta.invalid_tags
                 extra_log["has_nsfw_title"] = meta.has_nsfw_title
                 extra_log["has_codeblocks"] = meta.has_codeblocks
@@ -406,11 +652,16 @@ class AutoBot:
                 if meta.is_invalid():
                     # We have bad (tags|title) - Delete post and send PM.
                     msg = self.prepare_delete_message(s, meta)
-                    self.reddit.add_comment(
+                    self._act(
+                        s, "comment", self.reddit.add_comment,
                         s, msg, distinguish=True, sticky=True
                     )
-                    self.reddit.delete_post(s)
+                    self._act(
+                        s, "remove", self.reddit.delete_post, s,
+                        slo=meta.broken_rules()
+                    )
                     sub.deleted = True
+                    moderated.volume.record(s.created_utc, removed_rule=1)
                 else:
                     # this post is valid, cache the activity
                     # data
@@ -418,15 +669,19 @@ class AutoBot:
 
                     if meta.is_serial():
                         # set the series flair for this post
-                        self.reddit.set_series_flair(
-                            s, name=self.series_flair_name
+                        self._act(
+                            s, "flair", self.reddit.set_series_flair,
+                            s, name=cfg.series_flair_name, slo=["series"]
                         )
                         sub.series = True
 
                         # don't send PMs if this is final
                         if not meta.is_final:
-                            self.post_series_reminder(s)
-                            self.send_series_pm(s)
+                            self._act(
+                                s, "series_comment",
+                                self.post_series_reminder, s
+                            )
+                            self._act(s, "series_pm", self.send_series_pm, s)
                             sub.sent_series_pm = True
 
             if not sub.deleted:
@@ -437,28 +692,155 @@ class AutoBot:
 
             logger.info(
                 "Processed post",
-                submission=json.loads(sub.json()),
+                subreddit=moderated.name,
+                submission=sub.model_dump(),
                 **extra_log,
             )
             post_counter.inc()
-            self.post_db.persist(sub.id, sub, ttl=self.cache_ttl)
+            moderated.volume.record(
+                s.created_utc, submitted=1, series=int(sub.series)
+            )
+            # the Submission and the checkpoint's persisted mark are
+            # written together, so a restart never sees one without the
+            # other
+            pipe = moderated.post_db.rd.pipeline(transaction=True)
+            moderated.post_db.persist(
+                sub.id, sub, ttl=moderated.cache_ttl, pipe=pipe
+            )
+            self.checkpoint.finish(s.id, pipe)
+            pipe.execute()
+            if moderated.seen:
+                moderated.seen.add(sub.id)
+
+    def resume(self) -> None:
+        """Picks up from the checkpoint: the /new cursor is restored
+        without fetching anything, and posts interrupted midway are
+        finished, skipping the actions already taken on them."""
+        self.resume_pending = False
+        cursor, inflight, persisted = self.checkpoint.load()
+        for sub in self.subreddits.values():
+            if sub.seen:
+                sub.seen.load()
+                # stored after the last snapshot was written
+                for post_id in persisted:
+                    sub.seen.add(post_id)
+        if cursor:
+            self.latest_post = self.reddit.submission(cursor)
+        if not inflight:
+            return
+        logger.info(
+            "Resuming from checkpoint",
+            cursor=cursor,
+            inflight=inflight
+        )
+        for post_id in list(inflight):
+            post = self.reddit.submission(post_id)
+            try:
+                self._process_listing(self._route([post]))
+            except NotLeader:
+                raise
+            except Exception:
+                logger.exception(
+                    "Unable to resume interrupted post", post_id=post_id
+                )
+            # also drops posts that turned out to be persisted already
+            if not self.stopping.is_set() and post_id in inflight:
+                self.checkpoint.drop(post_id)
+        self.flush()
+
+    def stop(self) -> None:
+        """Asks the bot to stop: it stops fetching, finishes the post in
+        hand, flushes what it buffered and returns from `run`. Only sets a
+        flag, so it's safe to call from a signal handler."""
+        if self.stop_requested is None:
+            self.stop_requested = time.monotonic()
+        self.stopping.set()
+
+    def is_leader(self) -> bool:
+        """Whether this instance should moderate right now. Without a lease
+        it always should. A newly promoted leader drops its /new cursor,
+        which may be from before it stood by, and resumes from the shared
+        checkpoint instead."""
+        if not self.lease:
+            return True
+        was_leader = self.lease.is_leader
+        if not self.lease.acquire():
+            return False
+        if not was_leader:
+            self.latest_post = None
+            self.resume_pending = True
+        return True
 
     def run(self, forever: bool = False, interval: int = 15):
         """Run the autobot to find posts. Can be specified to run `forever`
-        at `interval` seconds per run."""
+        at `interval` seconds per run. A standby checks for the lease every
+        `leader_poll_interval` seconds instead."""
         bot_start_time = time.time()
-        while True:
+        cycle_interval_seconds.set(interval)
+        while not self.stopping.is_set():
+            self.reddit.warm()
+            if self.on_started:
+                started, self.on_started = self.on_started, None
+                started()
+            if not self.is_leader():
+                if not forever:
+                    break
+                self.stopping.wait(self.lease_poll)
+                continue
+
             run_counter.inc()
-            self.fetch_new()
-            self.process_previous()
+            cycle_start = time.perf_counter()
+            calls = self.reddit.api_calls
+            # the report service may be making calls on the same client
+            mark = calls.count("cycle")
+            if self.profiler:
+                self.profiler.begin_cycle()
+            try:
+                with (
+                    self.gate.busy() if self.gate else nullcontext(),
+                    spending("cycle")
+                ):
+                    if self.resume_pending:
+                        self.resume()
+                    self.fetch_new()
+                    if not self.stopping.is_set():
+                        self.process_previous()
+            except NotLeader:
+                logger.warning("Lost the leader lease mid-cycle, standing by")
+            if self.profiler:
+                self.profiler.end_cycle()
+            elapsed = time.perf_counter() - cycle_start
+            spent = calls.spent_since(mark, "cycle")
+            last_cycle_seconds.set(elapsed)
+            cycle_api_calls.set(spent)
+            logger.info(
+                "Cycle finished",
+                cycle_seconds=elapsed,
+                api_calls=spent,
+                ratelimit_remaining=calls.remaining,
+            )
 
             if not forever:
                 break
 
+            if elapsed > interval:
+                logger.warning(
+                    "Cycle took longer than the run interval",
+                    cycle_seconds=elapsed,
+                    interval=interval,
+                )
+
             run_interval = (time.time() - bot_start_time) % float(interval)
             sleep_interval = interval - int(run_interval)
 
             logger.info(
                 "Sleeping until next run.", sleep_seconds=sleep_interval
             )
-            time.sleep(sleep_interval)
+            self.stopping.wait(sleep_interval)
+
+        if self.stop_requested is not None:
+            logger.info(
+                "Stopped",
+                seconds=time.monotonic() - self.stop_requested,
+                cursor=self.checkpoint.cursor
+            )
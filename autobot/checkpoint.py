@@ -0,0 +1,131 @@
+from typing import Callable
+
+import json
+
+import redis
+
+# the last step of a post, once its Submission is stored
+PERSISTED = "persisted"
+
+
+class Checkpoint:
+    """Where AutoBot left off, kept in one Redis hash, checkpoint.<name>,
+    so a restart (a deploy, or a standby taking over) picks up from there:
+
+    * `cursor` is the ID of the newest post handled from /new, so the first
+      listing after a restart only asks for newer posts.
+    * `post.<id>` lists the actions already taken on a post that's being
+      handled, so a post interrupted midway is finished without repeating
+      what was done. Once the post is persisted it's marked as such, and
+      the entry is removed by the first `save` after the seen-post filters
+      are snapshotted; until then the entry is how a restart knows to add
+      the post to them.
+
+    Changes are kept in memory and written by `save` in one round trip per
+    cycle. The bot saves at the end of every cycle, including one cut short
+    by an exception or a shutdown, so only a hard kill midway loses the
+    actions taken in it. The persisted mark goes out with the post's
+    Submission instead, in the same transaction. With a `fence`, `save`
+    writes nothing unless it passes, so a leader that was replaced can't
+    move the cursor back."""
+
+    def __init__(
+        self,
+        rd: redis.Redis,
+        name: str,
+        *,
+        fence: Callable[[], int] | None = None
+    ) -> None:
+        self.rd = rd
+        self.key = f"checkpoint.{name.lower()}"
+        self.fence = fence
+        self.cursor: str | None = None
+        # post ID -> actions taken so far
+        self.inflight: dict[str, list[str]] = {}
+        self.persisted: set[str] = set()
+        # post ID -> its entry as of the last change, or None to delete it
+        self.pending: dict[str, list[str] | None] = {}
+
+    def load(
+        self
+    ) -> tuple[str | None, dict[str, list[str]], set[str]]:
+        """Reads the saved cursor, the posts that were being handled (with
+        the actions already taken on each) and the posts persisted since
+        the last `save`."""
+        saved = self.rd.hgetall(self.key)
+        self.cursor = saved.pop("cursor", None)
+        self.inflight = {}
+        self.persisted = set()
+        self.pending = {}
+        for field, steps in saved.items():
+            if not field.startswith("post."):
+                continue
+            post_id = field.removeprefix("post.")
+            steps = json.loads(steps)
+            if PERSISTED in steps:
+                self.persisted.add(post_id)
+            else:
+                self.inflight[post_id] = steps
+        return self.cursor, self.inflight, self.persisted
+
+    def begin(self, post_id: str) -> None:
+        """Marks a post as being handled, keeping any actions taken on it
+        before a restart."""
+        self.pending[post_id] = self.inflight.setdefault(post_id, [])
+
+    def done(self, post_id: str, action: str) -> bool:
+        return action in self.inflight.get(post_id, ())
+
+    def step(self, post_id: str, action: str) -> None:
+        steps = self.inflight.get(post_id)
+        if steps is None:
+            return
+        steps.append(action)
+        self.pending[post_id] = steps
+
+    def finish(self, post_id: str, pipe: redis.client.Pipeline) -> None:
+        """Marks a post as persisted on `pipe`, which stores its
+        Submission."""
+        steps = self.inflight.pop(post_id, [])
+        self.persisted.add(post_id)
+        self.pending.pop(post_id, None)
+        pipe.hset(
+            self.key, f"post.{post_id}", json.dumps([*steps, PERSISTED])
+        )
+
+    def drop(self, post_id: str) -> None:
+        self.inflight.pop(post_id, None)
+        self.persisted.discard(post_id)
+        self.pending[post_id] = None
+
+    def save(self, cursor: str | None, *, clear: bool = True) -> None:
+        """Writes the cursor and the posts' entries changed since the last
+        save and, with `clear`, removes the entries of persisted posts, in
+        one round trip if there's anything to do. Raises NotLeader if the
+        fence doesn't pass; the changes are kept for a retry."""
+        cleared = self.persisted if clear else set()
+        entries = {
+            f"post.{p}": json.dumps(steps)
+            for p, steps in self.pending.items()
+            if steps is not None and p not in cleared
+        }
+        if cursor not in (None, self.cursor):
+            entries["cursor"] = cursor
+        removed = [
+            f"post.{p}" for p, steps in self.pending.items()
+            if steps is None
+        ] + [f"post.{p}" for p in cleared]
+        if not entries and not removed:
+            return
+        if self.fence:
+            self.fence()
+        pipe = self.rd.pipeline(transaction=True)
+        if entries:
+            pipe.hset(self.key, mapping=entries)
+        if removed:
+            pipe.hdel(self.key, *removed)
+        pipe.execute()
+        self.pending.clear()
+        self.cursor = cursor or self.cursor
+        if clear:
+            self.persisted.clear()
@@ -1,9 +1,23 @@
-from typing import Annotated
+from typing import Annotated, Literal
+import re
 
-from pydantic import Field, RedisDsn
+from pydantic import BaseModel, Field, RedisDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class SubredditSettings(BaseModel):
+    """Per-subreddit overrides of the rule settings. Anything left unset
+    uses the global value."""
+    ignore_older_than: int | None = None
+    ignore_old_posts: bool | None = None
+    post_timelimit: int | None = None
+    enforce_timelimit: bool | None = None
+    series_flair_name: str | None = None
+    template_dir: str | None = None
+    rules_url: str | None = None
+    guide_links: bool | None = None
+
+
 class Settings(BaseSettings):
     development_mode: Annotated[
         bool,
@@ -17,10 +31,74 @@ class Settings(BaseSettings):
     reddit_password: str
     client_id: str
     client_secret: str
+    # one subreddit, or several joined with '+' like a multireddit
     subreddit: str
+    subreddit_settings: dict[str, SubredditSettings] = {}
     user_agent: str
+    reddit_url: str = "https://www.reddit.com"
+    reddit_oauth_url: str = "https://oauth.reddit.com"
+    reddit_timeout: float = 16.0
+    reddit_retries: int = 3
+    reddit_retry_backoff: float = 0.5
+    reddit_pool_size: int = 8
+    reddit_token_cache: bool = True
+    moderator_check_ttl: int = 3600
     series_flair_name: str = "flair - series"
+    flair_index_ttl: int = 3600
+    template_cache_dir: str | None = None
+    # templates here replace the bundled (r/nosleep) ones
+    template_dir: str | None = None
+    # link in messages to the subreddit's rules (default: its wiki index)
+    # and to r/NoSleepAuthors' guides (default: only for r/nosleep)
+    rules_url: str | None = None
+    guide_links: bool | None = None
+    startup_budget: float = 5.0
+    leader_election: bool = False
+    leader_lease_ttl: float = 10.0
+    leader_poll_interval: float = 2.0
+    post_volume_retention: int = 34560000
+    seen_filter: bool = True
+    seen_filter_capacity: int = 20000
+    seen_filter_fp_rate: float = 0.001
+    seen_filter_partitions: int = 8
+    seen_filter_snapshot_interval: int = 300
+    action_latency_target: int = 300
+    action_latency_objective: float = 0.99
+    action_slo_window: int = 86400
+    profile_dir: str | None = None
+    profile_cycles: int = 3
+    log_queue: bool = True
+    log_sample_rates: dict[str, float] = {}
+    report_workers: int = 4
+    report_pm_rate: float = 0.5
+    report_pm_burst: int = 5
+    report_summary_bucket: int = 600
+    report_summary_ttl: int = 172800
+    report_inbox_poll: int = 30
+    report_inbox_page_size: int = 100
+    report_roster_ttl: int = 3600
+    report_metrics_port: int = 9092
+    report_job_jitter: float = 0.0
+    report_missed_run_policy: Literal["run_once", "skip"] = "run_once"
     redis_url: Annotated[RedisDsn, Field(validation_alias="redis_url")]
+
+    def subreddits(self) -> list[str]:
+        return [s for s in re.split(r"[+,\s]+", self.subreddit) if s]
+
+    def report_subreddit(self) -> str:
+        """The subreddit the report service covers: the bot's first."""
+        return self.subreddits()[0]
+
+    def for_subreddit(self, name: str) -> "Settings":
+        """These settings for just `name`, with its overrides applied."""
+        overrides = {
+            k.lower(): v for k, v in self.subreddit_settings.items()
+        }.get(name.lower(), SubredditSettings())
+        return self.model_copy(update={
+            "subreddit": name,
+            **overrides.model_dump(exclude_none=True),
+        })
+
     model_config = SettingsConfigDict(
         case_sensitive=False,
         env_prefix="autobot_",
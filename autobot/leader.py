@@ -0,0 +1,172 @@
+from typing import cast
+from uuid import uuid4
+
+import os
+import socket
+import threading
+import time
+
+from autobot.metrics import leader, leader_fencing_token
+
+import redis
+import structlog
+
+
+class NotLeader(Exception):
+    """Raised when a side effect is attempted without holding the lease."""
+    ...
+
+
+class Lease:
+    """A leader lease in Redis: `leader.<name>` holds the leader's ID and
+    expires after `ttl` seconds unless renewed.
+
+    Every acquisition increments `leader.<name>.fence`, and the new value
+    is the leader's fencing token. `check` confirms that the lease is still
+    ours under that token right before a side effect, so a leader that
+    stalled past its lease and was replaced can't act on stale state."""
+
+    def __init__(
+        self,
+        rd: redis.Redis,
+        name: str,
+        *,
+        ttl: float = 10.0,
+        holder: str | None = None
+    ) -> None:
+        self.rd = rd
+        self.key = f"leader.{name.lower()}"
+        self.fence_key = f"{self.key}.fence"
+        self.holder = holder or (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        )
+        self.ttl = ttl
+        self.token: int | None = None
+        self.expires = 0.0
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.log = structlog.get_logger().bind(lease=self.key)
+        # the bot and the report service can hold a lease each
+        self.leader = leader.labels(name.lower())
+        self.fencing_token = leader_fencing_token.labels(name.lower())
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None
+
+    def _held(self) -> None:
+        self.expires = time.monotonic() + self.ttl
+
+    def _lost(self, reason: str) -> None:
+        if self.token is not None:
+            self.log.warning(
+                "Lost leader lease",
+                reason=reason,
+                fencing_token=self.token
+            )
+        self.token = None
+        self.leader.set(0)
+
+    def acquire(self) -> bool:
+        """Takes the lease if it's free, or renews it if it's ours.
+        Returns whether this instance is the leader."""
+        if self.token is not None:
+            return self.renew()
+        ms = int(self.ttl * 1000)
+        if not self.rd.set(self.key, self.holder, nx=True, px=ms):
+            return False
+        # nobody else can take the lease until it expires, so the
+        # increment is ours
+        self.token = cast(int, self.rd.incr(self.fence_key))
+        self._held()
+        self.leader.set(1)
+        self.fencing_token.set(self.token)
+        self.log.info("Acquired leader lease", fencing_token=self.token)
+        return True
+
+    def renew(self) -> bool:
+        if self.token is None:
+            return False
+        ms = int(self.ttl * 1000)
+
+        try:
+            with self.rd.pipeline() as pipe:
+                pipe.watch(self.key)
+                held = pipe.get(self.key) == self.holder
+                if held:
+                    pipe.multi()
+                    pipe.pexpire(self.key, ms)
+                    pipe.execute()
+        except redis.WatchError:
+            held = False
+        except redis.RedisError:
+            # can't tell; we're only the leader until the lease would
+            # have run out
+            self.log.exception("Unable to renew leader lease")
+            if time.monotonic() >= self.expires:
+                self._lost("renewal failed")
+            return self.token is not None
+        if held:
+            self._held()
+        else:
+            self._lost("taken over or expired")
+        return held
+
+    def check(self) -> int:
+        """Confirms in Redis that this instance holds the lease under its
+        fencing token, and returns the token. Raises NotLeader if not."""
+        token = self.token
+        if token is None:
+            raise NotLeader("Not holding the leader lease")
+        pipe = self.rd.pipeline(transaction=True)
+        pipe.get(self.key)
+        pipe.get(self.fence_key)
+        holder, fence = pipe.execute()
+        if holder != self.holder or int(fence or 0) != token:
+            self._lost("fencing token is stale")
+            raise NotLeader(
+                f"Fencing token {token} is stale (current: {fence})"
+            )
+        return token
+
+    def release(self) -> None:
+        """Gives up the lease right away so a standby can take over."""
+        if self.token is None:
+            return
+
+        def delete(pipe: redis.client.Pipeline) -> None:
+            if pipe.get(self.key) == self.holder:
+                pipe.multi()
+                pipe.delete(self.key)
+
+        try:
+            self.rd.transaction(delete, self.key)
+        except redis.RedisError:
+            self.log.exception("Unable to release leader lease")
+        self.token = None
+        self.leader.set(0)
+        self.log.info("Released leader lease")
+
+    def start(self) -> None:
+        """Renews a held lease every third of its TTL in the background,
+        so long cycles don't let it lapse."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self._keep,
+            name="leader-lease",
+            daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.release()
+
+    def _keep(self) -> None:
+        while not self.stopped.wait(self.ttl / 3):
+            if self.token is not None:
+                self.renew()
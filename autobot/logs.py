@@ -0,0 +1,114 @@
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+
+import structlog
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(obj: Any, **kwargs: Any) -> str:
+    """JSON-encodes a log event, with orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS
+        ).decode()
+    return json.dumps(obj, default=str)
+
+
+class EventSampler:
+    """structlog processor that keeps only a fraction of some events.
+
+    `rates` maps event names (e.g. "Processed post") to the share of them
+    to keep; 0.1 keeps every tenth one. Warnings and errors are always
+    kept."""
+
+    always_kept = frozenset(("warning", "warn", "error", "critical",
+                             "exception"))
+
+    def __init__(self, rates: Mapping[str, float]) -> None:
+        self.rates = dict(rates)
+        self.credit: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def __call__(
+        self,
+        logger: Any,
+        method: str,
+        event_dict: structlog.typing.EventDict
+    ) -> structlog.typing.EventDict:
+        event = event_dict.get("event")
+        rate = self.rates.get(event) if isinstance(event, str) else None
+        if rate is None or rate >= 1 or method in self.always_kept:
+            return event_dict
+        with self.lock:
+            credit = self.credit.get(event, 1.0 - rate) + rate
+            keep = credit >= 1
+            self.credit[event] = credit - 1 if keep else credit
+        if not keep:
+            raise structlog.DropEvent
+        return event_dict
+
+
+def configure_structlog(
+    sample_rates: Mapping[str, float] | None = None
+) -> None:
+    procs: list[Any] = [structlog.stdlib.filter_by_level]
+    if sample_rates:
+        procs.append(EventSampler(sample_rates))
+    procs += [
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.UnicodeDecoder(),
+    ]
+
+    if sys.stderr.isatty():
+        procs.append(structlog.dev.ConsoleRenderer())
+    else:
+        procs.append(structlog.processors.JSONRenderer(serializer=dumps))
+
+    structlog.configure(
+        processors=procs,
+        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+
+def configure_logging(
+    level: int = logging.INFO,
+    *,
+    use_queue: bool = True
+) -> QueueListener | None:
+    """Sends log records to stdout. With `use_queue`, callers only put
+    records on a queue and a background thread does the writing; it's
+    flushed when the process exits."""
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.setLevel(level)
+    if not use_queue:
+        root.addHandler(stream)
+        return None
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(records))
+    listener = QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,248 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, TypeVar
+
+import functools
+import inspect
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+import structlog
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+C = TypeVar("C", bound=type)
+
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+stage_seconds = Histogram(
+    "autobot_stage_seconds",
+    "Time spent in each stage of a bot cycle",
+    ["stage", "method"],
+    buckets=STAGE_BUCKETS
+)
+last_cycle_seconds = Gauge(
+    "autobot_last_cycle_seconds",
+    "How long the last fetch_new/process_previous cycle took"
+)
+cycle_interval_seconds = Gauge(
+    "autobot_cycle_interval_seconds",
+    "The configured number of seconds between cycles"
+)
+cycle_api_calls = Gauge(
+    "autobot_cycle_api_calls",
+    "Reddit API requests made during the last cycle"
+)
+startup_seconds = Gauge(
+    "autobot_startup_seconds",
+    "Time from run_bot.py starting its imports to the first cycle"
+)
+
+action_latency_seconds = Histogram(
+    "autobot_action_latency_seconds",
+    "Time from a post being submitted to the bot's action on it succeeding",
+    ["action", "rule"],
+    buckets=(5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 86400)
+)
+action_slo_burn_rate = Gauge(
+    "autobot_action_slo_burn_rate",
+    "How fast actions are using up the latency SLO's error budget over "
+    "the SLO window (1 means exactly on budget)",
+    ["action"]
+)
+
+seen_filter_bytes = Gauge(
+    "autobot_seen_filter_bytes",
+    "Memory held by the seen-post Bloom filter's partitions",
+    ["subreddit"]
+)
+seen_filter_fp_rate = Gauge(
+    "autobot_seen_filter_fp_rate",
+    "The seen-post Bloom filter's false positive rate, as configured "
+    "(target) and as estimated from how full it is (estimate)",
+    ["subreddit", "kind"]
+)
+seen_filter_checks = Counter(
+    "autobot_seen_filter_checks",
+    "Post IDs checked against the seen-post Bloom filter: unseen ones skip "
+    "the Redis lookup, hits are looked up, and false positives are hits "
+    "Redis had nothing for",
+    ["subreddit", "result"]
+)
+
+leader = Gauge(
+    "autobot_leader",
+    "1 while this instance holds the leader lease, 0 on standby",
+    ["lease"]
+)
+leader_fencing_token = Gauge(
+    "autobot_leader_fencing_token",
+    "Fencing token of the lease this instance last acquired",
+    ["lease"]
+)
+
+
+class _TimedIterator:
+    """Passes through a lazy result (e.g. a praw listing), adding the time
+    spent producing each item to the call's time and observing the total
+    once it's exhausted, raises, or is closed or dropped early. Time the
+    caller spends between items isn't counted."""
+
+    def __init__(self, it: Iterator, child: Any, elapsed: float) -> None:
+        self.it = it
+        self.child = child
+        self.elapsed = elapsed
+        self.done = False
+
+    def __iter__(self) -> "_TimedIterator":
+        return self
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            item = next(self.it)
+        except BaseException:
+            self.elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self.elapsed += time.perf_counter() - start
+        return item
+
+    def close(self) -> None:
+        close = getattr(self.it, "close", None)
+        if close is not None:
+            close()
+        self._finish()
+
+    def __del__(self) -> None:
+        # a caller that stops early (break, islice) just lets go of it
+        self._finish()
+
+    def _finish(self) -> None:
+        if not self.done:
+            self.done = True
+            self.child.observe(self.elapsed)
+
+
+def _wrap(func: F, child: Any) -> F:
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            child.observe(time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        if isinstance(result, Iterator):
+            return _TimedIterator(result, child, elapsed)
+        child.observe(elapsed)
+        return result
+    return inner  # type: ignore[return-value]
+
+
+def timed(stage: str, method: str | None = None) -> Callable[[F], F]:
+    """Records how long calls to the decorated function take in
+    `autobot_stage_seconds`. Iterators that are returned are timed until
+    they're exhausted, closed or dropped."""
+    def decorate(func: F) -> F:
+        child = stage_seconds.labels(stage, method or func.__name__)
+        return _wrap(func, child)
+    return decorate
+
+
+def instrument(stage: str) -> Callable[[C], C]:
+    """Class decorator that times every public method the class defines."""
+    def decorate(cls: C) -> C:
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(attr):
+                continue
+            setattr(cls, name, timed(stage, name)(attr))
+        return cls
+    return decorate
+
+
+def measure_overhead(samples: int = 20000) -> float:
+    """Measures how many seconds timing adds to a call. Used by the tests
+    and benchmarks rather than at startup."""
+    def noop() -> None:
+        pass
+
+    probe = Histogram(
+        "probe_seconds",
+        "Overhead probe",
+        buckets=STAGE_BUCKETS,
+        registry=None
+    )
+    wrapped = _wrap(noop, probe)
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        noop()
+    plain = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        wrapped()
+    instrumented = time.perf_counter() - start
+
+    return max(0.0, (instrumented - plain) / samples)
+
+
+class ActionSLO:
+    """Records post-to-action latency and tracks, per action, the share of
+    actions in the last `window` seconds that took longer than `target`.
+    The burn rate is that share divided by the error budget
+    (1 - `objective`)."""
+
+    def __init__(
+        self,
+        target: float,
+        objective: float,
+        window: float,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.target = target
+        self.budget = max(1e-9, 1 - objective)
+        self.window = window
+        self.clock = clock
+        self.recent: dict[str, deque[tuple[float, bool]]] = {}
+        self.log = structlog.get_logger()
+
+    def observe(
+        self,
+        action: str,
+        created: float,
+        rules: Iterable[str] = ("none",)
+    ) -> float:
+        """Records that `action` succeeded on a post created at `created`,
+        once for each rule that caused it. Returns the latency."""
+        now = self.clock()
+        latency = max(0.0, now - created)
+        for rule in rules:
+            action_latency_seconds.labels(action, rule).observe(latency)
+
+        recent = self.recent.setdefault(action, deque())
+        recent.append((now, latency > self.target))
+        while recent and recent[0][0] <= now - self.window:
+            recent.popleft()
+        burn = self.burn_rate(action)
+        action_slo_burn_rate.labels(action).set(burn)
+        if latency > self.target:
+            self.log.info(
+                "Action missed latency target",
+                action=action,
+                latency=latency,
+                target=self.target,
+                burn_rate=burn
+            )
+        return latency
+
+    def burn_rate(self, action: str) -> float:
+        recent = self.recent.get(action)
+        if not recent:
+            return 0.0
+        breached = sum(1 for _, b in recent if b)
+        return breached / len(recent) / self.budget
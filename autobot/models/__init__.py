@@ -3,3 +3,5 @@ from . import models
 Submission = models.Submission
 Activity = models.Activity
 DataStore = models.DataStore
+PostVolume = models.PostVolume
+SeenFilter = models.SeenFilter
@@ -1,6 +1,17 @@
-from datetime import datetime
-from typing import Generic, Generator, Iterable, Optional, Type, TypeVar
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import (
+    Callable, Generic, Generator, Iterable, Optional, Type, TypeVar
+)
+import base64
+import hashlib
 import json
+import math
+import time
+
+from autobot.metrics import (
+    instrument, seen_filter_bytes, seen_filter_checks, seen_filter_fp_rate
+)
 
 from pydantic import BaseModel, field_serializer
 import redis
@@ -36,34 +47,89 @@ class Activity(BaseModel):
 T = TypeVar("T", bound=BaseModel)
 
 
+@instrument("datastore")
 class DataStore(Generic[T]):
     """This generic class handles the persistence/caching of relevant data
-    bits like metadata about posts, info about when users last submitted..."""
+    bits like metadata about posts, info about when users last submitted...
+
+    With a `namespace` (a subreddit), keys are <type>.<namespace>.<id>.
+    `legacy` makes lookups that miss fall back to the un-namespaced key
+    the bot used when it only ran one subreddit, until `migrate_legacy`
+    has moved those keys over."""
 
-    def __init__(self, rd: redis.Redis, factory: Type[T]) -> None:
+    def __init__(
+        self,
+        rd: redis.Redis,
+        factory: Type[T],
+        namespace: str | None = None,
+        *,
+        legacy: bool = False
+    ) -> None:
         self.rd = rd
         self.tf = factory
+        self.prefix = factory.__name__.lower()
+        if namespace:
+            self.prefix += f".{namespace.lower()}"
+        self.legacy = legacy and bool(namespace)
 
     def _key(self, sid: str) -> str:
+        return f"{self.prefix}.{sid.lower()}"
+
+    def _legacy_key(self, sid: str) -> str:
         return f"{self.tf.__name__.lower()}.{sid.lower()}"
 
     def persist(
         self,
         key: str,
         data: T,
-        ttl: int | None = None
+        ttl: int | None = None,
+        pipe: redis.client.Pipeline | None = None
     ) -> None:
+        """Stores an entry, on `pipe` if it's given."""
         ck = self._key(key)
-        self.rd.set(ck, data.json(), ex=ttl)
+        (pipe or self.rd).set(ck, data.json(), ex=ttl)
 
-    def update(self, key: str, data: T) -> None:
-        """Updates entry and preserves the key TTL."""
+    def update(self, key: str, data: T, ttl: int | None = None) -> None:
+        """Updates an entry, keeping its TTL. If there's nothing under its
+        key (it expired since it was read, or was only found under its
+        legacy key), it's written with `ttl`, so it never ends up without
+        one."""
         ck = self._key(key)
-        self.rd.set(ck, data.json(), keepttl=True)
+        if not self.rd.set(ck, data.json(), keepttl=True, xx=True):
+            self.rd.set(ck, data.json(), ex=ttl)
+
+    def migrate_legacy(self) -> int:
+        """Moves entries still under their legacy key to their namespaced
+        key (RENAMENX keeps their TTL), then stops falling back to legacy
+        keys. Returns how many were moved. A marker in Redis makes this a
+        single lookup once it's been done."""
+        if not self.legacy:
+            return 0
+        marker = f"migrated.{self.prefix}"
+        moved = 0
+        if not self.rd.exists(marker):
+            old = self.tf.__name__.lower()
+            for key in self.rd.scan_iter(match=f"{old}.*", count=1000):
+                # namespaced keys match too
+                if key.count(".") != 1:
+                    continue
+                try:
+                    moved += self.rd.renamenx(
+                        key, self._key(key[len(old) + 1:])
+                    )
+                except redis.ResponseError:
+                    # expired since the scan
+                    continue
+            self.rd.set(marker, int(time.time()))
+        self.legacy = False
+        return moved
 
     def get(self, sid: str) -> T | None:
         ck = self._key(sid)
-        if t := self.rd.get(ck):
+        t = self.rd.get(ck)
+        if not t and self.legacy:
+            t = self.rd.get(self._legacy_key(sid))
+        if t:
             return self.tf(**json.loads(t))
         return None
 
@@ -72,8 +138,17 @@ class DataStore(Generic[T]):
         ids: Iterable[str],
         include_none: bool = True
     ) -> Generator[Optional[T], None, None]:
-        cks = (self._key(x) for x in ids)
-        for r in self.rd.mget(cks):
+        ids = list(ids)
+        if not ids:
+            return
+        found = self.rd.mget([self._key(x) for x in ids])
+        if self.legacy:
+            missing = [i for i, r in enumerate(found) if not r]
+            if missing:
+                old = self.rd.mget([self._legacy_key(ids[i]) for i in missing])
+                for i, r in zip(missing, old):
+                    found[i] = r
+        for r in found:
             if r:
                 yield self.tf(**json.loads(r))
             elif include_none:
@@ -81,3 +156,238 @@ class DataStore(Generic[T]):
             else:
                 continue
         return
+
+    def ids(self) -> Generator[str, None, None]:
+        """Every ID stored, found by scanning the keyspace."""
+        for key in self.rd.scan_iter(match=f"{self.prefix}.*", count=1000):
+            yield key[len(self.prefix) + 1:]
+        if self.legacy:
+            old = self.tf.__name__.lower()
+            for key in self.rd.scan_iter(match=f"{old}.*", count=1000):
+                # namespaced keys match too
+                if key.count(".") == 1:
+                    yield key[len(old) + 1:]
+
+
+class PostVolume:
+    """Per-day post counters for a subreddit, kept as one Redis hash per
+    UTC day (postvolume.<subreddit>.<YYYY-MM-DD>) that expires after
+    `retention` seconds. Counts are buffered with `record` and written in a
+    single pipeline by `flush`."""
+    FIELDS = ("submitted", "removed_rule", "removed_timelimit", "series")
+
+    def __init__(
+        self,
+        rd: redis.Redis,
+        subreddit: str,
+        retention: int = 60 * 60 * 24 * 400
+    ) -> None:
+        self.rd = rd
+        self.subreddit = subreddit.lower()
+        self.retention = retention
+        self.pending: Counter[tuple[date, str]] = Counter()
+
+    def _key(self, day: date) -> str:
+        return f"postvolume.{self.subreddit}.{day.isoformat()}"
+
+    def record(self, when: datetime | float, **counts: int) -> None:
+        if not isinstance(when, datetime):
+            when = datetime.fromtimestamp(when, tz=timezone.utc)
+        day = when.astimezone(timezone.utc).date()
+        for f, n in counts.items():
+            if f not in self.FIELDS:
+                raise KeyError(f"Unknown post volume counter {f}")
+            if n:
+                self.pending[(day, f)] += n
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        pipe = self.rd.pipeline(transaction=False)
+        days = set()
+        for (day, f), n in self.pending.items():
+            pipe.hincrby(self._key(day), f, n)
+            days.add(day)
+        for day in days:
+            pipe.expire(self._key(day), self.retention)
+        pipe.execute()
+        self.pending.clear()
+
+    def range(self, start: date, end: date) -> dict[date, dict[str, int]]:
+        """Counters for every day from `start` to `end` (inclusive) that
+        has any, read in one pipelined round trip."""
+        days = [
+            start + timedelta(days=i)
+            for i in range((end - start).days + 1)
+        ]
+        pipe = self.rd.pipeline(transaction=False)
+        for day in days:
+            pipe.hgetall(self._key(day))
+        return {
+            day: {f: int(raw.get(f, 0)) for f in self.FIELDS}
+            for day, raw in zip(days, pipe.execute())
+            if raw
+        }
+
+
+class SeenFilter:
+    """A rolling Bloom filter of the IDs in a DataStore, so IDs it has
+    definitely never stored can skip the Redis lookup.
+
+    Time is cut into `partitions` spans covering `window` seconds (the
+    store's TTL). IDs are added to the current span's partition and a
+    lookup checks them all; a partition is dropped once it's older than
+    `window`, as are the entries it stood for. Each partition is sized
+    for its share of `capacity` IDs at its share of `fp_rate`, which sets
+    the memory used.
+
+    Changed partitions are snapshotted to seenfilter.<name>.<span> by
+    `snapshot`, at most every `snapshot_interval` seconds, and read back
+    by `load`. Without a usable snapshot (the first start,
+    or after the sizing changed) the filter is built from the store's
+    keys instead."""
+
+    def __init__(
+        self,
+        store: DataStore,
+        name: str,
+        *,
+        window: int,
+        capacity: int,
+        fp_rate: float,
+        partitions: int = 8,
+        snapshot_interval: int = 300,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.store = store
+        self.rd = store.rd
+        self.name = name.lower()
+        self.prefix = f"seenfilter.{self.name}"
+        self.clock = clock
+        self.partitions = partitions
+        self.span = max(1, math.ceil(window / partitions))
+        self.fp_rate = fp_rate
+        # up to partitions + 1 are checked at once
+        per_fp = fp_rate / (partitions + 1)
+        per_ids = max(1, math.ceil(capacity / partitions))
+        bits = -per_ids * math.log(per_fp) / math.log(2) ** 2
+        self.size = math.ceil(bits / 8)
+        self.bits = self.size * 8
+        self.hashes = max(1, round(self.bits / per_ids * math.log(2)))
+        self.meta = f"{self.bits}:{self.hashes}:{self.span}"
+        # span number -> bit array
+        self.filters: dict[int, bytearray] = {}
+        self.dirty: set[int] = set()
+        self.loaded = False
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = 0.0
+        seen_filter_fp_rate.labels(self.name, "target").set(fp_rate)
+
+    def _positions(self, sid: str) -> list[int]:
+        digest = hashlib.blake2b(
+            sid.lower().encode(), digest_size=16
+        ).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _current(self) -> int:
+        """The current span's number, dropping partitions past the
+        window."""
+        now = int(self.clock() // self.span)
+        for n in [n for n in self.filters if n < now - self.partitions]:
+            del self.filters[n]
+            self.dirty.discard(n)
+        return now
+
+    def add(self, sid: str) -> None:
+        n = self._current()
+        bits = self.filters.get(n)
+        if bits is None:
+            bits = self.filters[n] = bytearray(self.size)
+        for pos in self._positions(sid):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.dirty.add(n)
+
+    def __contains__(self, sid: str) -> bool:
+        positions = self._positions(sid)
+        return any(
+            all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+            for bits in self.filters.values()
+        )
+
+    def maybe_seen(self, ids: Iterable[str]) -> list[str]:
+        """The IDs that may have been stored; the rest definitely weren't.
+        """
+        if not self.loaded:
+            self.load()
+        self._current()
+        ids = list(ids)
+        hits = [i for i in ids if i in self]
+        seen_filter_checks.labels(self.name, "unseen").inc(
+            len(ids) - len(hits)
+        )
+        seen_filter_checks.labels(self.name, "hit").inc(len(hits))
+        return hits
+
+    def false_positives(self, n: int) -> None:
+        if n:
+            seen_filter_checks.labels(self.name, "false_positive").inc(n)
+
+    def load(self) -> None:
+        """Reads the snapshot, or rebuilds the filter from the store's keys
+        if there's no snapshot matching this filter's sizing."""
+        now = int(self.clock() // self.span)
+        spans = list(range(now - self.partitions, now + 1))
+        pipe = self.rd.pipeline(transaction=False)
+        pipe.get(self.prefix)
+        pipe.mget([f"{self.prefix}.{n}" for n in spans])
+        meta, saved = pipe.execute()
+        self.filters = {}
+        self.dirty = set()
+        self.last_snapshot = 0.0
+        if meta == self.meta:
+            for n, data in zip(spans, saved):
+                if data:
+                    self.filters[n] = bytearray(base64.b64decode(data))
+        else:
+            for sid in self.store.ids():
+                self.add(sid)
+        self.loaded = True
+        self._export()
+
+    def snapshot(self, force: bool = False) -> bool:
+        """Writes the partitions changed since the last snapshot, if one is
+        due or `force` is set. Returns whether everything added so far is
+        in Redis."""
+        if not self.dirty:
+            return True
+        now = self.clock()
+        if not force and now - self.last_snapshot < self.snapshot_interval:
+            return False
+        ttl = (self.partitions + 1) * self.span
+        pipe = self.rd.pipeline(transaction=False)
+        pipe.set(self.prefix, self.meta, ex=ttl)
+        for n in self.dirty:
+            pipe.set(
+                f"{self.prefix}.{n}",
+                base64.b64encode(self.filters[n]).decode(),
+                ex=ttl
+            )
+        pipe.execute()
+        self.dirty.clear()
+        self.last_snapshot = now
+        self._export()
+        return True
+
+    def _export(self) -> None:
+        seen_filter_bytes.labels(self.name).set(
+            sum(len(bits) for bits in self.filters.values())
+        )
+        # a partition with a fraction f of its bits set has a false
+        # positive rate of about f ** hashes
+        missed = 1.0
+        for bits in self.filters.values():
+            full = int.from_bytes(bits, "little").bit_count() / self.bits
+            missed *= 1 - full ** self.hashes
+        seen_filter_fp_rate.labels(self.name, "estimate").set(1 - missed)
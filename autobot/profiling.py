@@ -0,0 +1,147 @@
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import cProfile
+import datetime
+import io
+import pstats
+import threading
+import tracemalloc
+
+from prometheus_client import make_wsgi_app
+import structlog
+
+
+logger = structlog.get_logger()
+
+
+class CycleProfiler:
+    """Profiles the next few bot cycles once armed.
+
+    Each profiled cycle writes a cProfile dump (cycle-<stamp>.prof), a
+    text summary of it (cycle-<stamp>.txt) and the top allocation changes
+    since the previous cycle according to tracemalloc (alloc-<stamp>.txt)
+    to `directory`. Nothing is profiled or traced while it isn't armed."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        top: int = 40,
+        frames: int = 10
+    ) -> None:
+        self.directory = directory
+        self.top = top
+        self.frames = frames
+        self.remaining = 0
+        self.profile: cProfile.Profile | None = None
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.started_tracing = False
+
+    def arm(self, cycles: int) -> None:
+        """Profiles the next `cycles` cycles. Safe to call from a signal
+        handler."""
+        self.remaining = max(self.remaining, cycles)
+
+    def begin_cycle(self) -> None:
+        if not self.remaining:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        if self.snapshot is None:
+            self.snapshot = tracemalloc.take_snapshot()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def end_cycle(self) -> None:
+        if self.profile is None:
+            return
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        stamp = datetime.datetime.now(
+            tz=datetime.timezone.utc
+        ).strftime("%Y%m%dT%H%M%S.%fZ")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prof = self.directory / f"cycle-{stamp}.prof"
+        self.profile.dump_stats(prof)
+
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        (self.directory / f"cycle-{stamp}.txt").write_text(out.getvalue())
+
+        # begin_cycle took one if this cycle was profiled
+        if self.snapshot is not None:
+            diff = snapshot.compare_to(self.snapshot, "lineno")
+            (self.directory / f"alloc-{stamp}.txt").write_text(
+                "\n".join(str(d) for d in diff[:self.top]) + "\n"
+            )
+        logger.info("Wrote cycle profile", profile=str(prof))
+
+        self.profile = None
+        self.snapshot = snapshot
+        self.remaining -= 1
+        if not self.remaining:
+            self.snapshot = None
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+
+def profile_files(directory: Path) -> Iterable[str]:
+    if not directory.is_dir():
+        return []
+    return sorted(p.name for p in directory.iterdir() if p.is_file())
+
+
+def metrics_app(profile_dir: Path) -> Callable:
+    """The Prometheus WSGI app, plus the files in `profile_dir` under
+    /profiles/."""
+    metrics = make_wsgi_app()
+
+    def app(environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.rstrip("/") == "/profiles":
+            body = "\n".join(profile_files(profile_dir)).encode()
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [body]
+        if path.startswith("/profiles/"):
+            name = path[len("/profiles/"):]
+            if name not in profile_files(profile_dir):
+                start_response("404 Not Found", [])
+                return [b""]
+            kind = (
+                "application/octet-stream"
+                if name.endswith(".prof") else "text/plain"
+            )
+            start_response("200 OK", [("Content-Type", kind)])
+            return [(profile_dir / name).read_bytes()]
+        return metrics(environ, start_response)
+
+    return app
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, profile_dir: Path) -> WSGIServer:
+    """Like prometheus_client.start_http_server, but also serves profiles
+    written to `profile_dir`."""
+    server = make_server(
+        "",
+        port,
+        metrics_app(profile_dir),
+        _ThreadingWSGIServer,
+        handler_class=_QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import fakeredis
+
+from autobot.autobot import AutoBot
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fakes import FakeSubredditTool, fake_post, generate_posts
+from benchmarks.suite import (
+    TEMPLATE_DIR, Case, bench_settings, compare, run_case
+)
+
+
+class TestBenchmarkHarness(TestCase):
+    def test_fake_tool_cycle(self):
+        posts = [
+            fake_post("a", title="Story [Part 1]"),
+            fake_post("b", title="Story [bad tag]", author="author2"),
+        ]
+        tool = FakeSubredditTool(posts)
+        bot = AutoBot(
+            bench_settings(),
+            fakeredis.FakeRedis(decode_responses=True),
+            MessageBuilder(TEMPLATE_DIR),
+            reddit=tool
+        )
+        bot.fetch_new()
+        bot.process_previous()
+        self.assertIn(("remove", "b"), tool.actions)
+        self.assertIn(("flair", "a"), tool.actions)
+        self.assertEqual(bot.latest_post.id, "a")
+        self.assertEqual(tool.api_calls.by_endpoint["GET /r/{name}/new"], 1)
+
+    def test_generated_posts_are_deterministic(self):
+        titles = [p.title for p in generate_posts(50, seed=3)]
+        self.assertEqual(titles, [p.title for p in generate_posts(50, seed=3)])
+
+    def test_compare_flags_slowdowns(self):
+        case = Case("noop", lambda: None, lambda _: None, items=2, repeat=3)
+        result = run_case(case)
+        self.assertEqual(result["repeat"], 3)
+        base = {"a": {"median": 1.0}, "b": {"median": 1.0}}
+        now = {"a": {"median": 1.2}, "b": {"median": 1.5}, "c": {"median": 9}}
+        self.assertEqual(
+            [r[0] for r in compare(now, base, tolerance=0.25)],
+            ["b"]
+        )
+
+    def test_compare_allows_for_noise(self):
+        case = Case("noop", lambda: None, lambda _: None, repeat=3)
+        result = run_case(case, runs=2)
+        self.assertEqual((result["runs"], result["repeat"]), (2, 6))
+        base = {
+            "steady": {"median": 1.0, "mad": 0.01},
+            "noisy": {"median": 1.0, "mad": 0.1},
+        }
+        now = {
+            "steady": {"median": 1.2, "mad": 0.01},
+            "noisy": {"median": 1.2, "mad": 0.1},
+        }
+        # 0.2 slower is well past the steady benchmark's jitter, but not
+        # three times the noisy one's
+        self.assertEqual([r[0] for r in compare(now, base)], ["steady"])
@@ -1,13 +1,36 @@
 import datetime
+import gc
+import io
 import os
+import tempfile
+import time
+import tracemalloc
 from dataclasses import dataclass
+from itertools import product
 from pathlib import Path
+from types import SimpleNamespace
 from unittest import TestCase, mock
 from urllib.parse import urlparse, parse_qs
 
-from autobot.autobot import englishify_time, PostAnalyzer
-from autobot.config import Settings
+import fakeredis
+import structlog
+from prometheus_client import REGISTRY
+
+from autobot.autobot import (
+    AutoBot, PostAnalyzer, PostMetadata, englishify_time
+)
+from autobot.config import Settings, SubredditSettings
+from autobot.logs import EventSampler, dumps
+from autobot.metrics import ActionSLO, measure_overhead, timed
+from autobot.models import DataStore, SeenFilter, Submission
+from autobot.profiling import CycleProfiler, metrics_app
+from autobot.util.messages.templater import MessageBuilder
 from autobot.util.reddit_util import SubredditTool
+from benchmarks.fakes import FakeSubredditTool
+
+TEMPLATE_DIR = (
+    Path(__file__).resolve().parent.parent / "util" / "messages" / "templates"
+)
 
 
 @dataclass
@@ -17,6 +40,567 @@ class FakeSubmission:
     link_flair_text: str = ""
 
 
+def fake_post(
+    pid: str,
+    title: str = "A story",
+    created: float | None = None,
+    author: str = "author1"
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=pid,
+        name=f"t3_{pid}",
+        title=title,
+        selftext="A reddit text",
+        author=SimpleNamespace(name=author),
+        created_utc=created or time.time(),
+        subreddit=SimpleNamespace(display_name="nosleep"),
+        shortlink=f"https://redd.it/{pid}",
+        link_flair_css_class=None,
+    )
+
+
+def make_bot(rd, **cfg) -> AutoBot:
+    """Builds an AutoBot with a mocked SubredditTool."""
+    settings = Settings.model_construct(
+        **{"subreddit": "nosleep", "development_mode": True, **cfg}
+    )
+    with mock.patch("autobot.util.reddit_util.SubredditTool") as tool:
+        tool.return_value.subreddit_name.return_value = "nosleep"
+        tool.return_value.is_post_deleted.return_value = False
+        tool.return_value.read_only = False
+        return AutoBot(settings, rd, MessageBuilder(TEMPLATE_DIR))
+
+
+class TestBotCycle(TestCase):
+    def test_fetch_new_counts_post_volume(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        bot = make_bot(rd)
+        now = time.time()
+        bot.reddit.retrieve_new_posts.return_value = [
+            fake_post("a", created=now - 10),
+            fake_post("b", "Story [part 2]", now - 5, author="author2"),
+            fake_post("c", "Story [bad tag]", now, author="author3"),
+        ]
+        bot.fetch_new()
+        # seen posts aren't counted twice
+        bot.fetch_new()
+
+        today = datetime.datetime.fromtimestamp(
+            now, tz=datetime.timezone.utc
+        ).date()
+        counts = bot.subreddits["nosleep"].volume.range(today, today)[today]
+        self.assertEqual(counts["submitted"], 3)
+        self.assertEqual(counts["series"], 1)
+        self.assertEqual(counts["removed_rule"], 1)
+        self.assertEqual(counts["removed_timelimit"], 0)
+
+    def test_one_listing_serves_every_subreddit(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        bot = make_bot(
+            rd,
+            subreddit="nosleep+ShortScaryStories",
+            subreddit_settings={
+                "shortscarystories": SubredditSettings(
+                    enforce_timelimit=False
+                )
+            }
+        )
+        now = time.time()
+        posts = [
+            fake_post("a", created=now - 40),
+            fake_post("b", created=now - 30),
+            fake_post("c", created=now - 20),
+            fake_post("d", created=now - 10),
+            fake_post("e", created=now),
+        ]
+        for p, name in zip(posts, ["nosleep", "nosleep", "shortscarystories",
+                                   "shortscarystories", "other"]):
+            p.subreddit = SimpleNamespace(display_name=name)
+        bot.reddit.retrieve_new_posts.return_value = posts
+        bot.fetch_new()
+
+        self.assertEqual(bot.reddit.retrieve_new_posts.call_count, 1)
+        # the time limit only applies in r/nosleep
+        removed = [c.args[0].id for c in bot.reddit.delete_post.call_args_list]
+        self.assertEqual(removed, ["b"])
+        self.assertEqual(
+            sorted(rd.keys("submission.*")),
+            ["submission.nosleep.a", "submission.nosleep.b",
+             "submission.shortscarystories.c",
+             "submission.shortscarystories.d"]
+        )
+        self.assertTrue(rd.exists("activity.shortscarystories.author1"))
+        self.assertEqual(bot.latest_post.id, "d")
+
+    def test_old_keys_are_moved_for_the_first_subreddit(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        old = Submission(id="a", author="author1", submitted=time.time())
+        DataStore(rd, Submission).persist("a", old, ttl=600)
+        bot = make_bot(rd)
+        # moved once at startup, keeping the TTL
+        self.assertFalse(rd.exists("submission.a"))
+        self.assertGreater(rd.ttl("submission.nosleep.a"), 0)
+        self.assertFalse(bot.subreddits["nosleep"].post_db.legacy)
+        bot.reddit.retrieve_new_posts.return_value = [fake_post("a")]
+        bot.fetch_new()
+        bot.reddit.add_comment.assert_not_called()
+
+        # later starts don't scan for them again
+        DataStore(rd, Submission).persist("b", old, ttl=600)
+        make_bot(rd)
+        self.assertTrue(rd.exists("submission.b"))
+
+    def test_update_never_drops_the_ttl(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        store = DataStore(rd, Submission, "nosleep")
+        sub = Submission(id="a", author="author1", submitted=time.time())
+        store.persist("a", sub, ttl=600)
+        store.update("a", sub, ttl=60)
+        self.assertGreater(rd.ttl("submission.nosleep.a"), 60)
+        rd.delete("submission.nosleep.a")
+        store.update("a", sub, ttl=60)
+        self.assertEqual(rd.ttl("submission.nosleep.a"), 60)
+
+
+def stage_count(stage: str, method: str) -> float:
+    return REGISTRY.get_sample_value(
+        "autobot_stage_seconds_count",
+        {"stage": stage, "method": method}
+    ) or 0
+
+
+class TestSeenFilter(TestCase):
+    def make_filter(self, rd, clock, **kwargs) -> SeenFilter:
+        args = {"window": 800, "capacity": 1000, "fp_rate": 0.01, **kwargs}
+        return SeenFilter(
+            DataStore(rd, Submission, "nosleep"),
+            "nosleep",
+            partitions=8,
+            clock=clock,
+            **args
+        )
+
+    def test_only_possible_hits_are_looked_up(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        bot = make_bot(rd)
+        sub = bot.subreddits["nosleep"]
+        now = time.time()
+        bot.reddit.retrieve_new_posts.return_value = [
+            fake_post("a", created=now - 10),
+            fake_post("b", created=now - 5, author="author2"),
+        ]
+        with mock.patch.object(
+            sub.post_db, "get_many", wraps=sub.post_db.get_many
+        ) as get_many:
+            bot.fetch_new()
+            bot.fetch_new()
+        # nothing to look up the first time, both posts the second
+        self.assertEqual(
+            [list(c.args[0]) for c in get_many.call_args_list],
+            [[], ["a", "b"]]
+        )
+        bot.reddit.add_comment.assert_not_called()
+        self.assertTrue(rd.exists("seenfilter.nosleep"))
+
+    def test_false_positive_rate_and_rolling_window(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        now = [1000.0]
+        seen = self.make_filter(rd, lambda: now[0])
+        seen.load()
+        for i in range(1000):
+            seen.add(f"seen{i}")
+            now[0] += 0.8
+        self.assertTrue(all(f"seen{i}" in seen for i in range(1000)))
+        hits = len(seen.maybe_seen(f"other{i}" for i in range(20000)))
+        self.assertLess(hits / 20000, 0.02)
+        # the configured rate and size decide the memory used
+        self.assertLessEqual(sum(map(len, seen.filters.values())), 9 * 1500)
+
+        # a whole window later, the oldest IDs have rolled out
+        now[0] += 800
+        seen.add("new")
+        self.assertNotIn("seen0", seen)
+        self.assertIn("seen999", seen)
+
+    def test_snapshot_is_loaded_or_rebuilt(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        clock = time.time
+        store = DataStore(rd, Submission, "nosleep")
+        store.persist("a", Submission(id="a", author="x", submitted=clock()))
+        # nothing saved yet, so it's built from the stored posts
+        first = self.make_filter(rd, clock)
+        first.load()
+        self.assertIn("a", first)
+        first.add("b")
+        first.snapshot()
+
+        again = self.make_filter(rd, clock)
+        with mock.patch.object(DataStore, "ids") as ids:
+            again.load()
+        ids.assert_not_called()
+        self.assertIn("a", again)
+        self.assertIn("b", again)
+
+        # snapshots of a differently sized filter aren't used
+        resized = self.make_filter(rd, clock, fp_rate=0.001)
+        resized.load()
+        self.assertIn("a", resized)
+        self.assertNotIn("b", resized)
+
+
+class TestTemplateCache(TestCase):
+    def test_compiled_templates_are_reused(self):
+        with tempfile.TemporaryDirectory() as cache:
+            first = MessageBuilder(
+                TEMPLATE_DIR,
+                module_directory=Path(cache),
+                filesystem_checks=False
+            )
+            compiled = sorted(p.name for p in Path(cache).iterdir())
+            self.assertEqual(
+                compiled,
+                sorted(f"{t}.py" for t in MessageBuilder.TEMPLATES.values())
+            )
+            again = MessageBuilder(TEMPLATE_DIR, module_directory=Path(cache))
+            self.assertEqual(
+                again.create_deleted_post_msg(
+                    "https://redd.it/a", modmail_link="m", permanent=True
+                ),
+                first.create_deleted_post_msg(
+                    "https://redd.it/a", modmail_link="m", permanent=True
+                )
+            )
+
+
+class TestCachedRendering(TestCase):
+    """Messages built from cached skeletons are the same, byte for byte,
+    as rendering each one from scratch."""
+
+    def setUp(self):
+        self.tool = FakeSubredditTool()
+        self.bot = AutoBot(
+            Settings.model_construct(
+                subreddit="nosleep",
+                development_mode=True
+            ),
+            fakeredis.FakeRedis(decode_responses=True),
+            MessageBuilder(TEMPLATE_DIR),
+            reddit=self.tool
+        )
+        self.mako = MessageBuilder(TEMPLATE_DIR).mako
+
+    def render(self, template: str, **kwargs) -> str:
+        return self.mako.get_template(template).render(
+            subreddit="nosleep",
+            rules_url="https://www.reddit.com/r/nosleep/wiki/index/",
+            guide_links=True,
+            **kwargs
+        )
+
+    def test_removal_messages(self):
+        for i, flags in enumerate(product((False, True), repeat=4)):
+            nsfw, code, paragraphs, tags = flags
+            post = fake_post(f"p{i}", author=f"a&b {i}")
+            post.shortlink = f"https://redd.it/p{i}?x=1&y=%20"
+            meta = PostMetadata(
+                has_long_paragraphs=paragraphs,
+                has_codeblocks=code,
+                has_nsfw_title=nsfw,
+                invalid_tags=["[pt 1]", "[NSFW]"] if tags else None
+            )
+            reapproval = self.render(
+                "reapproval.template",
+                post_url=post.shortlink,
+                is_title_reapproval=tags or None
+            )
+            expected = self.render(
+                "post_removed.md.template",
+                post_url=post.shortlink,
+                modmail_link=self.tool.create_modmail_link(
+                    subreddit="nosleep"
+                ),
+                reapproval_modmail=self.tool.create_modmail_link(
+                    "Please reapprove submission",
+                    reapproval,
+                    subreddit="nosleep"
+                ),
+                permanent=False,
+                has_nsfw_title=nsfw,
+                has_codeblocks=code,
+                long_paragraphs=paragraphs,
+                invalid_tags=meta.bad_tags()
+            )
+            for _ in range(2):
+                self.assertEqual(
+                    self.bot.prepare_delete_message(post, meta), expected
+                )
+
+    def test_series_reminder(self):
+        post = fake_post("p1", author="some_one-else")
+        post.author = "some_one-else"
+        expected = self.render(
+            "series_comment.md.template",
+            subscribe_url=self.tool.gen_compose_url({
+                "to": "UpdateMeBot",
+                "subject": "Subscribe",
+                "message": "SubscribeMe! /r/nosleep /u/some_one-else",
+            })
+        )
+        self.assertEqual(self.bot.gen_series_reminder(post), expected)
+        self.assertEqual(len(self.bot.messages), 1)
+        # display names and configured names can differ in case
+        self.assertIs(
+            self.bot.messages_for("NoSleep"), self.bot.messages_for("nosleep")
+        )
+        self.assertEqual(len(self.bot.messages), 1)
+
+    def test_subreddit_templates(self):
+        with tempfile.TemporaryDirectory() as custom:
+            Path(custom, "post_removed.md.template").write_text(
+                "Removed from r/${subreddit}: ${post_url}"
+            )
+            bot = AutoBot(
+                Settings.model_construct(
+                    subreddit="nosleep+ShortScaryStories",
+                    subreddit_settings={
+                        "shortscarystories": SubredditSettings(
+                            template_dir=custom
+                        )
+                    },
+                    development_mode=True
+                ),
+                fakeredis.FakeRedis(decode_responses=True),
+                MessageBuilder(TEMPLATE_DIR),
+                reddit=self.tool
+            )
+            post = fake_post("p1")
+            post.subreddit = SimpleNamespace(display_name="ShortScaryStories")
+            meta = PostMetadata(has_nsfw_title=True)
+            self.assertEqual(
+                bot.prepare_delete_message(post, meta),
+                f"Removed from r/ShortScaryStories: {post.shortlink}"
+            )
+            # the rest are the bundled ones, with the subreddit filled in
+            series = bot.messages_for("ShortScaryStories").builder
+            self.assertIn(
+                "writing an /r/ShortScaryStories series",
+                series.create_series_msg(post.shortlink)
+            )
+            nosleep = fake_post("p2")
+            self.assertIn(
+                "removed](https://www.reddit.com/r/NoSleepAuthors/comments/"
+                "z93asr/comment/jfigj88/) from /r/nosleep",
+                bot.prepare_delete_message(nosleep, meta)
+            )
+
+    def test_other_subreddits_get_their_own_links(self):
+        bot = AutoBot(
+            Settings.model_construct(
+                subreddit="nosleep+ShortScaryStories+LetsNotMeet",
+                subreddit_settings={
+                    "letsnotmeet": SubredditSettings(
+                        rules_url="https://example.com/rules"
+                    )
+                },
+                development_mode=True
+            ),
+            fakeredis.FakeRedis(decode_responses=True),
+            MessageBuilder(TEMPLATE_DIR),
+            reddit=self.tool
+        )
+        meta = PostMetadata(
+            has_nsfw_title=True,
+            has_codeblocks=True,
+            has_long_paragraphs=True,
+            invalid_tags=["[pt 1]"]
+        )
+        for name, rules in [
+            ("ShortScaryStories",
+             "https://www.reddit.com/r/ShortScaryStories/wiki/index/"),
+            ("LetsNotMeet", "https://example.com/rules"),
+        ]:
+            post = fake_post(f"p-{name}")
+            post.subreddit = SimpleNamespace(display_name=name)
+            msgs = bot.messages_for(name)
+            for msg in [
+                bot.prepare_delete_message(post, meta),
+                msgs.builder.create_post_a_day_msg(
+                    post.shortlink, "1 hour", msgs.modmail_link
+                ),
+                msgs.reapproval_link(post.shortlink, title=True),
+            ]:
+                self.assertNotIn("nosleep", msg.lower())
+            removal = bot.prepare_delete_message(post, meta)
+            self.assertIn(f"message the r/{name} moderators", removal)
+            self.assertIn(f"other r/{name} rules]({rules})", removal)
+
+
+class TestStageTiming(TestCase):
+    def test_lazy_results_are_timed_when_exhausted(self):
+        @timed("test", "listing")
+        def listing():
+            yield from range(3)
+
+        before = stage_count("test", "listing")
+        it = listing()
+        next(it)
+        self.assertEqual(stage_count("test", "listing"), before)
+        self.assertEqual(list(it), [1, 2])
+        self.assertEqual(stage_count("test", "listing"), before + 1)
+
+    def test_lazy_results_are_timed_when_let_go(self):
+        @timed("test", "abandoned")
+        def listing():
+            yield from range(3)
+            raise AssertionError("read too far")
+
+        before = stage_count("test", "abandoned")
+        for _ in listing():
+            break
+        gc.collect()
+        self.assertEqual(stage_count("test", "abandoned"), before + 1)
+
+        it = listing()
+        next(it)
+        it.close()
+        self.assertEqual(stage_count("test", "abandoned"), before + 2)
+        del it
+        self.assertEqual(stage_count("test", "abandoned"), before + 2)
+
+        with self.assertRaises(AssertionError):
+            list(listing())
+        self.assertEqual(stage_count("test", "abandoned"), before + 3)
+
+    def test_datastore_and_cycle_are_instrumented(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        db = DataStore(rd, Submission)
+        before = stage_count("datastore", "get_many")
+        self.assertEqual(list(db.get_many(["a", "b"])), [None, None])
+        self.assertEqual(stage_count("datastore", "get_many"), before + 1)
+
+        bot = make_bot(rd)
+        bot.reddit.retrieve_new_posts.return_value = [fake_post("a")]
+        before = stage_count("cycle", "fetch_new")
+        bot.fetch_new()
+        self.assertEqual(stage_count("cycle", "fetch_new"), before + 1)
+
+    def test_overhead_is_small(self):
+        self.assertLess(measure_overhead(2000), 50e-6)
+
+
+class TestActionSLO(TestCase):
+    def test_burn_rate_over_window(self):
+        now = [1000.0]
+        slo = ActionSLO(300, 0.9, 3600, clock=lambda: now[0])
+        slo.observe("remove", 990)
+        slo.observe("remove", 0, ["nsfw_title"])
+        # half the actions were late against a 10% error budget
+        self.assertAlmostEqual(slo.burn_rate("remove"), 5.0)
+        now[0] += 3600
+        slo.observe("remove", now[0] - 1)
+        self.assertAlmostEqual(slo.burn_rate("remove"), 0.0)
+        self.assertEqual(slo.burn_rate("flair"), 0.0)
+
+    def test_bot_records_latency_per_rule(self):
+        def removals(rule):
+            return REGISTRY.get_sample_value(
+                "autobot_action_latency_seconds_count",
+                {"action": "remove", "rule": rule}
+            ) or 0
+
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        bot = make_bot(rd)
+        bot.reddit.retrieve_new_posts.return_value = [
+            fake_post("x", "NSFW story [bad tag]", time.time() - 30)
+        ]
+        before = removals("nsfw_title"), removals("invalid_tags")
+        bot.fetch_new()
+        after = removals("nsfw_title"), removals("invalid_tags")
+        self.assertEqual(after, (before[0] + 1, before[1] + 1))
+        self.assertEqual(len(bot.slo.recent["remove"]), 1)
+
+    def test_only_actions_taken_are_recorded(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        bot = make_bot(rd)
+        post = fake_post("x", "NSFW story [bad tag]", time.time() - 30)
+        bot.reddit.retrieve_new_posts.return_value = [post]
+        # removed before a restart, so it isn't removed (or timed) again
+        bot.checkpoint.inflight["x"] = ["comment", "remove"]
+        bot.fetch_new()
+        bot.reddit.delete_post.assert_not_called()
+        self.assertNotIn("remove", bot.slo.recent)
+
+        bot = make_bot(fakeredis.FakeRedis(decode_responses=True))
+        bot.reddit.read_only = True
+        bot.reddit.retrieve_new_posts.return_value = [post]
+        bot.fetch_new()
+        self.assertNotIn("remove", bot.slo.recent)
+
+
+class TestLogging(TestCase):
+    def test_sampler_keeps_share_of_events(self):
+        sampler = EventSampler({"Processed post": 0.25})
+        kept = 0
+        for _ in range(100):
+            try:
+                sampler(None, "info", {"event": "Processed post"})
+                kept += 1
+            except structlog.DropEvent:
+                pass
+        self.assertEqual(kept, 25)
+        for method in ("info", "warning"):
+            event = {"event": "Other" if method == "info" else
+                     "Processed post"}
+            self.assertIs(sampler(None, method, event), event)
+
+    def test_dumps_submission_without_round_trip(self):
+        sub = Submission(id="a", author="x", submitted=1700000000)
+        out = dumps({"event": "Processed", "submission": sub.model_dump()})
+        self.assertIn('"submitted":1700000000', out.replace(" ", ""))
+
+
+class TestProfiling(TestCase):
+    def test_profiles_armed_cycles_only(self):
+        with tempfile.TemporaryDirectory() as d:
+            profiler = CycleProfiler(Path(d))
+            profiler.begin_cycle()
+            profiler.end_cycle()
+            self.assertEqual(os.listdir(d), [])
+
+            profiler.arm(2)
+            for _ in range(3):
+                profiler.begin_cycle()
+                [str(i) for i in range(1000)]
+                profiler.end_cycle()
+            names = sorted(os.listdir(d))
+            self.assertEqual(len(names), 6)
+            self.assertEqual(
+                {n.split("-")[0] + n[n.rindex("."):] for n in names},
+                {"cycle.prof", "cycle.txt", "alloc.txt"}
+            )
+            self.assertFalse(tracemalloc.is_tracing())
+
+            app = metrics_app(Path(d))
+
+            def get(path):
+                status = []
+                body = app(
+                    {"PATH_INFO": path, "REQUEST_METHOD": "GET",
+                     "QUERY_STRING": "", "wsgi.input": io.BytesIO()},
+                    lambda s, h: status.append(s)
+                )
+                return status[0], b"".join(body)
+
+            status, body = get("/profiles/")
+            self.assertEqual(body.decode().split(), names)
+            txt = next(n for n in names if n.startswith("cycle-"))
+            self.assertTrue(get(f"/profiles/{txt}")[0].startswith("200"))
+            self.assertTrue(
+                get("/profiles/../secret")[0].startswith("404")
+            )
+            self.assertTrue(get("/")[0].startswith("200"))
+
+
 class TestBotMethods(TestCase):
     def _get_files_dir(self) -> Path:
         return Path(__file__).resolve().parent / "files"
@@ -0,0 +1,120 @@
+from unittest import TestCase
+
+import threading
+
+import fakeredis
+from structlog.testing import capture_logs
+import structlog
+
+from autobot.util.client import make_reddit, user_is_moderator
+from autobot.util.reddit_util import SubredditTool
+from autobot.util.requestor import ApiCalls, IdleGate
+from benchmarks.fake_api import ApiConfig, FakeRedditServer, live_settings
+from benchmarks.suite import ROOT
+from moderation.activity import ReportService
+
+LOGIN = "POST /api/v1/access_token"
+
+
+class TestSharedClient(TestCase):
+    def setUp(self):
+        self.server = FakeRedditServer(ApiConfig(ratelimit=10**9)).start()
+        self.addCleanup(self.server.stop)
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+        self.cfg = live_settings(
+            self.server.url,
+            reddit_timeout=5.0,
+            reddit_retries=1,
+            reddit_retry_backoff=0.0,
+            reddit_pool_size=4,
+            reddit_token_cache=True,
+            moderator_check_ttl=3600
+        )
+
+    def test_restart_reuses_token_and_moderator_check(self):
+        with capture_logs():
+            first = SubredditTool(self.cfg, self.rd)
+            again = SubredditTool(self.cfg, self.rd)
+        self.assertEqual(first.api_calls.by_endpoint[LOGIN], 1)
+        # the second start makes no requests at all
+        self.assertEqual(again.api_calls.total, 0)
+        self.assertEqual(self.server.state.logins, 1)
+
+    def test_rejected_token_is_replaced(self):
+        calls = ApiCalls("report")
+        with capture_logs():
+            reddit = make_reddit(self.cfg, calls, self.rd)
+            self.assertTrue(
+                user_is_moderator(reddit, "nosleep", client="report")
+            )
+            self.server.state.revoke_tokens()
+            other = make_reddit(self.cfg, ApiCalls("bot"), self.rd)
+            self.assertTrue(
+                user_is_moderator(other, "nosleep", client="bot")
+            )
+        # the revoked token was dropped from Redis on the 401, so the
+        # second client logged in again instead of looping on it
+        self.assertEqual(self.server.state.logins, 2)
+        self.assertIn("fake-token-2", self.rd.get("reddit.token.loadgen.bot"))
+
+    def test_requests_share_connections(self):
+        calls = ApiCalls("bot")
+        reddit = make_reddit(self.cfg, calls, self.rd)
+        with capture_logs():
+            for _ in range(5):
+                reddit.subreddit("nosleep")._fetch()
+        self.assertEqual(calls.total, 6)
+        # kept alive rather than one connection per request
+        self.assertLessEqual(self.server.state.connections, 2)
+
+    def test_report_workers_have_their_own_clients(self):
+        with capture_logs():
+            svc = ReportService(
+                self.cfg,
+                ROOT / "moderation" / "templates",
+                structlog.get_logger(),
+                self.rd
+            )
+            clients = {}
+            build = svc.worker_client
+
+            def worker_client():
+                clients[threading.get_ident()] = build()
+                return clients[threading.get_ident()]
+
+            svc.worker_client = worker_client
+            svc.delivery.start()
+            svc.gen_all_reports()
+            svc.delivery.join(timeout=10)
+            svc.delivery.stop()
+        # one client per worker thread (three moderators, so three of the
+        # four are started), each taking the OAuth token from Redis
+        # rather than logging in
+        self.assertEqual(len(clients), 3)
+        self.assertEqual(len({id(c) for c in clients.values()}), 3)
+        self.assertNotIn(svc.reddit, clients.values())
+        self.assertEqual(self.server.state.logins, 1)
+
+    def test_report_service_waits_for_the_bot(self):
+        gate = IdleGate()
+        with capture_logs():
+            tool = SubredditTool(self.cfg, self.rd, gate=gate)
+            svc = ReportService(
+                self.cfg,
+                ROOT / "moderation" / "templates",
+                structlog.get_logger(),
+                self.rd,
+                reddit=tool.reddit,
+                api_calls=tool.api_calls
+            )
+            sweep = threading.Thread(target=svc.inbox_has_mail)
+            with gate.busy():
+                sweep.start()
+                # the bot's own requests go straight through
+                list(tool.retrieve_new_posts())
+                sweep.join(timeout=0.3)
+                self.assertTrue(sweep.is_alive())
+            sweep.join(timeout=5)
+        self.assertFalse(sweep.is_alive())
+        self.assertIs(svc.api_calls, tool.api_calls)
+        self.assertEqual(self.server.state.logins, 1)
@@ -0,0 +1,125 @@
+from pathlib import Path
+from unittest import TestCase, mock
+
+import fakeredis
+from structlog.testing import capture_logs
+
+from autobot.autobot import AutoBot
+from autobot.config import Settings
+from autobot.leader import Lease, NotLeader
+from autobot.util.messages.templater import MessageBuilder
+from autobot.util.reddit_util import SubredditTool
+from benchmarks.fake_api import ApiConfig, FakeRedditServer
+from benchmarks.loadgen import live_settings
+
+TEMPLATE_DIR = (
+    Path(__file__).resolve().parent.parent / "util" / "messages" / "templates"
+)
+
+
+def make_bot(rd, lease: Lease) -> AutoBot:
+    settings = Settings.model_construct(
+        subreddit="nosleep",
+        development_mode=True
+    )
+    with mock.patch("autobot.util.reddit_util.SubredditTool") as tool:
+        tool.return_value.retrieve_new_posts.return_value = []
+        tool.return_value.search_recent_posts.return_value = []
+        tool.return_value.api_calls.total = 0
+        tool.return_value.api_calls.spent_since.return_value = 0
+        return AutoBot(
+            settings, rd, MessageBuilder(TEMPLATE_DIR), lease=lease
+        )
+
+
+class TestLease(TestCase):
+    def test_fencing_token_changes_hands(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        a = Lease(rd, "test", holder="a")
+        b = Lease(rd, "test", holder="b")
+        with capture_logs():
+            self.assertTrue(a.acquire())
+            self.assertFalse(b.acquire())
+            self.assertEqual(a.check(), 1)
+
+            # a stalls past its lease and b takes over
+            rd.delete(a.key)
+            self.assertTrue(b.acquire())
+            self.assertEqual(b.check(), 2)
+            with self.assertRaises(NotLeader):
+                a.check()
+            self.assertFalse(a.acquire())
+
+            b.release()
+            self.assertTrue(a.acquire())
+            self.assertEqual(a.token, 3)
+
+    def test_renewal_keeps_only_our_own_lease(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        a = Lease(rd, "test", holder="a", ttl=10.0)
+        with capture_logs():
+            self.assertTrue(a.acquire())
+            rd.pexpire(a.key, 100)
+            self.assertTrue(a.renew())
+            self.assertGreater(rd.pttl(a.key), 9000)
+
+            # b took the lease after a's ran out
+            rd.set(a.key, "b")
+            self.assertFalse(a.renew())
+            self.assertFalse(a.is_leader)
+            self.assertEqual(rd.get(a.key), "b")
+
+    def test_only_the_leader_moderates(self):
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        active = make_bot(rd, Lease(rd, "bot", holder="active"))
+        standby = make_bot(rd, Lease(rd, "bot", holder="standby"))
+        with capture_logs():
+            active.run()
+            standby.run()
+            self.assertEqual(
+                active.reddit.retrieve_new_posts.call_count, 1
+            )
+            standby.reddit.retrieve_new_posts.assert_not_called()
+            standby.reddit.warm.assert_called()
+
+            active.lease.release()
+            standby.latest_post = object()
+            standby.run()
+        standby.reddit.retrieve_new_posts.assert_called_once_with(
+            before=None
+        )
+
+
+class TestFencedActions(TestCase):
+    def setUp(self):
+        self.server = FakeRedditServer(ApiConfig(ratelimit=10**9)).start()
+        self.addCleanup(self.server.stop)
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+
+    def test_stale_leader_cannot_act(self):
+        self.server.state.add_post("Story [bad]", "text", "author1")
+        tool = SubredditTool(live_settings(self.server.url))
+        lease = Lease(self.rd, "bot", holder="old")
+        tool.fence = lease.check
+        with capture_logs():
+            lease.acquire()
+            post = next(iter(tool.retrieve_new_posts()))
+            self.rd.delete(lease.key)
+            Lease(self.rd, "bot", holder="new").acquire()
+            with self.assertRaises(NotLeader):
+                tool.delete_post(post)
+        self.assertEqual(self.server.state.actions, [])
+
+    def test_warm_flair_index_skips_flair_choices(self):
+        self.server.state.add_post("Story [Part 1]", "text", "author1")
+        tool = SubredditTool(live_settings(self.server.url))
+        with capture_logs():
+            tool.warm()
+            post = next(iter(tool.retrieve_new_posts()))
+            before = tool.api_calls.total
+            tool.set_series_flair(post, name="flair - series")
+        # just the selectflair call, no flairselector first
+        self.assertEqual(tool.api_calls.total - before, 1)
+        self.assertEqual(
+            self.server.state.posts[post.id]["link_flair_text"], "Series"
+        )
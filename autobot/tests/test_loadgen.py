@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from structlog.testing import capture_logs
+
+from benchmarks.fake_api import ApiConfig, FakeRedditServer
+from benchmarks.loadgen import live_settings, run_step
+from autobot.util.reddit_util import SubredditTool
+
+
+class TestFakeApi(TestCase):
+    def setUp(self):
+        self.server = FakeRedditServer(ApiConfig(ratelimit=10**9)).start()
+        self.addCleanup(self.server.stop)
+
+    def test_new_returns_posts_after_before(self):
+        state = self.server.state
+        first = state.add_post("Story [Part 1]", "text", "author1")
+        later = [
+            state.add_post(f"Story {i}", "text", "author2") for i in range(3)
+        ]
+        tool = SubredditTool(live_settings(self.server.url))
+        posts = list(tool.retrieve_new_posts())
+        self.assertEqual(len(posts), 4)
+
+        before = next(p for p in posts if p.id == first["id"])
+        newer = [p.id for p in tool.retrieve_new_posts(before=before)]
+        self.assertEqual(newer, [p["id"] for p in reversed(later)])
+        self.assertGreater(tool.api_calls.total, 0)
+
+    def test_actions_are_recorded(self):
+        post = self.server.state.add_post("Story [bad]", "text", "author1")
+        tool = SubredditTool(live_settings(self.server.url))
+        submission = next(iter(tool.retrieve_new_posts()))
+        tool.add_comment(submission, "removed", distinguish=True, lock=True)
+        tool.delete_post(submission)
+        tool.set_series_flair(submission, name="flair - series")
+
+        actions = [a for _, a, _ in self.server.state.actions]
+        self.assertEqual(
+            actions, ["comment", "distinguish", "lock", "remove", "flair"]
+        )
+        self.assertTrue(tool.is_post_deleted(post["id"]))
+
+
+class TestLoadGenerator(TestCase):
+    def test_bot_keeps_up_with_a_light_load(self):
+        with capture_logs():
+            step = run_step(
+                20,
+                duration=1,
+                interval=0.25,
+                api=ApiConfig(ratelimit=10**9)
+            )
+        self.assertGreater(step.posts, 0)
+        self.assertEqual(step.missed, 0)
+        self.assertTrue(step.seen_latency)
+        self.assertTrue(step.actions)
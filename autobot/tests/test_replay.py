@@ -0,0 +1,64 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+import fakeredis
+from structlog.testing import capture_logs
+
+from autobot.autobot import AutoBot
+from autobot.util.messages.templater import MessageBuilder
+from autobot.util.recorder import TraceRecorder
+from benchmarks.fakes import FakeSubredditTool, fake_post
+from benchmarks.replay import load_trace, replay, synthesize
+from benchmarks.suite import TEMPLATE_DIR, bench_settings
+
+
+class TestRecordReplay(TestCase):
+    def test_replay_makes_the_recorded_decisions(self):
+        now = time.time()
+        tool = FakeSubredditTool([
+            fake_post("a", title="Story [Part 1]", created=now - 60),
+            fake_post("b", title="Story [bad]", author="b", created=now - 30),
+        ])
+        with tempfile.TemporaryDirectory() as d:
+            trace = Path(d) / "trace.jsonl"
+            recorder = TraceRecorder(tool, trace)
+            bot = AutoBot(
+                bench_settings(),
+                fakeredis.FakeRedis(decode_responses=True),
+                MessageBuilder(TEMPLATE_DIR),
+                reddit=recorder
+            )
+            bot.fetch_new()
+            bot.process_previous()
+            # a second post by the same author inside the time limit
+            tool.add_posts([
+                fake_post("c", title="Again", author="author1", created=now)
+            ])
+            bot.fetch_new()
+            bot.process_previous()
+            recorder.close()
+            lines = trace.read_text().splitlines()
+
+        live = sorted(tool.actions)
+        cycles = load_trace(lines)
+        self.assertEqual(len(cycles), 2)
+        # posts are only written out when they're new or changed
+        self.assertEqual(sum(len(c.posts) for c in cycles), 4)
+
+        report = replay(cycles)
+        self.assertEqual(report.cycles, 2)
+        self.assertEqual(
+            report.decisions["remove"],
+            sum(1 for a, _ in live if a == "remove")
+        )
+        self.assertEqual(report.decisions["remove"], 2)
+        self.assertEqual(report.api_calls["GET /r/{name}/new"], 2)
+
+    def test_synthetic_day_replays_quickly(self):
+        with capture_logs():
+            report = replay(load_trace(synthesize(0.25, seed=1)))
+        self.assertEqual(report.cycles, 720)
+        self.assertGreater(report.virtual_seconds / report.wall_seconds, 100)
+        self.assertGreater(report.decisions["remove"], 0)
@@ -0,0 +1,785 @@
+import contextlib
+import datetime
+import io
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+import fakeredis
+from mako.lookup import TemplateLookup
+from praw.exceptions import RedditAPIException
+from prometheus_client import REGISTRY
+from structlog.testing import capture_logs
+
+from autobot.config import Settings
+from autobot.leader import Lease
+from autobot.models import PostVolume
+from moderation.activity import ReportService
+from moderation.cache import SummaryCache
+from moderation.commands import (
+    ActivityCommand, CommandError, PostsCommand, parse_command
+)
+from moderation.checkpoint import (
+    ModeratorDelivery, WeeklyRunStore, format_status
+)
+from moderation.delivery import (
+    Delivery, DeliveryBatch, DeliveryQueue, TokenBucket, parse_rate_limit
+)
+from moderation.inbox import InboxCursor
+from moderation.metrics import job_context
+from moderation.roster import ModeratorRoster
+from moderation.scheduler import Every, Job, Scheduler, Weekly
+import run_report_service
+
+
+TEMPLATE_DIR = (
+    Path(__file__).resolve().parent.parent.parent / "moderation" / "templates"
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRedditor:
+    def __init__(self, name: str, failures: list[Exception] | None = None):
+        self.name = name
+        self.failures = failures or []
+        self.received: list[tuple[str, str]] = []
+
+    def message(self, *, subject: str, message: str) -> None:
+        if self.failures:
+            raise self.failures.pop(0)
+        self.received.append((subject, message))
+
+
+def rate_limit_ex(msg: str) -> RedditAPIException:
+    return RedditAPIException([["RATELIMIT", msg, "ratelimit"]])
+
+
+_message_ids = iter(range(1, 10**6))
+
+
+def make_message(author, subject: str, body: str) -> SimpleNamespace:
+    n = next(_message_ids)
+    return SimpleNamespace(
+        author=author,
+        subject=subject,
+        body=body,
+        new=True,
+        fullname=f"t4_{n}",
+        created_utc=1_700_000_000 + n
+    )
+
+
+def make_service(rd, moderators: list[FakeRedditor]) -> ReportService:
+    """Builds a ReportService without talking to Reddit."""
+    svc = ReportService.__new__(ReportService)
+    svc.redis = rd
+    svc.log = mock.Mock()
+    svc.subreddit = mock.Mock(display_name="nosleep")
+    svc.worker_client = None
+    svc.local = threading.local()
+    svc.moderators = ModeratorRoster(lambda: moderators)
+    svc.inbox_cursor = InboxCursor(rd, "nosleep")
+    svc.inbox_page_size = 100
+    svc.inbox_backlog = None
+    svc.scheduler = Scheduler(svc.log)
+    svc.workers = 2
+    svc.bucket = TokenBucket(1000.0, 100)
+    svc.delivery = DeliveryQueue(svc.bucket, svc.log)
+    svc.runs = WeeklyRunStore(rd, "nosleep")
+    svc.active_runs = set()
+    svc.summaries = SummaryCache(rd, "nosleep")
+    svc.volume = PostVolume(rd, "nosleep")
+    svc.mako = TemplateLookup([TEMPLATE_DIR])
+    svc.summarize = lambda m: f"report for {m.name}"
+    svc.lease = None
+    svc.leading = False
+    svc.job_jitter = 0.0
+    svc.missed_run_policy = "run_once"
+    svc.inbox_poll = 60
+    return svc
+
+
+class TestDelivery(TestCase):
+    def test_parse_rate_limit(self):
+        msg = (
+            "Looks like you've been doing that a lot. "
+            "Take a break for 5 minutes before trying again."
+        )
+        self.assertEqual(parse_rate_limit(msg), 300)
+        singular = "Take a break for 1 minute before trying again."
+        self.assertEqual(parse_rate_limit(singular), 60)
+        self.assertEqual(parse_rate_limit("Try again later"), None)
+
+    def test_token_bucket_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1.0, 2, clock=clock)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 1.0)
+        clock.now += 1
+        self.assertEqual(bucket.try_acquire(), 0)
+
+    def test_token_bucket_learns_from_rate_limit(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1.0, 2, clock=clock)
+        bucket.penalize(30)
+        self.assertEqual(bucket.rate, 0.5)
+        self.assertAlmostEqual(bucket.try_acquire(), 30)
+        clock.now += 30
+        # the bucket was emptied, so refilling starts after the block
+        self.assertAlmostEqual(bucket.try_acquire(), 2.0)
+        clock.now += 2
+        self.assertEqual(bucket.try_acquire(), 0)
+        bucket.reward()
+        self.assertEqual(bucket.rate, 0.625)
+
+    def test_rate_limited_delivery_is_rescheduled(self):
+        clock = FakeClock()
+        bucket = TokenBucket(100.0, 10, clock=clock)
+        queue = DeliveryQueue(bucket, mock.Mock(), clock=clock)
+        limited = FakeRedditor(
+            "mod1",
+            [rate_limit_ex("Take a break for 2 minutes before trying again.")]
+        )
+        d = Delivery(limited, "subject", "body")
+        with mock.patch("random.randint", return_value=5):
+            queue._deliver(d)
+
+        self.assertFalse(d.delivered)
+        self.assertEqual(len(queue.heap), 1)
+        due, _, queued = queue.heap[0]
+        self.assertIs(queued, d)
+        self.assertEqual(due, clock.now + 125)
+        self.assertEqual(bucket.blocked_until, clock.now + 120)
+
+    def test_delivery_gives_up_on_other_errors(self):
+        queue = DeliveryQueue(TokenBucket(100.0, 10), mock.Mock())
+        broken = FakeRedditor(
+            "mod1",
+            [RedditAPIException([["USER_DOESNT_EXIST", "nope", "to"]])]
+        )
+        done = []
+        d = Delivery(broken, "subject", "body", on_complete=done.append)
+        queue._deliver(d)
+        self.assertEqual(done, [d])
+        self.assertFalse(d.delivered)
+        self.assertFalse(queue.heap)
+
+    def test_batch_finishes_after_all_deliveries(self):
+        finished = threading.Event()
+        results = []
+
+        def on_finished(deliveries):
+            results.extend(deliveries)
+            finished.set()
+
+        queue = DeliveryQueue(TokenBucket(1000.0, 10), mock.Mock())
+        batch = DeliveryBatch(on_finished)
+        mods = [FakeRedditor(f"mod{i}") for i in range(3)]
+        for m in mods:
+            queue.submit(batch.add(Delivery(m, "subject", m.name, "weekly")))
+        batch.close()
+        queue.start()
+        self.assertTrue(finished.wait(5))
+        queue.stop(5)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(d.delivered for d in results))
+        for m in mods:
+            self.assertEqual(m.received, [("subject", m.name)])
+
+
+class TestWeeklyRuns(TestCase):
+    def setUp(self):
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+
+    def test_weekly_run_checkpoints_each_moderator(self):
+        mods = [FakeRedditor("mod1"), FakeRedditor("mod2")]
+        svc = make_service(self.rd, mods)
+        svc.delivery.start()
+        svc.run_weekly_report()
+        self.assertTrue(svc.delivery.join(5))
+        svc.delivery.stop(5)
+
+        run_id = svc.runs.latest_run()
+        self.assertIsNotNone(run_id)
+        self.assertIsNone(svc.runs.current_run())
+        self.assertIsNotNone(svc.runs.last_run())
+        states = svc.runs.states(run_id)
+        self.assertEqual(set(states), {"mod1", "mod2"})
+        self.assertTrue(all(s.status == "delivered" for s in states.values()))
+        self.assertIn("2/2 delivered", format_status(svc.runs))
+
+    def test_restart_resumes_only_undelivered(self):
+        mods = [FakeRedditor(f"mod{i}") for i in range(3)]
+        runs = WeeklyRunStore(self.rd, "nosleep")
+        runs.start_run("20261016T120100Z", [m.name for m in mods])
+        # simulate a crash after the first moderator got their report
+        first = Delivery(mods[0], "subject", "body", "weekly")
+        first.delivered = True
+        first.delivered_at = first.queued_at
+        runs.record(
+            "20261016T120100Z",
+            "mod0",
+            ModeratorDelivery.from_delivery(first)
+        )
+
+        svc = make_service(self.rd, mods)
+        svc.delivery.start()
+        self.assertTrue(svc.resume_weekly_report())
+        self.assertTrue(svc.delivery.join(5))
+        svc.delivery.stop(5)
+
+        self.assertEqual(mods[0].received, [])
+        self.assertEqual(len(mods[1].received), 1)
+        self.assertEqual(len(mods[2].received), 1)
+        self.assertEqual(runs.undelivered("20261016T120100Z"), [])
+        self.assertIsNone(runs.current_run())
+        self.assertFalse(svc.resume_weekly_report())
+
+    def test_stale_run_is_abandoned_for_a_new_one(self):
+        mods = [FakeRedditor("mod1")]
+        runs = WeeklyRunStore(self.rd, "nosleep")
+        runs.start_run("20261001T120100Z", ["mod1"])
+        self.assertGreater(self.rd.ttl(f"{runs.prefix}.current_run"), 0)
+        # started a week and a bit ago and never finished
+        week = datetime.timedelta(days=8).total_seconds()
+        self.rd.hincrby(runs._meta_key("20261001T120100Z"), "started",
+                        -int(week))
+
+        svc = make_service(self.rd, mods)
+        svc.delivery.start()
+        svc.run_weekly_report()
+        self.assertTrue(svc.delivery.join(5))
+        svc.delivery.stop(5)
+
+        self.assertIn("abandoned", runs.meta("20261001T120100Z"))
+        self.assertNotEqual(runs.latest_run(), "20261001T120100Z")
+        self.assertIsNone(runs.current_run())
+        self.assertEqual(len(mods[0].received), 1)
+
+    def test_status_reads_the_report_subreddit(self):
+        runs = WeeklyRunStore(self.rd, "nosleep")
+        runs.start_run("20261016T120100Z", ["mod0"])
+        cfg = Settings.model_construct(
+            subreddit="nosleep+ShortScaryStories",
+            redis_url="redis://localhost"
+        )
+        out = io.StringIO()
+        with mock.patch("redis.Redis.from_url", return_value=self.rd), \
+                contextlib.redirect_stdout(out):
+            run_report_service.show_status(cfg, "")
+        self.assertIn("20261016T120100Z", out.getvalue())
+
+
+class TestSummaryCache(TestCase):
+    def setUp(self):
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+        self.svc = make_service(self.rd, [])
+        now = datetime.datetime(2026, 10, 14, 12, tzinfo=datetime.timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = midnight - datetime.timedelta(days=3)
+        self.now = now
+        # newest first, like the real mod log
+        self.log = [
+            ("approvelink", int(now.timestamp()) - 1),
+            ("approvelink", int(midnight.timestamp()) - 60),
+            ("removelink", int(midnight.timestamp()) - 86400 - 60),
+            ("approvelink", int(self.start.timestamp()) - 60),
+        ]
+        self.svc.get_ts = lambda: (self.start, self.now)
+        self.svc.subreddit.mod.log.side_effect = self.mod_log
+
+    def mod_log(self, action, mod, limit):
+        return [
+            SimpleNamespace(created_utc=ts)
+            for a, ts in self.log if a == action
+        ]
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.svc.generate_summary("mod1")
+        self.assertEqual(first.approvelink, 2)
+        self.assertEqual(first.removelink, 1)
+        self.assertEqual(first.active_days, 3)
+
+        calls = self.svc.subreddit.mod.log.call_count
+        second = self.svc.generate_summary("mod1")
+        self.assertEqual(second, first)
+        self.assertEqual(self.svc.subreddit.mod.log.call_count, calls)
+
+    def test_only_open_day_is_recomputed(self):
+        self.svc.generate_summary("mod1")
+        # a new action once the window bucket has rolled over, plus a
+        # closed-day entry that would be double counted if it were re-read
+        self.now += datetime.timedelta(seconds=self.svc.summaries.bucket)
+        self.log.insert(0, ("removelink", int(self.now.timestamp())))
+        self.log.insert(3, ("removelink", self.log[3][1]))
+
+        summary = self.svc.generate_summary("mod1")
+        self.assertEqual(summary.removelink, 2)
+        self.assertEqual(summary.approvelink, 2)
+        self.assertEqual(summary.active_days, 3)
+
+    def test_prefix_is_extended_by_the_day_that_closed(self):
+        self.svc.generate_summary("mod1")
+        # past midnight, the old open day is closed; entries before the
+        # old boundary would be double counted if they were re-read
+        self.now += datetime.timedelta(days=1)
+        self.log.insert(0, ("approvelink", int(self.now.timestamp()) - 1))
+        self.log.insert(3, ("approvelink", self.log[2][1]))
+
+        summary = self.svc.generate_summary("mod1")
+        self.assertEqual(summary.approvelink, 3)
+        self.assertEqual(summary.removelink, 1)
+        self.assertEqual(summary.active_days, 4)
+        boundary = self.now.replace(hour=0)
+        _, until = self.svc.summaries.get_closed("mod1", self.start, boundary)
+        self.assertEqual(until, boundary)
+
+
+class TestAdhocCommands(TestCase):
+    def setUp(self):
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+        self.mods = [FakeRedditor(f"Mod{i}") for i in range(20)]
+        self.mods.append(FakeRedditor("AutoModerator"))
+        self.svc = make_service(self.rd, self.mods)
+        self.now = datetime.datetime(
+            2026, 10, 14, 12, tzinfo=datetime.timezone.utc
+        )
+        month_start = datetime.datetime(
+            2026, 10, 1, tzinfo=datetime.timezone.utc
+        )
+        self.svc.get_ts = lambda: (month_start, self.now)
+        ts = int(self.now.timestamp())
+        self.log = [
+            SimpleNamespace(mod="Mod1", action="approvelink", created_utc=ts),
+            SimpleNamespace(
+                mod="Mod2", action="removelink", created_utc=ts - 86400
+            ),
+            SimpleNamespace(
+                mod="Mod1",
+                action="removelink",
+                created_utc=ts - 86400 * 5
+            ),
+        ]
+        self.svc.subreddit.mod.log.side_effect = self.mod_log
+        self.svc.reddit = mock.Mock()
+
+    def mod_log(self, action, limit, mod=None):
+        return [
+            a for a in self.log
+            if a.action == action
+            and (mod is None or a.mod.lower() == mod)
+        ]
+
+    def msg(self, author: str, body: str, subject="Moderator Activity"):
+        sender = next(m for m in self.mods if m.name == author)
+        return make_message(sender, subject, body)
+
+    def sweep(self, msgs):
+        self.svc.reddit.inbox.unread.return_value = msgs
+        self.svc.delivery.start()
+        self.svc.process_adhoc_requests()
+        self.assertTrue(self.svc.delivery.join(5))
+        self.svc.delivery.stop(5)
+
+    def test_parse_command(self):
+        self.assertEqual(
+            parse_command("", "Mod1"),
+            ActivityCommand(users=["mod1"], personal=True)
+        )
+        cmd = parse_command(
+            "activity --start 2026-10-01 --end 2026-10-05 mod1,mod2 mod3\n",
+            "Mod1"
+        )
+        self.assertEqual(cmd.users, ["mod1", "mod2", "mod3"])
+        self.assertEqual(cmd.start.day, 1)
+        self.assertEqual(cmd.end.day, 5)
+        self.assertTrue(parse_command("activity all", "Mod1").wants_all())
+        self.assertIsInstance(
+            parse_command("posts --start 2026-10-01 --end 2026-10-02", "x"),
+            PostsCommand
+        )
+        with self.assertRaises(CommandError):
+            parse_command("posts --start 2026-10-01", "Mod1")
+        with self.assertRaises(CommandError):
+            parse_command("activity --start 2026-10-01 all", "Mod1")
+        with self.assertRaises(CommandError):
+            parse_command("activity --start 2026-13-01 --end x all", "Mod1")
+
+    def test_sweep_reads_mod_log_once(self):
+        self.sweep([
+            self.msg("Mod1", "activity all"),
+            self.msg("Mod2", ""),
+            self.msg("Mod3", "activity mod1 mod2 notamod"),
+            self.msg("Mod3", "activity mod1 mod2 notamod"),
+        ])
+
+        # one mod log read per action type for the whole sweep
+        self.assertEqual(
+            self.svc.subreddit.mod.log.call_count,
+            len(ReportService.actions)
+        )
+        (_, all_report), = self.mods[1].received
+        self.assertEqual(all_report.count("|"), 5 * 22)
+        self.assertIn("Mod1|1|1|0|0|2", all_report)
+        self.assertNotIn("AutoModerator|", all_report)
+        (_, personal), = self.mods[2].received
+        self.assertIn("**Post Removals**: 1", personal)
+        (_, some), = self.mods[3].received
+        self.assertIn("Mod2|0|1|0|0|1", some)
+        self.assertIn("Invalid users were specified: notamod", some)
+        marked, = self.svc.reddit.inbox.mark_read.call_args.args
+        self.assertEqual(len(marked), 4)
+        for call in self.svc.subreddit.mod.log.call_args_list:
+            self.assertNotIn("mod", call.kwargs)
+
+    def test_few_moderators_filter_the_mod_log(self):
+        self.sweep([
+            self.msg("Mod1", ""),
+            self.msg("Mod3", "activity mod1 mod2"),
+        ])
+
+        # a filtered read per moderator and action type
+        calls = self.svc.subreddit.mod.log.call_args_list
+        self.assertEqual(len(calls), 2 * len(ReportService.actions))
+        self.assertEqual(
+            {c.kwargs["mod"] for c in calls}, {"mod1", "mod2"}
+        )
+        (_, reply), = self.mods[3].received
+        self.assertIn("Mod1|1|1|0|0|2", reply)
+        self.assertIn("Mod2|0|1|0|0|1", reply)
+
+    def test_invalid_command_gets_usage(self):
+        self.sweep([self.msg("Mod1", "posts --start yesterday")])
+        (_, reply), = self.mods[1].received
+        self.assertIn("command was invalid: `posts --start yesterday`", reply)
+        self.assertIn("## Get Moderator Activity", reply)
+
+    def test_posts_report(self):
+        self.sweep([
+            self.msg("Mod1", "posts --start 2026-10-08 --end 2026-10-13")
+        ])
+        (_, reply), = self.mods[1].received
+        self.assertIn("2026-10-09|n/a|n/a|n/a|n/a|0|1", reply)
+        self.assertIn("2026-10-13|n/a|n/a|n/a|n/a|0|1", reply)
+        self.assertNotIn("2026-10-14", reply.split("Chart")[1])
+
+    def test_posts_report_uses_post_volume(self):
+        day = datetime.datetime(2026, 10, 9, 15, tzinfo=datetime.timezone.utc)
+        self.svc.volume.record(day, submitted=3, removed_rule=1, series=1)
+        self.svc.volume.record(day.timestamp(), removed_timelimit=1)
+        self.svc.volume.flush()
+        self.sweep([
+            self.msg("Mod1", "posts --start 2026-10-09 --end 2026-10-10")
+        ])
+        (_, reply), = self.mods[1].received
+        self.assertIn("2026-10-09|3|1|1|1|0|1", reply)
+        self.assertIn("2026-10-10|n/a|n/a|n/a|n/a|0|0", reply)
+
+    def test_ignores_non_moderators(self):
+        stranger = make_message(
+            SimpleNamespace(name="stranger"),
+            "moderator activity",
+            "activity all"
+        )
+        self.sweep([stranger, self.msg("Mod1", "hi", subject="hello")])
+        self.assertEqual(self.svc.subreddit.mod.log.call_count, 0)
+        marked, = self.svc.reddit.inbox.mark_read.call_args.args
+        self.assertEqual(len(marked), 2)
+
+
+class TestInboxSweep(TestCase):
+    def setUp(self):
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+        self.mods = [FakeRedditor("Mod1")]
+        self.svc = make_service(self.rd, self.mods)
+        self.svc.reddit = mock.Mock()
+        self.svc.summarize = mock.Mock()
+        self.svc.answer = mock.Mock(return_value="reply")
+        self.svc.delivery = mock.Mock()
+
+    def test_sweep_resumes_after_cursor(self):
+        first = make_message(self.mods[0], "moderator activity", "")
+        self.svc.reddit.inbox.unread.return_value = [first]
+        self.svc.process_adhoc_requests()
+        self.assertEqual(
+            self.svc.inbox_cursor.get(),
+            (first.fullname, first.created_utc)
+        )
+
+        # the cursor is used from now on; read items in the page are
+        # skipped, and the first message isn't answered twice
+        second = make_message(self.mods[0], "moderator activity", "posts")
+        seen = make_message(self.mods[0], "moderator activity", "")
+        seen.new = False
+        self.svc.reddit.inbox.all.return_value = [second, seen]
+        self.svc.reddit.inbox.unread.reset_mock()
+        self.svc.process_adhoc_requests()
+        self.svc.reddit.inbox.all.assert_called_with(
+            limit=100,
+            params={"before": first.fullname}
+        )
+        self.svc.reddit.inbox.unread.assert_not_called()
+        self.assertEqual(self.svc.answer.call_count, 2)
+        self.assertEqual(
+            self.svc.inbox_cursor.get(),
+            (seen.fullname, seen.created_utc)
+        )
+
+    def test_handled_but_unread_messages_are_only_marked_read(self):
+        old = make_message(self.mods[0], "moderator activity", "")
+        self.svc.inbox_cursor.advance("t4_newer", old.created_utc + 1)
+        self.svc.reddit.inbox.all.return_value = []
+        self.svc.reddit.inbox.unread.return_value = [old]
+        self.svc.process_adhoc_requests()
+        self.svc.answer.assert_not_called()
+        self.svc.reddit.inbox.mark_read.assert_called_once_with([old])
+
+    def fake_inbox(self, msgs):
+        """Serves `msgs` (oldest first) like Reddit's inbox listings."""
+        def unread(limit):
+            return [m for m in reversed(msgs) if m.new][:limit]
+
+        def all_(limit, params):
+            anchor = next(m for m in msgs if m.fullname == params["before"])
+            newer = [m for m in msgs if m.created_utc > anchor.created_utc]
+            return list(reversed(newer[:limit]))
+
+        def mark_read(items):
+            for m in items:
+                m.new = False
+
+        inbox = self.svc.reddit.inbox
+        inbox.unread.side_effect = unread
+        inbox.all.side_effect = all_
+        inbox.mark_read.side_effect = mark_read
+
+    def test_backlog_larger_than_a_page_is_answered(self):
+        self.svc.inbox_page_size = 2
+        msgs = [
+            make_message(self.mods[0], "moderator activity", f"activity m{i}")
+            for i in range(3)
+        ]
+        self.fake_inbox(msgs)
+        self.svc.process_adhoc_requests()
+        # a page at a time, and the cursor waits for the rest
+        self.assertEqual(self.svc.answer.call_count, 2)
+        self.assertIsNone(self.svc.inbox_cursor.get())
+        for _ in range(2):
+            self.svc.process_adhoc_requests()
+        # none dropped behind the cursor
+        self.assertEqual(
+            sorted(c.args[1] for c in self.svc.answer.call_args_list),
+            ["activity m0", "activity m1", "activity m2"]
+        )
+        self.assertFalse(any(m.new for m in msgs))
+        self.assertEqual(self.svc.inbox_cursor.get()[0], msgs[-1].fullname)
+        # never more than a page per listing
+        self.assertEqual(
+            {c.kwargs["limit"]
+             for c in self.svc.reddit.inbox.unread.call_args_list},
+            {2}
+        )
+
+    def test_cursor_stays_put_if_the_sweep_fails(self):
+        msg = make_message(self.mods[0], "moderator activity", "")
+        self.fake_inbox([msg])
+        self.svc.reddit.inbox.mark_read.side_effect = RuntimeError
+        with self.assertRaises(RuntimeError):
+            self.svc.process_adhoc_requests()
+        self.assertIsNone(self.svc.inbox_cursor.get())
+
+    def test_full_page_triggers_another_sweep(self):
+        self.svc.inbox_page_size = 2
+        self.svc.scheduler.add(
+            Job("adhoc", self.svc.process_adhoc_requests, Every(600))
+        )
+        job = self.svc.scheduler.jobs["adhoc"]
+        self.svc.reddit.inbox.unread.return_value = [
+            make_message(None, "spam", "") for _ in range(2)
+        ]
+        self.svc.process_adhoc_requests()
+        self.assertLessEqual(job.due, self.svc.scheduler.clock())
+
+    def test_sweep_metrics_are_labeled_by_job(self):
+        def count(outcome):
+            return REGISTRY.get_sample_value(
+                "report_inbox_messages_total",
+                {"job": "adhoc", "outcome": outcome}
+            ) or 0
+
+        def sweeps():
+            return REGISTRY.get_sample_value(
+                "report_inbox_sweep_seconds_count",
+                {"job": "adhoc"}
+            ) or 0
+
+        before = {o: count(o) for o in ("handled", "ignored", "duplicate")}
+        swept = sweeps()
+        self.svc.reddit.inbox.unread.return_value = [
+            make_message(self.mods[0], "moderator activity", "activity"),
+            make_message(self.mods[0], "moderator activity", "activity"),
+            make_message(None, "spam", "")
+        ]
+        with job_context("adhoc"):
+            self.svc.process_adhoc_requests()
+        self.assertEqual(count("handled") - before["handled"], 1)
+        self.assertEqual(count("duplicate") - before["duplicate"], 1)
+        self.assertEqual(count("ignored") - before["ignored"], 1)
+        self.assertEqual(sweeps() - swept, 1)
+
+    def test_roster_refreshes_after_ttl(self):
+        clock = FakeClock()
+        loads = []
+
+        def loader():
+            loads.append(clock.now)
+            return [FakeRedditor("NewMod")] if len(loads) > 1 else []
+
+        roster = ModeratorRoster(loader, ttl=60, clock=clock)
+        self.assertNotIn("newmod", roster)
+        clock.now += 30
+        self.assertNotIn("newmod", roster)
+        clock.now += 30
+        self.assertIn("NEWMOD", roster)
+        self.assertEqual(roster.get("newmod").name, "NewMod")
+        self.assertEqual(len(loads), 2)
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        # Wednesday 2026-10-14 12:00 UTC
+        self.clock = FakeClock(
+            datetime.datetime(
+                2026, 10, 14, 12, tzinfo=datetime.timezone.utc
+            ).timestamp()
+        )
+        self.sched = Scheduler(mock.Mock(), clock=self.clock)
+        self.ran: list[str] = []
+
+    def job(self, name: str, schedule, **kwargs) -> Job:
+        return self.sched.add(
+            Job(name, lambda: self.ran.append(name), schedule, **kwargs)
+        )
+
+    def test_weekly_schedule(self):
+        friday = Weekly(4, "12:01")
+        due = datetime.datetime.fromtimestamp(
+            friday.next_after(self.clock.now), tz=datetime.timezone.utc
+        )
+        self.assertEqual((due.day, due.hour, due.minute), (16, 12, 1))
+        prev = datetime.datetime.fromtimestamp(
+            friday.previous(self.clock.now), tz=datetime.timezone.utc
+        )
+        self.assertEqual((prev.day, prev.hour, prev.minute), (9, 12, 1))
+
+    def test_sleeps_until_next_due_job(self):
+        self.job("adhoc", Every(600))
+        self.job("weekly", Weekly(4, "12:01"))
+        self.assertEqual(self.sched.run_pending(), self.clock.now + 600)
+        self.assertEqual(self.ran, [])
+        self.clock.now += 600
+        self.assertEqual(self.sched.run_pending(), self.clock.now + 600)
+        self.assertEqual(self.ran, ["adhoc"])
+
+    def test_watcher_triggers_job_immediately(self):
+        self.job("adhoc", Every(600))
+        mail = [False]
+        self.sched.watch("adhoc", lambda: mail[0], 30)
+        self.assertEqual(self.sched.run_pending(), self.clock.now + 30)
+        self.clock.now += 30
+        mail[0] = True
+        self.sched.run_pending()
+        self.assertEqual(self.ran, ["adhoc"])
+
+    def test_missed_run_policies(self):
+        prev = Weekly(4, "12:01").previous(self.clock.now)
+        self.job("catchup", Weekly(4, "12:01"), last_run=lambda: prev - 10)
+        self.job(
+            "skipped",
+            Weekly(4, "12:01"),
+            missed="skip",
+            last_run=lambda: prev - 10
+        )
+        self.job("never", Weekly(4, "12:01"), last_run=lambda: None)
+        self.sched.run_pending()
+        self.assertEqual(self.ran, ["catchup"])
+
+    def test_late_job_is_skipped(self):
+        job = self.job("slow", Every(60), missed="skip", grace=5)
+        self.clock.now += 120
+        self.sched.run_pending()
+        self.assertEqual(self.ran, [])
+        self.assertEqual(job.due, self.clock.now + 60)
+
+
+class TestReportLeader(TestCase):
+    """Two report service processes sharing Redis, one on standby."""
+
+    def setUp(self):
+        self.enterContext(capture_logs())
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+        self.mods = [FakeRedditor("Mod1")]
+        self.msg = make_message(self.mods[0], "moderator activity", "")
+        self.services = []
+        for holder in ("leader", "standby"):
+            svc = make_service(self.rd, self.mods)
+            svc.lease = Lease(self.rd, "reportservice.nosleep", holder=holder)
+            svc.delivery = DeliveryQueue(
+                svc.bucket, svc.log, fence=svc.lease.check
+            )
+            svc.reddit = mock.Mock()
+            svc.reddit.inbox.all.return_value = []
+            svc.reddit.inbox.unread.return_value = [self.msg]
+            svc.reddit.user.me.return_value.inbox_count = 1
+            svc.answer = mock.Mock(return_value="reply")
+            svc.run_weekly_report = mock.Mock()
+            svc.add_jobs()
+            self.services.append(svc)
+        self.leader, self.standby = self.services
+        self.assertTrue(self.leader.is_leader())
+
+    def run_jobs(self, svc):
+        with job_context("test"):
+            for job in svc.scheduler.jobs.values():
+                job.func()
+            return svc.scheduler.watchers[0].check()
+
+    def test_only_the_leader_runs_jobs(self):
+        self.assertFalse(self.run_jobs(self.standby))
+        self.assertTrue(self.run_jobs(self.leader))
+        self.standby.answer.assert_not_called()
+        self.standby.run_weekly_report.assert_not_called()
+        self.standby.reddit.user.me.assert_not_called()
+        self.leader.answer.assert_called_once()
+        self.leader.run_weekly_report.assert_called_once()
+        self.assertEqual(self.leader.delivery.pending(), 1)
+        self.assertEqual(self.standby.delivery.pending(), 0)
+
+    def test_standby_takes_over_the_weekly_run(self):
+        self.leader.runs.start_run("run1", ["Mod1"])
+        # the leader dies without delivering anything
+        self.rd.delete(self.leader.lease.key)
+        self.run_jobs(self.standby)
+        # the resumed weekly report and the ad-hoc reply
+        self.assertEqual(self.standby.delivery.pending(), 2)
+        self.assertEqual(self.standby.active_runs, {"run1"})
+
+        # and the old leader's PMs no longer go out
+        self.assertFalse(self.leader.is_leader())
+        self.leader.delivery.submit(
+            Delivery(self.mods[0], "title", "report", "weekly")
+        )
+        self.leader.delivery.start()
+        self.assertTrue(self.leader.delivery.join(5))
+        self.leader.delivery.stop(5)
+        self.assertEqual(self.mods[0].received, [])
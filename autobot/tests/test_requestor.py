@@ -0,0 +1,196 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+import praw
+import structlog
+from prometheus_client import REGISTRY
+
+from autobot.util.reddit_util import SubredditTool
+from autobot.util.requestor import (
+    AccountingRequestor, ApiCalls, endpoint_name
+)
+from autobot.util.scope import spending
+from moderation.scheduler import Every, Job, Scheduler
+
+
+def listing(*children: dict) -> dict:
+    return {
+        "kind": "Listing",
+        "data": {"after": None, "before": None, "children": list(children)}
+    }
+
+
+def link(pid: str) -> dict:
+    return {
+        "kind": "t3",
+        "data": {
+            "id": pid,
+            "name": f"t3_{pid}",
+            "title": "A story",
+            "created_utc": 1700000000,
+            "author": "author1",
+            "is_robot_indexable": True
+        }
+    }
+
+
+class FakeReddit(BaseHTTPRequestHandler):
+    """Just enough of the Reddit API to log in and read posts. Every
+    request it answers is appended to `server.seen`."""
+
+    def _send(self, body: object) -> None:
+        self.server.seen.append((self.command, self.path))
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Ratelimit-Used", str(len(self.server.seen)))
+        self.send_header(
+            "X-Ratelimit-Remaining",
+            str(600.0 - len(self.server.seen))
+        )
+        self.send_header("X-Ratelimit-Reset", "120")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send({
+            "access_token": "token",
+            "expires_in": 3600,
+            "scope": "*",
+            "token_type": "bearer"
+        })
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/comments/"):
+            pid = self.path.split("/")[2]
+            self._send([listing(link(pid)), listing()])
+        else:
+            self._send(listing(link("a"), link("b")))
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def request_count(client: str, endpoint: str, caller: str) -> float:
+    return REGISTRY.get_sample_value(
+        "reddit_api_requests_total",
+        {
+            "client": client,
+            "endpoint": endpoint,
+            "caller": caller,
+            "status": "200"
+        }
+    ) or 0
+
+
+class TestApiAccounting(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeReddit)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        self.calls = ApiCalls("test")
+        self.reddit = praw.Reddit(
+            client_id="id",
+            client_secret="secret",
+            user_agent="autobot tests",
+            username="bot",
+            password="password",
+            oauth_url=url,
+            reddit_url=url,
+            requestor_class=AccountingRequestor,
+            requestor_kwargs={"calls": self.calls},
+            check_for_updates=False
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_endpoint_name(self):
+        self.assertEqual(
+            endpoint_name("get", "https://oauth.reddit.com/r/nosleep/new"),
+            "GET /r/{name}/new"
+        )
+        self.assertEqual(
+            endpoint_name("GET", "https://oauth.reddit.com/comments/abc/"),
+            "GET /comments/{id}"
+        )
+        self.assertEqual(
+            endpoint_name("POST", "https://oauth.reddit.com/api/del_msg"),
+            "POST /api/del_msg"
+        )
+
+    def test_counts_match_requests_served(self):
+        posts = list(self.reddit.subreddit("nosleep").new(limit=10))
+        self.assertEqual([p.id for p in posts], ["a", "b"])
+        mark = self.calls.total
+        for pid in ("x", "y", "z"):
+            self.reddit.submission(pid).title
+
+        self.assertEqual(self.calls.total, len(self.server.seen))
+        self.assertEqual(self.calls.spent_since(mark), 3)
+        self.assertEqual(self.calls.by_endpoint["GET /comments/{id}"], 3)
+        self.assertEqual(self.calls.by_endpoint["GET /r/{name}/new"], 1)
+        self.assertEqual(self.calls.used, len(self.server.seen))
+        self.assertEqual(self.calls.remaining, 600 - len(self.server.seen))
+        self.assertEqual(self.calls.reset, 120)
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "reddit_ratelimit_remaining",
+                {"client": "test"}
+            ),
+            self.calls.remaining
+        )
+
+    def test_requests_are_attributed_to_calling_code(self):
+        tool = SubredditTool.__new__(SubredditTool)
+        tool.reddit = self.reddit
+        caller = "autobot.util.reddit_util.SubredditTool.is_post_deleted"
+        before = request_count("test", "GET /comments/{id}", caller)
+        self.assertFalse(tool.is_post_deleted("a"))
+        self.assertEqual(
+            request_count("test", "GET /comments/{id}", caller),
+            before + 1
+        )
+
+    def test_sharers_of_a_client_count_their_own_calls(self):
+        # the bot's cycle runs while a report job is half done
+        started, cycled = threading.Event(), threading.Event()
+
+        def job():
+            self.reddit.submission("x").title
+            started.set()
+            cycled.wait(5)
+            self.reddit.submission("y").title
+
+        def cycle():
+            started.wait(5)
+            with spending("cycle"):
+                for pid in ("a", "b", "c"):
+                    self.reddit.submission(pid).title
+            cycled.set()
+
+        self.reddit.submission("w").title  # logs in
+        total = self.calls.total
+        scheduler = Scheduler(structlog.get_logger(), api_calls=self.calls)
+        before = job_calls("shared") or 0
+        bot = threading.Thread(target=cycle)
+        bot.start()
+        scheduler._run(Job("shared", job, Every(60)), 0.0)
+        bot.join()
+
+        self.assertEqual(self.calls.total - total, 5)
+        self.assertEqual(self.calls.count("cycle"), 3)
+        self.assertEqual(self.calls.count("job.shared"), 2)
+        self.assertEqual(job_calls("shared") - before, 2)
+
+
+def job_calls(job: str) -> float | None:
+    return REGISTRY.get_sample_value(
+        "report_job_api_calls_sum", {"job": job}
+    )
@@ -0,0 +1,184 @@
+from pathlib import Path
+from unittest import TestCase, mock
+
+import os
+import signal
+import threading
+import time
+
+import fakeredis
+from structlog.testing import capture_logs
+
+from autobot.autobot import AutoBot
+from autobot.checkpoint import Checkpoint
+from autobot.config import Settings
+from autobot.leader import Lease, NotLeader
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fakes import FakeSubredditTool, fake_post
+import run_bot
+
+TEMPLATE_DIR = (
+    Path(__file__).resolve().parent.parent / "util" / "messages" / "templates"
+)
+NEW = "GET /r/{name}/new"
+
+
+class Killed(BaseException):
+    """Stands in for the process being killed partway through a post."""
+    ...
+
+
+def make_posts() -> list:
+    now = time.time()
+    return [
+        fake_post("a", created=now - 30, author="author1"),
+        fake_post("b", title="Story [bad]", created=now - 20,
+                  author="author2"),
+        fake_post("c", created=now - 10, author="author3"),
+    ]
+
+
+def make_bot(rd, tool: FakeSubredditTool) -> AutoBot:
+    settings = Settings.model_construct(
+        subreddit="nosleep", development_mode=True
+    )
+    return AutoBot(settings, rd, MessageBuilder(TEMPLATE_DIR), reddit=tool)
+
+
+class TestShutdown(TestCase):
+    def setUp(self):
+        self.rd = fakeredis.FakeRedis(decode_responses=True)
+
+    def test_stop_resumes_from_the_cursor(self):
+        tool = FakeSubredditTool(make_posts())
+        bot = make_bot(self.rd, tool)
+        remove = tool.delete_post
+
+        def remove_then_stop(post):
+            remove(post)
+            bot.stop()
+
+        tool.delete_post = remove_then_stop
+        with capture_logs():
+            bot.run(forever=True, interval=30)
+        # b was finished, c was left alone
+        self.assertEqual(tool.actions, [("comment", "b"), ("remove", "b")])
+        self.assertEqual(
+            sorted(self.rd.keys("submission.*")),
+            ["submission.nosleep.a", "submission.nosleep.b"]
+        )
+        self.assertEqual(bot.checkpoint.cursor, "a")
+
+        again = FakeSubredditTool(tool.posts.values())
+        again.deleted = tool.deleted
+        listings = []
+        listing = again.retrieve_new_posts
+
+        def retrieve_new_posts(*, before=None):
+            listings.append(before.id if before else None)
+            return listing(before=before)
+
+        again.retrieve_new_posts = retrieve_new_posts
+        with capture_logs():
+            make_bot(self.rd, again).run()
+        # one /new read, newer than the cursor, and b isn't handled again
+        self.assertEqual(listings, ["a"])
+        self.assertEqual(again.api_calls.by_endpoint[NEW], 1)
+        self.assertEqual(again.actions, [])
+        self.assertTrue(self.rd.exists("submission.nosleep.c"))
+        self.assertEqual(
+            self.rd.hgetall("checkpoint.nosleep"), {"cursor": "c"}
+        )
+
+    def test_interrupted_post_is_finished_once(self):
+        tool = FakeSubredditTool(make_posts())
+
+        def killed(post):
+            raise Killed
+
+        tool.delete_post = killed
+        with capture_logs(), self.assertRaises(Killed):
+            make_bot(self.rd, tool).run()
+        self.assertEqual(tool.actions, [("comment", "b")])
+        self.assertFalse(self.rd.exists("submission.nosleep.b"))
+
+        again = FakeSubredditTool(tool.posts.values())
+        with capture_logs():
+            make_bot(self.rd, again).run()
+        # the comment isn't posted twice
+        self.assertEqual(again.actions, [("remove", "b")])
+        self.assertTrue(self.rd.exists("submission.nosleep.b"))
+        self.assertTrue(self.rd.exists("submission.nosleep.c"))
+        self.assertNotIn("post.b", self.rd.hgetall("checkpoint.nosleep"))
+
+    def test_posts_since_the_last_snapshot_stay_seen(self):
+        a, *rest = make_posts()
+        tool = FakeSubredditTool([a])
+        bot = make_bot(self.rd, tool)
+        with capture_logs():
+            bot.run()
+
+        def killed():
+            raise Killed
+
+        tool.add_posts(rest)
+        bot.flush = killed
+        with capture_logs(), self.assertRaises(Killed):
+            bot.run()
+        self.assertEqual(tool.actions, [("comment", "b"), ("remove", "b")])
+
+        # the seen filter snapshot only has a, but the checkpoint marks b
+        # and c as persisted, so they aren't handled again
+        again = FakeSubredditTool(tool.posts.values())
+        again.deleted = tool.deleted
+        with capture_logs():
+            make_bot(self.rd, again).run()
+        self.assertEqual(again.actions, [])
+        self.assertEqual(
+            self.rd.hgetall("checkpoint.nosleep"), {"cursor": "a"}
+        )
+
+    def test_checkpoint_is_written_once_per_cycle(self):
+        tool = FakeSubredditTool(make_posts())
+        bot = make_bot(self.rd, tool)
+        bot.checkpoint.rd = rd = mock.Mock(wraps=self.rd)
+        with capture_logs():
+            bot.run()
+        self.assertEqual(tool.actions, [("comment", "b"), ("remove", "b")])
+        # the persisted marks go out with each Submission, everything
+        # else in one pipeline at the end of the cycle
+        self.assertEqual(rd.pipeline.call_count, 1)
+        rd.hset.assert_not_called()
+        rd.hdel.assert_not_called()
+        self.assertEqual(
+            self.rd.hgetall("checkpoint.nosleep"), {"cursor": "c"}
+        )
+
+    def test_replaced_leader_cannot_move_the_cursor(self):
+        old = Lease(self.rd, "bot", holder="old")
+        new = Lease(self.rd, "bot", holder="new")
+        stale = Checkpoint(self.rd, "nosleep", fence=old.check)
+        with capture_logs():
+            old.acquire()
+            stale.save("a")
+            # old stalls past its lease and new takes over
+            self.rd.delete(old.key)
+            new.acquire()
+            Checkpoint(self.rd, "nosleep", fence=new.check).save("c")
+            with self.assertRaises(NotLeader):
+                stale.save("b")
+        self.assertEqual(self.rd.hget("checkpoint.nosleep", "cursor"), "c")
+
+    def test_sigint_ends_the_sleep(self):
+        bot = make_bot(self.rd, FakeSubredditTool(make_posts()))
+        run_bot.handle_shutdown(bot)
+        self.addCleanup(signal.signal, signal.SIGINT,
+                        signal.default_int_handler)
+        self.addCleanup(signal.signal, signal.SIGTERM, signal.SIG_DFL)
+        threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT)).start()
+        started = time.monotonic()
+        with capture_logs() as logs:
+            bot.run(forever=True, interval=30)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(logs[-1]["event"], "Stopped")
+        self.assertEqual(self.rd.hget("checkpoint.nosleep", "cursor"), "c")
@@ -0,0 +1,119 @@
+from pathlib import Path
+from unittest import TestCase
+
+import subprocess
+import sys
+
+import fakeredis
+import structlog
+from structlog.testing import capture_logs
+
+from autobot.autobot import AutoBot
+from autobot.config import Settings
+from autobot.leader import Lease
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fake_api import ApiConfig, FakeRedditServer, live_settings
+from benchmarks.fakes import FakeSubredditTool, fake_post
+from benchmarks.suite import TEMPLATE_DIR
+import run_bot
+
+ROOT = Path(__file__).resolve().parents[2]
+# only needed once startup is under way, or for optional features
+DEFERRED = (
+    "mako", "pygments", "praw", "prawcore", "requests", "moderation",
+    "autobot.util.recorder"
+)
+
+
+def import_times(module: str) -> dict[str, float]:
+    """Seconds each module took to import, children included, when
+    `module` is imported in a fresh interpreter."""
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    # the first run writes the bytecode so the second one measures imports
+    subprocess.run(cmd, cwd=ROOT, capture_output=True, check=True)
+    out = subprocess.run(
+        cmd, cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+class TestStartup(TestCase):
+    def test_heavy_imports_are_deferred(self):
+        # how long they take is the startup.import benchmark's business
+        times = import_times("run_bot")
+        self.assertIn("run_bot", times)
+        deferred = [m for m in times if m.startswith(DEFERRED)]
+        self.assertEqual(deferred, [])
+
+    def test_startup_check_stops_a_slow_start(self):
+        def bot(
+            budget: float,
+            lease: Lease | None = None
+        ) -> tuple[AutoBot, FakeSubredditTool]:
+            settings = Settings.model_construct(
+                subreddit="nosleep",
+                development_mode=True,
+                startup_budget=budget,
+                leader_poll_interval=1.0
+            )
+            tool = FakeSubredditTool([fake_post("a")])
+            bot = AutoBot(
+                settings,
+                rd,
+                MessageBuilder(TEMPLATE_DIR),
+                reddit=tool,
+                lease=lease
+            )
+            bot.on_started = lambda: run_bot.check_startup(
+                settings, structlog.get_logger(), strict=True
+            )
+            return bot, tool
+
+        rd = fakeredis.FakeRedis(decode_responses=True)
+
+        slow, tool = bot(0.0)
+        with capture_logs(), self.assertRaises(run_bot.SlowStartup):
+            slow.run()
+        self.assertEqual(tool.actions, [])
+        self.assertEqual(tool.api_calls.total, 0)
+
+        fast, tool = bot(10**9)
+        with capture_logs() as logs:
+            fast.run()
+        self.assertTrue(fast.latest_post)
+        self.assertEqual(
+            [e["event"] for e in logs].count("Startup finished"), 1
+        )
+
+        # a standby is checked as it starts, not when it's promoted
+        with capture_logs() as logs:
+            Lease(rd, "bot", holder="active").acquire()
+            standby, tool = bot(10**9, Lease(rd, "bot", holder="standby"))
+            standby.run()
+        self.assertIn("Startup finished", [e["event"] for e in logs])
+        with capture_logs() as logs:
+            rd.delete("leader.bot")
+            standby.run()
+        self.assertEqual(tool.api_calls.by_endpoint["GET /r/{name}/new"], 1)
+        self.assertNotIn("Startup finished", [e["event"] for e in logs])
+
+    def test_warm_up_readies_the_bot(self):
+        server = FakeRedditServer(
+            ApiConfig(ratelimit=10**9, latency=0.2)
+        ).start()
+        self.addCleanup(server.stop)
+        settings = live_settings(server.url)
+        rd = fakeredis.FakeRedis(decode_responses=True)
+        with capture_logs():
+            tool, mb = run_bot.warm_up(settings, rd)
+        # login, moderator check and the flair templates, one after another
+        self.assertEqual(tool.api_calls.total, 3)
+        self.assertIsNotNone(tool.flair_index_loaded)
+        self.assertTrue(mb.create_series_msg("https://redd.it/a"))
@@ -0,0 +1,209 @@
+"""Builds the praw clients used by the bot, the report service and
+activity_tracker.py, so they all get the same pooled keep-alive HTTP
+session, timeouts and retries, and share one OAuth access token through
+Redis instead of each logging in on startup."""
+from typing import Any
+
+import json
+import time
+
+from autobot.config import Settings
+from autobot.util.requestor import AccountingRequestor, ApiCalls, IdleGate
+
+from prawcore import ScriptAuthorizer
+from prometheus_client import Counter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import praw
+import redis
+import requests
+import structlog
+
+
+oauth_tokens = Counter(
+    "reddit_oauth_tokens",
+    "OAuth access tokens taken into use, by client and where they came "
+    "from (redis or reddit)",
+    ["client", "source"]
+)
+moderator_checks = Counter(
+    "reddit_moderator_checks",
+    "Startup checks that the account moderates a subreddit, by client and "
+    "whether they were answered from Redis",
+    ["client", "source"]
+)
+
+# a cached token this close to expiring is not worth handing out
+TOKEN_MARGIN = 60
+
+
+def http_session(cfg: Settings) -> requests.Session:
+    """A keep-alive session whose pool fits the threads that share it.
+    Connection errors and reads that time out on idempotent requests are
+    retried with backoff; prawcore already retries 5xx responses."""
+    retry = Retry(
+        total=cfg.reddit_retries,
+        backoff_factor=cfg.reddit_retry_backoff,
+        status_forcelist=(),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=cfg.reddit_pool_size,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class CachedScriptAuthorizer(ScriptAuthorizer):
+    """A password grant authorizer that keeps its access token in Redis
+    until it expires, so another client for the same account, or this one
+    after a restart, can use it without logging in again. A token Reddit
+    rejects is dropped from Redis too."""
+
+    def __init__(
+        self,
+        authenticator: Any,
+        username: str,
+        password: str,
+        *,
+        rd: redis.Redis,
+        client: str
+    ) -> None:
+        self.rd = rd
+        self.client = client
+        self.key = (
+            f"reddit.token.{authenticator.client_id}.{username}".lower()
+        )
+        self.log = structlog.get_logger().bind(client=client)
+        super().__init__(authenticator, username, password)
+
+    def _clear_access_token(self) -> None:
+        token = getattr(self, "access_token", None)
+        if token is not None:
+            try:
+                cached = self.rd.get(self.key)
+                if cached and json.loads(cached)["access_token"] == token:
+                    self.rd.delete(self.key)
+            except (redis.RedisError, ValueError, KeyError):
+                self.log.exception("Unable to drop cached OAuth token")
+        super()._clear_access_token()
+
+    def _load(self) -> bool:
+        try:
+            cached = self.rd.get(self.key)
+            if not cached:
+                return False
+            token = json.loads(cached)
+            if token["expires_at"] - TOKEN_MARGIN <= time.time():
+                return False
+            self.access_token = token["access_token"]
+            self._expiration_timestamp = token["expires_at"]
+            self.scopes = set(token["scope"].split(" "))
+        except (redis.RedisError, ValueError, KeyError):
+            self.log.exception("Unable to read cached OAuth token")
+            return False
+        return True
+
+    def _store(self) -> None:
+        ttl = int(self._expiration_timestamp - time.time())
+        if ttl <= 0:
+            return
+        token = {
+            "access_token": self.access_token,
+            "expires_at": self._expiration_timestamp,
+            "scope": " ".join(sorted(self.scopes or ())),
+        }
+        try:
+            self.rd.set(self.key, json.dumps(token), ex=ttl)
+        except redis.RedisError:
+            self.log.exception("Unable to cache OAuth token")
+
+    def refresh(self) -> None:
+        if self._load():
+            oauth_tokens.labels(self.client, "redis").inc()
+            return
+        super().refresh()
+        oauth_tokens.labels(self.client, "reddit").inc()
+        self._store()
+
+
+def make_reddit(
+    cfg: Settings,
+    calls: ApiCalls,
+    rd: redis.Redis | None = None,
+    *,
+    session: requests.Session | None = None,
+    gate: IdleGate | None = None
+) -> praw.Reddit:
+    """A praw client for the configured account that records its requests
+    in `calls`. With `rd`, the OAuth token is shared through Redis; pass
+    `session` to share one connection pool between clients, and `gate` to
+    hold other threads' requests while one thread is busy."""
+    reddit = praw.Reddit(
+        user_agent=cfg.user_agent,
+        client_id=cfg.client_id,
+        client_secret=cfg.client_secret,
+        username=cfg.reddit_username,
+        password=cfg.reddit_password,
+        reddit_url=cfg.reddit_url,
+        oauth_url=cfg.reddit_oauth_url,
+        # praw asks PyPI for a newer release on startup otherwise
+        check_for_updates=False,
+        requestor_class=AccountingRequestor,
+        requestor_kwargs={
+            "calls": calls,
+            "session": session or http_session(cfg),
+            "timeout": cfg.reddit_timeout,
+            "gate": gate,
+        }
+    )
+    core = getattr(reddit, "_authorized_core", None)
+    if rd is not None and cfg.reddit_token_cache and core is not None:
+        # praw has no way to pass in the password grant's authorizer, so
+        # swap it on the session it built
+        core._authorizer = CachedScriptAuthorizer(
+            core._authorizer._authenticator,
+            cfg.reddit_username,
+            cfg.reddit_password,
+            rd=rd,
+            client=calls.client
+        )
+    return reddit
+
+
+def user_is_moderator(
+    reddit: praw.Reddit,
+    name: str,
+    *,
+    client: str,
+    rd: redis.Redis | None = None,
+    ttl: int = 0
+) -> bool:
+    """Whether the logged in account moderates `name`. A yes is
+    remembered in Redis for `ttl` seconds, so restarts skip the lookup."""
+    key = f"reddit.moderator.{reddit.config.username}.{name}".lower()
+    if rd is not None and ttl > 0:
+        try:
+            if rd.exists(key):
+                moderator_checks.labels(client, "redis").inc()
+                return True
+        except redis.RedisError:
+            structlog.get_logger().exception(
+                "Unable to read cached moderator check"
+            )
+    moderator_checks.labels(client, "reddit").inc()
+    if not reddit.subreddit(name).user_is_moderator:
+        return False
+    if rd is not None and ttl > 0:
+        try:
+            rd.set(key, 1, ex=ttl)
+        except redis.RedisError:
+            structlog.get_logger().exception(
+                "Unable to cache moderator check"
+            )
+    return True
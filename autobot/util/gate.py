@@ -0,0 +1,30 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import threading
+
+
+class IdleGate:
+    """Gives one thread's requests priority: while that thread is `busy`,
+    requests from every other thread wait until it's done. A request
+    already on the wire finishes first, so the busy thread is held up by
+    at most one request."""
+
+    def __init__(self) -> None:
+        self.idle = threading.Event()
+        self.idle.set()
+        self.owner: int | None = None
+
+    @contextmanager
+    def busy(self) -> Iterator[None]:
+        self.owner = threading.get_ident()
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.owner = None
+            self.idle.set()
+
+    def wait(self) -> None:
+        if threading.get_ident() != self.owner:
+            self.idle.wait()
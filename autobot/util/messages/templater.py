@@ -1,9 +1,59 @@
+from collections.abc import Iterable, Mapping
 from pathlib import PurePath
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote_plus
 
-from mako.lookup import TemplateLookup
+import copy
+
+from autobot.metrics import stage_seconds
+
+if TYPE_CHECKING:
+    from mako.lookup import TemplateLookup
+
+    from autobot.util.reddit_util import SubredditTool
+
+
+def template_lookup(
+    template_dir: PurePath,
+    names: Iterable[str],
+    *,
+    overrides: PurePath | None = None,
+    module_directory: PurePath | None = None,
+    filesystem_checks: bool = True
+) -> "TemplateLookup":
+    """A lookup with `names` already compiled and loaded, so the first
+    message of a process renders as fast as the rest. Templates found in
+    `overrides` are used instead of `template_dir`'s. With a
+    `module_directory`, compiled templates are kept there and reused by
+    later processes. Without `filesystem_checks`, template files aren't
+    stat'ed on every render to look for changes."""
+    # Mako (and the pygments it pulls in) takes a while to import; this
+    # way that happens while run_bot.py is waiting on Reddit
+    from mako.lookup import TemplateLookup
+
+    lookup = TemplateLookup(
+        [overrides, template_dir] if overrides else [template_dir],
+        module_directory=str(module_directory) if module_directory else None,
+        filesystem_checks=filesystem_checks
+    )
+    for name in names:
+        lookup.get_template(name)
+    return lookup
+
+
+def slot(name: str) -> str:
+    """Stands in for a per-post value while a skeleton is rendered. NUL
+    can't occur in templates or in the values filled in later."""
+    return f"\x00{name}\x00"
 
 
 class MessageBuilder:
+    """Renders the bot's messages for `subreddit`, which every template
+    gets along with `rules_url` (the subreddit's rules, its wiki index
+    unless given) and `guide_links` (whether to link r/NoSleepAuthors'
+    guides, by default only for r/nosleep). See `for_subreddit` for
+    replacing the bundled templates."""
+    RULES_URL = "https://www.reddit.com/r/{subreddit}/wiki/index/"
     TEMPLATES = {
         "reapproval": "reapproval.template",
         "series-pm": "series_message.md.template",
@@ -12,20 +62,104 @@ class MessageBuilder:
         "post-deleted": "post_removed.md.template"
     }
 
-    def __init__(self, template_dir: PurePath) -> None:
-        self.mako = TemplateLookup([template_dir])
+    def __init__(
+        self,
+        template_dir: PurePath,
+        *,
+        subreddit: str = "nosleep",
+        rules_url: str | None = None,
+        guide_links: bool | None = None,
+        overrides: PurePath | None = None,
+        module_directory: PurePath | None = None,
+        filesystem_checks: bool = True
+    ) -> None:
+        self.template_dir = template_dir
+        self.subreddit = subreddit
+        self.rules_url = rules_url
+        self.guide_links = guide_links
+        self.module_directory = module_directory
+        self.filesystem_checks = filesystem_checks
+        self.mako = template_lookup(
+            template_dir,
+            self.TEMPLATES.values(),
+            overrides=overrides,
+            module_directory=module_directory,
+            filesystem_checks=filesystem_checks
+        )
+
+        # (template, fixed arguments) -> output with slots for the rest
+        self.skeletons: dict[tuple[Any, ...], str] = {}
 
-    def _render(self, template: str, **kwargs) -> str:
-        t = self.mako.get_template(self.TEMPLATES[template])
-        return t.render(**kwargs)
+    def for_subreddit(
+        self,
+        subreddit: str,
+        template_dir: PurePath | None = None,
+        *,
+        rules_url: str | None = None,
+        guide_links: bool | None = None
+    ) -> "MessageBuilder":
+        """A builder for `subreddit`'s messages. Templates in its own
+        `template_dir` replace the bundled ones; without one, the bundled
+        templates are shared with this builder."""
+        if template_dir is None:
+            builder = copy.copy(self)
+            builder.subreddit = subreddit
+            builder.rules_url = rules_url
+            builder.guide_links = guide_links
+            builder.skeletons = {}
+            return builder
+        # compiled overrides would clash with the bundled templates'
+        modules = self.module_directory
+        return MessageBuilder(
+            self.template_dir,
+            subreddit=subreddit,
+            rules_url=rules_url,
+            guide_links=guide_links,
+            overrides=template_dir,
+            module_directory=(
+                PurePath(modules, subreddit.lower()) if modules else None
+            ),
+            filesystem_checks=self.filesystem_checks
+        )
+
+    def _render(
+        self,
+        template: str,
+        fills: Mapping[str, Any],
+        **fixed: Any
+    ) -> str:
+        """Renders `template`. Only the `fixed` arguments (flags, mostly)
+        decide which text comes out, so it's rendered once per combination
+        of them with slots for `fills`, which are pasted in as-is, the way
+        Mako would print them."""
+        fixed["subreddit"] = self.subreddit
+        fixed["rules_url"] = (
+            self.rules_url or self.RULES_URL.format(subreddit=self.subreddit)
+        )
+        fixed["guide_links"] = (
+            self.subreddit.lower() == "nosleep"
+            if self.guide_links is None else self.guide_links
+        )
+        with stage_seconds.labels("templates", template).time():
+            t = self.mako.get_template(self.TEMPLATES[template])
+            # keyed on the template object so an edited file (with
+            # filesystem_checks) gets new skeletons
+            key = (t, *sorted(fixed.items()))
+            out = self.skeletons.get(key)
+            if out is None:
+                out = t.render(**{k: slot(k) for k in fills}, **fixed)
+                self.skeletons[key] = out
+            for k, v in fills.items():
+                out = out.replace(slot(k), str(v))
+            return out
 
     def create_approval_msg(self, post_url: str) -> str:
-        return self._render("reapproval", post_url=post_url)
+        return self._render("reapproval", {"post_url": post_url})
 
     def create_title_approval_msg(self, post_url: str) -> str:
         return self._render(
             "reapproval",
-            post_url=post_url,
+            {"post_url": post_url},
             is_title_reapproval=True
         )
 
@@ -37,9 +171,11 @@ class MessageBuilder:
     ) -> str:
         return self._render(
             "post-a-day",
-            post_url=post_url,
-            time_remaining=remaining,
-            modmail_link=modmail_link
+            {
+                "post_url": post_url,
+                "time_remaining": remaining,
+                "modmail_link": modmail_link,
+            }
         )
 
     def create_deleted_post_msg(
@@ -54,16 +190,75 @@ class MessageBuilder:
         long_paragraphs: bool = False,
         invalid_tags: str | None = None,
     ) -> str:
-        template_args = {k: v for k, v in locals().items() if k != "self"}
-        return self._render(
-            "post-deleted",
-            **template_args
-        )
+        fills = {
+            "post_url": post_url,
+            "modmail_link": modmail_link,
+            "reapproval_modmail": reapproval_modmail,
+        }
+        flags: dict[str, bool | str | None] = {
+            "permanent": permanent,
+            "has_nsfw_title": has_nsfw_title,
+            "has_codeblocks": has_codeblocks,
+            "long_paragraphs": long_paragraphs,
+        }
+        # the template only tests whether there are invalid tags
+        if invalid_tags:
+            fills["invalid_tags"] = invalid_tags
+        else:
+            flags["invalid_tags"] = invalid_tags
+        return self._render("post-deleted", fills, **flags)
 
     def create_series_msg(self, post_url: str) -> str:
         """This creates the series PM message that informs the
         poster about how a series is handled by the bot."""
-        return self._render("series-pm", post_url=post_url)
+        return self._render("series-pm", {"post_url": post_url})
 
     def create_series_comment(self, sub_url: str) -> str:
-        return self._render("series-comment", subscribe_url=sub_url)
+        return self._render("series-comment", {"subscribe_url": sub_url})
+
+
+class SubredditMessages:
+    """The bot's messages for one subreddit, from `builder` (see
+    MessageBuilder.for_subreddit). Its modmail link is worked out once,
+    and the compose links that carry a post's shortlink or author are
+    kept URL-encoded with a slot in them, so a post costs a few string
+    replacements instead of renders and URL encoding."""
+    reapproval_subject = "Please reapprove submission"
+
+    def __init__(
+        self,
+        builder: MessageBuilder,
+        reddit: "SubredditTool",
+        subreddit: str
+    ) -> None:
+        self.builder = builder
+        self.modmail_link = reddit.create_modmail_link(subreddit=subreddit)
+        # title reapproval or not -> compose link for the reapproval PM
+        self.reapproval_links = {
+            title: reddit.create_modmail_link(
+                self.reapproval_subject,
+                builder.create_title_approval_msg(slot("post_url"))
+                if title else builder.create_approval_msg(slot("post_url")),
+                subreddit=subreddit
+            )
+            for title in (False, True)
+        }
+        self.series_comment = builder.create_series_comment(
+            reddit.gen_compose_url({
+                "to": "UpdateMeBot",
+                "subject": "Subscribe",
+                "message": f"SubscribeMe! /r/{subreddit} /u/{slot('author')}",
+            })
+        )
+
+    def reapproval_link(self, post_url: str, *, title: bool) -> str:
+        # quote_plus works a character at a time, so the encoded slot can
+        # be swapped for the encoded value
+        return self.reapproval_links[title].replace(
+            quote_plus(slot("post_url")), quote_plus(post_url)
+        )
+
+    def series_reminder(self, author: Any) -> str:
+        return self.series_comment.replace(
+            quote_plus(slot("author")), quote_plus(str(author))
+        )
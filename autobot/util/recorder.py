@@ -0,0 +1,104 @@
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, IO
+
+import json
+import threading
+import time
+
+import praw
+
+
+SUBMISSION_FIELDS = (
+    "id", "name", "title", "selftext", "created_utc", "shortlink",
+    "link_flair_css_class"
+)
+
+
+def snapshot(post: praw.models.Submission) -> dict[str, Any]:
+    """The parts of a submission AutoBot looks at."""
+    data = {f: getattr(post, f, None) for f in SUBMISSION_FIELDS}
+    data["author"] = post.author.name if post.author else None
+    data["subreddit"] = post.subreddit.display_name
+    return data
+
+
+class TraceRecorder:
+    """Wraps a SubredditTool and appends what it sees to a JSONL trace:
+    /new listings, search results, deleted-post lookups and the actions
+    taken. Anything else is passed straight through.
+
+    Each line is {"t": <clock()>, "call": <method>, ...}. Listings only
+    hold post IDs; a "post" line with the post's contents comes before
+    the first listing it's in and again whenever it changes (e.g. it gets
+    flaired)."""
+
+    def __init__(
+        self,
+        tool: Any,
+        path: Path,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.tool = tool
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.seen: dict[str, dict[str, Any]] = {}
+        self.out: IO[str] = open(path, "a", encoding="utf-8")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.tool, name)
+
+    def close(self) -> None:
+        self.out.close()
+
+    def _write(self, call: str, **data: Any) -> None:
+        line = json.dumps({"t": self.clock(), "call": call, **data})
+        with self.lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def _posts(self, posts: list[praw.models.Submission]) -> list[str]:
+        for p in posts:
+            data = snapshot(p)
+            if self.seen.get(p.id) != data:
+                self.seen[p.id] = data
+                self._write("post", post=data)
+        return [p.id for p in posts]
+
+    def retrieve_new_posts(self, *, before=None):
+        posts = list(self.tool.retrieve_new_posts(before=before))
+        self._write(
+            "retrieve_new_posts",
+            before=before.id if before else None,
+            result=self._posts(posts)
+        )
+        return iter(posts)
+
+    def search_recent_posts(self):
+        posts = list(self.tool.search_recent_posts())
+        self._write("search_recent_posts", result=self._posts(posts))
+        return iter(posts)
+
+    def is_post_deleted(self, post_id: str) -> bool:
+        deleted = self.tool.is_post_deleted(post_id)
+        self._write("is_post_deleted", id=post_id, result=deleted)
+        return deleted
+
+    def _action(self, call: str, post, *args: Any, **kwargs: Any) -> None:
+        getattr(self.tool, call)(post, *args, **kwargs)
+        self._write(call, id=post.id)
+
+    def delete_post(self, post) -> None:
+        self._action("delete_post", post)
+
+    def add_comment(self, post, msg: str, **kwargs: Any) -> None:
+        self._action("add_comment", post, msg, **kwargs)
+
+    def set_series_flair(self, post, **kwargs: Any) -> None:
+        self._action("set_series_flair", post, **kwargs)
+
+    def send_series_pm(self, post, msg: str) -> None:
+        self._action("send_series_pm", post, msg)
+
+    def post_series_reminder(self, post, comment: str) -> None:
+        self._action("post_series_reminder", post, comment)
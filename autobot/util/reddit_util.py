@@ -1,11 +1,16 @@
-from collections.abc import Iterator, Mapping
+from collections.abc import Callable, Iterator, Mapping
+import time
 import urllib.parse
 
 from autobot.config import Settings
+from autobot.metrics import instrument
+from autobot.util.client import make_reddit, user_is_moderator
+from autobot.util.requestor import ApiCalls, IdleGate
 
 from prawcore import NotFound
 
 import praw
+import redis
 import structlog
 
 PrawSubmissionIter = Iterator[praw.models.Submission]
@@ -16,23 +21,70 @@ class MissingFlairException(Exception):
     ...
 
 
+@instrument("reddit")
 class SubredditTool:
-    def __init__(self, cfg: Settings) -> None:
+    def __init__(
+        self,
+        cfg: Settings,
+        rd: redis.Redis | None = None,
+        *,
+        gate: IdleGate | None = None
+    ) -> None:
         self.logger = structlog.get_logger()
         self.read_only = cfg.development_mode
-        self.reddit = praw.Reddit(
-            user_agent=cfg.user_agent,
-            client_id=cfg.client_id,
-            client_secret=cfg.client_secret,
-            username=cfg.reddit_username,
-            password=cfg.reddit_password
-        )
-        self.subreddit = self.reddit.subreddit(cfg.subreddit)
-        if not self.read_only and not self.subreddit.user_is_moderator:
-            raise AssertionError(
-                    f"User {cfg.reddit_username} is not moderator of "
-                    f"subreddit {self.subreddit.display_name}."
-            )
+        self.api_calls = ApiCalls("bot")
+        self.reddit = make_reddit(cfg, self.api_calls, rd, gate=gate)
+        # called before every side effect; raises if this instance may not
+        # act (see autobot.leader)
+        self.fence: Callable[[], object] | None = None
+        # subreddit -> flair css class -> template ID
+        self.flair_index: dict[str, dict[str, str]] = {}
+        self.flair_index_ttl = cfg.flair_index_ttl
+        self.flair_index_loaded: float | None = None
+        # several subreddits are read together as a multireddit
+        self.names = cfg.subreddits()
+        self.subreddit = self.reddit.subreddit("+".join(self.names))
+        if not self.read_only:
+            for name in self.names:
+                if not user_is_moderator(
+                    self.reddit,
+                    name,
+                    client=self.api_calls.client,
+                    rd=rd,
+                    ttl=cfg.moderator_check_ttl
+                ):
+                    raise AssertionError(
+                            f"User {cfg.reddit_username} is not moderator "
+                            f"of subreddit {name}."
+                    )
+
+    def _check_fence(self) -> None:
+        if self.fence:
+            self.fence()
+
+    def load_flair_index(self) -> None:
+        """Reads each subreddit's link flair templates, so series flair
+        can be set without listing a post's flair choices first."""
+        index = {}
+        for name in self.names:
+            templates = self.reddit.subreddit(name).flair.link_templates
+            index[name.lower()] = {
+                (t.get("css_class") or "").lower(): t["id"]
+                for t in templates
+            }
+        self.flair_index = index
+        self.flair_index_loaded = time.monotonic()
+
+    def warm(self) -> None:
+        """Keeps what a standby needs to take over quickly up to date."""
+        if self.read_only:
+            return
+        loaded = self.flair_index_loaded
+        if loaded is None or time.monotonic() - loaded > self.flair_index_ttl:
+            try:
+                self.load_flair_index()
+            except Exception:
+                self.logger.exception("Unable to load flair templates")
 
     def _get_posts(
         self,
@@ -81,18 +133,23 @@ class SubredditTool:
             if self.is_post_deleted(before.id):
                 self.logger.info(
                     "Post was removed, not using 'before' parameter",
-                    subreddit=before.subreddit.display_name,
                     id=before.id)
                 before = None
-        params = {"before": before.name} if before else {}
+        # fullname rather than name, so a cursor restored from a checkpoint
+        # (a lazy Submission) isn't fetched just for it
+        params = {"before": before.fullname} if before else {}
         return self.subreddit.new(params=params)
 
+    def submission(self, post_id: str) -> praw.models.Submission:
+        """A post by ID. Nothing is fetched until its contents are read."""
+        return self.reddit.submission(post_id)
+
     def search_recent_posts(self) -> PrawSubmissionIter:
         """Get most recent submissions from the subreddit - right now it
         fetches the last hour's worth of results."""
         self.logger.info("Retrieving submissions from the last hour")
         return self._get_posts(
-            f"subreddit:{self.subreddit.display_name}",
+            " OR ".join(f"subreddit:{n}" for n in self.names),
             time_filter="hour",
         )
 
@@ -120,6 +177,7 @@ class SubredditTool:
         msg: str
     ) -> None:
         if not self.read_only:
+            self._check_fence()
             try:
                 self.logger.info(
                     "Sending Series PM",
@@ -127,7 +185,8 @@ class SubredditTool:
                     author=post.author
                 )
                 post.author.message(
-                    "Reminder about your series post on r/nosleep",
+                    "Reminder about your series post on "
+                    f"r/{post.subreddit.display_name}",
                     msg,
                     None
                 )
@@ -159,6 +218,7 @@ class SubredditTool:
 
     def delete_post(self, post: praw.models.Submission) -> None:
         if not self.read_only:
+            self._check_fence()
             post.mod.remove()
         else:
             self.logger.info(
@@ -178,6 +238,7 @@ class SubredditTool:
     ) -> None:
         """Make a comment on the provided post."""
         if not self.read_only:
+            self._check_fence()
             self.logger.info(
                 "Creating comment on post",
                 post_id=post.id,
@@ -215,6 +276,11 @@ class SubredditTool:
     ) -> None:
         """Set the series flair for a post."""
         if not self.read_only:
+            self._check_fence()
+            index = self.flair_index.get(post.subreddit.display_name.lower())
+            if index and (template := index.get(name.lower())):
+                post.flair.select(template)
+                return
             for f in post.flair.choices():
                 if f["flair_css_class"].lower() == name.lower():
                     try:
@@ -226,7 +292,7 @@ class SubredditTool:
                         raise
             raise MissingFlairException(
                 f"Flair class {name} not found for "
-                f"subreddit /r/{self.subreddit_name}"
+                f"subreddit /r/{post.subreddit.display_name}"
             )
         else:
             self.logger.info(
@@ -243,10 +309,12 @@ class SubredditTool:
     def create_modmail_link(
         self,
         subject: str | None = None,
-        message: str | None = None
+        message: str | None = None,
+        *,
+        subreddit: str | None = None
     ) -> str:
         q = {
-            "to": f"/r/{self.subreddit_name()}",
+            "to": f"/r/{subreddit or self.subreddit_name()}",
         }
 
         if subject:
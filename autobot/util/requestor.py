@@ -0,0 +1,173 @@
+from collections import Counter
+from types import FrameType
+from typing import Any
+from urllib.parse import urlsplit
+
+import re
+import sys
+import threading
+import time
+
+from autobot.util.gate import IdleGate
+from autobot.util.scope import api_scope
+
+from prawcore import Requestor
+from prawcore.exceptions import RequestException
+from prometheus_client import Counter as PromCounter, Gauge, Histogram
+import requests
+
+
+api_requests = PromCounter(
+    "reddit_api_requests",
+    "HTTP requests made to Reddit, by endpoint, calling code and status",
+    ["client", "endpoint", "caller", "status"]
+)
+api_latency = Histogram(
+    "reddit_api_request_seconds",
+    "Time taken by HTTP requests to Reddit",
+    ["client", "endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+ratelimit_used = Gauge(
+    "reddit_ratelimit_used",
+    "Requests used in the current rate limit period (X-Ratelimit-Used)",
+    ["client"]
+)
+ratelimit_remaining = Gauge(
+    "reddit_ratelimit_remaining",
+    "Requests left in the current rate limit period "
+    "(X-Ratelimit-Remaining)",
+    ["client"]
+)
+ratelimit_reset = Gauge(
+    "reddit_ratelimit_reset_seconds",
+    "Seconds until the rate limit period resets (X-Ratelimit-Reset)",
+    ["client"]
+)
+
+# path segments that identify a thing rather than an endpoint
+ENDPOINT_PATTERNS = (
+    (re.compile(r"^/(r|u|user)/[^/]+"), r"/\1/{name}"),
+    (re.compile(r"/comments/[^/]+(/[^/]+)?"), "/comments/{id}"),
+    (re.compile(r"/t[1-6]_[0-9a-z]+"), "/{fullname}"),
+    (re.compile(r"/$"), ""),
+)
+OWN_MODULES = ("autobot.", "moderation.")
+SKIP_MODULES = ("autobot.util.requestor", "autobot.metrics")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Turns a request into a low-cardinality label, e.g.
+    'GET /r/{name}/new'."""
+    path = urlsplit(url).path or "/"
+    for pattern, repl in ENDPOINT_PATTERNS:
+        path = pattern.sub(repl, path)
+    return f"{method.upper()} {path or '/'}"
+
+
+def calling_code() -> str:
+    """The innermost function in our own code that led to a request."""
+    frame: FrameType | None = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(OWN_MODULES) and module not in SKIP_MODULES:
+            return f"{module}.{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class ApiCalls:
+    """Counts the requests a Reddit client has made and keeps the last
+    rate limit headers it saw. `count()` can be read before and after a
+    unit of work to tell how many calls it spent; when several components
+    share the client, each does its work under `spending(scope)` and
+    counts only that scope's requests."""
+
+    def __init__(self, client: str) -> None:
+        self.client = client
+        self.lock = threading.Lock()
+        self.total = 0
+        self.by_endpoint: Counter[str] = Counter()
+        self.by_scope: Counter[str] = Counter()
+        self.used: float | None = None
+        self.remaining: float | None = None
+        self.reset: float | None = None
+
+    def record(
+        self,
+        endpoint: str,
+        caller: str,
+        status: str,
+        seconds: float,
+        headers: Any = None
+    ) -> None:
+        with self.lock:
+            self.total += 1
+            self.by_endpoint[endpoint] += 1
+            self.by_scope[api_scope.get()] += 1
+        api_requests.labels(self.client, endpoint, caller, status).inc()
+        api_latency.labels(self.client, endpoint).observe(seconds)
+        if headers is not None:
+            self._read_ratelimit(headers)
+
+    def _read_ratelimit(self, headers: Any) -> None:
+        for header, attr, gauge in (
+            ("x-ratelimit-used", "used", ratelimit_used),
+            ("x-ratelimit-remaining", "remaining", ratelimit_remaining),
+            ("x-ratelimit-reset", "reset", ratelimit_reset),
+        ):
+            try:
+                value = float(headers[header])
+            except (KeyError, TypeError, ValueError):
+                continue
+            setattr(self, attr, value)
+            gauge.labels(self.client).set(value)
+
+    def count(self, scope: str | None = None) -> int:
+        """Requests made so far, or only those made in `scope`."""
+        return self.total if scope is None else self.by_scope[scope]
+
+    def spent_since(self, mark: int, scope: str | None = None) -> int:
+        return self.count(scope) - mark
+
+
+class AccountingRequestor(Requestor):
+    """A prawcore Requestor that records every HTTP request in `calls`.
+    Install it with praw.Reddit(requestor_class=AccountingRequestor,
+    requestor_kwargs={"calls": ApiCalls(...)}). With a `gate`, requests
+    wait while another thread holds it busy."""
+
+    def __init__(
+        self,
+        *args: Any,
+        calls: ApiCalls,
+        gate: IdleGate | None = None,
+        **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = calls
+        self.gate = gate
+
+    def request(self, *args: Any, **kwargs: Any) -> requests.Response:
+        if self.gate:
+            self.gate.wait()
+        method = kwargs.get("method", args[0] if args else "GET")
+        url = kwargs.get("url", args[1] if len(args) > 1 else "")
+        endpoint = endpoint_name(method, url)
+        caller = calling_code()
+        start = time.perf_counter()
+        try:
+            response = super().request(*args, **kwargs)
+        except RequestException:
+            self.calls.record(
+                endpoint, caller, "error", time.perf_counter() - start
+            )
+            raise
+        self.calls.record(
+            endpoint,
+            caller,
+            str(response.status_code),
+            time.perf_counter() - start,
+            response.headers
+        )
+        return response
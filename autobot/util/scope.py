@@ -0,0 +1,18 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# What the current code is spending requests on (a bot cycle, a report
+# job), so components sharing one client can each count their own. Thread
+# pools need to copy the context into their workers for it to carry over.
+api_scope: ContextVar[str] = ContextVar("api_scope", default="none")
+
+
+@contextmanager
+def spending(scope: str) -> Iterator[None]:
+    token = api_scope.set(scope)
+    try:
+        yield
+    finally:
+        api_scope.reset(token)
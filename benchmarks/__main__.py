@@ -0,0 +1,138 @@
+"""Runs the benchmark suite.
+
+    python -m benchmarks [-k FILTER] [--runs N] [--output results.json]
+                         [--baseline benchmarks/baseline.json]
+                         [--save-baseline] [--redis-url URL]
+
+The suite is run --runs times, one case after another in each run, and
+each benchmark's result is the median of its runs. Results are written as
+JSON. With a baseline (the stored one by default), exits with status 1 if
+any benchmark got slower than --tolerance and --noise allow. Baselines are
+only comparable on the machine they were recorded on."""
+from pathlib import Path
+
+import argparse
+import json
+import logging
+import platform
+import sys
+
+from benchmarks.suite import all_cases, compare, summarize, time_case
+
+import structlog
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "-k",
+        dest="filter",
+        help="Only run benchmarks whose name contains this.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="Override each benchmark's number of repetitions.",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Run the suite this many times and compare the medians.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write results here as JSON (default: stdout).",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINE,
+        help="Baseline to compare against.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store these results as the new baseline.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown against the baseline (0.1 is 10%%).",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=3.0,
+        help="Also allow slowdowns up to this many times the baseline's "
+             "and the results' median absolute deviations together.",
+    )
+    parser.add_argument(
+        "--redis-url",
+        help="Use this Redis (it gets flushed!) instead of fakeredis.",
+    )
+    return parser
+
+
+def main() -> int:
+    args = create_argparser().parse_args()
+    # the bot's per-post logging would otherwise dominate the timings
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    cases = [
+        case for case in all_cases(args.redis_url)
+        if not args.filter or args.filter in case.name
+    ]
+    # the runs are interleaved so a slow patch on the machine is spread
+    # over every benchmark instead of landing on one
+    runs: dict[str, list[list[float]]] = {case.name: [] for case in cases}
+    for _ in range(args.runs):
+        for case in cases:
+            runs[case.name].append(time_case(case, args.repeat))
+
+    results = {}
+    for case in cases:
+        results[case.name] = summarize(case, runs[case.name])
+        r = results[case.name]
+        print(
+            f"{case.name:32} {r['median'] * 1000:10.3f} ms "
+            f"+/-{r['mad'] * 1000:8.3f} ms "
+            f"{r['per_item'] * 1e6:12.2f} us/item",
+            file=sys.stderr
+        )
+
+    doc = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    text = json.dumps(doc, indent=2, sort_keys=True)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        args.baseline.write_text(text + "\n")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance, args.noise)
+    for name, before, now, ratio in regressions:
+        print(
+            f"REGRESSION {name}: {before * 1000:.3f} ms -> "
+            f"{now * 1000:.3f} ms ({ratio:.2f}x)",
+            file=sys.stderr
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,532 @@
+"""A local stand-in for the parts of the Reddit API that praw uses here.
+
+Point a client at it with the `reddit_url`/`reddit_oauth_url` settings.
+Responses can be slowed down with `latency` (plus up to `jitter`) seconds,
+and every response carries X-Ratelimit-* headers for a budget of
+`ratelimit` requests per `window` seconds; with `enforce_ratelimit` set,
+requests over budget get a 429."""
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from autobot.config import Settings
+
+
+def live_settings(url: str, **overrides: Any) -> Settings:
+    """Settings for a bot that moderates for real, on the stand-in."""
+    values = {
+        "subreddit": "nosleep",
+        "development_mode": False,
+        "user_agent": "autobot loadgen",
+        "client_id": "loadgen",
+        "client_secret": "loadgen",
+        "reddit_username": "bot",
+        "reddit_password": "loadgen",
+        "reddit_url": url,
+        "reddit_oauth_url": url,
+        "report_pm_rate": 1000.0,
+        "report_pm_burst": 1000,
+    }
+    return Settings.model_construct(**{**values, **overrides})
+
+
+@dataclass
+class ApiConfig:
+    subreddit: str = "nosleep"
+    moderators: tuple[str, ...] = ("bot", "mod1", "mod2")
+    series_flair: str = "flair - series"
+    latency: float = 0.0
+    jitter: float = 0.0
+    ratelimit: int = 1000
+    window: float = 600.0
+    enforce_ratelimit: bool = False
+
+
+@dataclass
+class FakeRedditState:
+    """Everything the stand-in knows, plus when things happened to it."""
+    config: ApiConfig
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    ids: Iterable[int] = field(default_factory=lambda: itertools.count(1))
+    posts: dict[str, dict[str, Any]] = field(default_factory=dict)
+    order: list[str] = field(default_factory=list)
+    comments: dict[str, dict[str, Any]] = field(default_factory=dict)
+    messages: list[dict[str, Any]] = field(default_factory=list)
+    modlog: list[dict[str, Any]] = field(default_factory=list)
+    # (time, action, fullname) for every write the client made
+    actions: list[tuple[float, str, str]] = field(default_factory=list)
+    # first time each post was returned by /new
+    listed_at: dict[str, float] = field(default_factory=dict)
+    # access tokens handed out and not revoked
+    tokens: set[str] = field(default_factory=set)
+    logins: int = 0
+    connections: int = 0
+    requests: int = 0
+    window_start: float = field(default_factory=time.time)
+    window_used: int = 0
+
+    def _id(self) -> str:
+        n = next(self.ids)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+        out = ""
+        while n:
+            n, r = divmod(n, 36)
+            out = digits[r] + out
+        return out
+
+    def add_post(
+        self,
+        title: str,
+        selftext: str,
+        author: str,
+        created: float | None = None
+    ) -> dict[str, Any]:
+        with self.lock:
+            pid = self._id()
+            post = {
+                "id": pid,
+                "name": f"t3_{pid}",
+                "title": title,
+                "selftext": selftext,
+                "author": author,
+                "created_utc": created or time.time(),
+                "subreddit": self.config.subreddit,
+                "permalink": f"/r/{self.config.subreddit}/comments/{pid}/",
+                "link_flair_css_class": None,
+                "link_flair_text": None,
+                "is_robot_indexable": True,
+                "removed": False,
+                "over_18": False,
+            }
+            self.posts[pid] = post
+            self.order.append(pid)
+            return post
+
+    def add_message(
+        self,
+        author: str,
+        subject: str,
+        body: str
+    ) -> dict[str, Any]:
+        with self.lock:
+            mid = self._id()
+            msg = {
+                "id": mid,
+                "name": f"t4_{mid}",
+                "author": author,
+                "dest": "bot",
+                "subject": subject,
+                "body": body,
+                "created_utc": time.time(),
+                "new": True,
+                "was_comment": False,
+                "first_message": None,
+                "first_message_name": None,
+                "parent_id": None,
+                "replies": "",
+                "subreddit": None,
+            }
+            self.messages.append(msg)
+            return msg
+
+    def add_mod_action(
+        self,
+        mod: str,
+        action: str,
+        created: float | None = None
+    ) -> None:
+        with self.lock:
+            self.modlog.append({
+                "id": f"ModAction_{self._id()}",
+                "action": action,
+                "mod": mod,
+                "mod_id36": mod,
+                "created_utc": created or time.time(),
+                "subreddit": self.config.subreddit,
+                "target_fullname": None,
+            })
+
+    def revoke_tokens(self) -> None:
+        with self.lock:
+            self.tokens.clear()
+
+    def record(self, action: str, fullname: str) -> None:
+        with self.lock:
+            self.actions.append((time.time(), action, fullname))
+
+
+def thing(kind: str, data: dict[str, Any]) -> dict[str, Any]:
+    return {"kind": kind, "data": data}
+
+
+def listing(
+    children: list[dict[str, Any]],
+    after: str | None = None
+) -> dict[str, Any]:
+    return thing(
+        "Listing",
+        {"after": after, "before": None, "children": children, "dist": None}
+    )
+
+
+def page(
+    items: list[dict[str, Any]],
+    kind: str,
+    query: dict[str, str],
+    key: str = "name"
+) -> dict[str, Any]:
+    """A newest-first listing page honoring before/after/limit."""
+    limit = int(query.get("limit", 25) or 25)
+    if before := query.get("before"):
+        idx = next(
+            (i for i, x in enumerate(items) if x[key] == before),
+            len(items)
+        )
+        # the `limit` items just newer than `before`
+        chosen = items[max(0, idx - limit):idx]
+        return listing([thing(kind, x) for x in chosen])
+    if after := query.get("after"):
+        idx = next(
+            (i for i, x in enumerate(items) if x[key] == after),
+            len(items) - 1
+        )
+        items = items[idx + 1:]
+    chosen = items[:limit]
+    more = len(items) > limit
+    return listing(
+        [thing(kind, x) for x in chosen],
+        chosen[-1][key] if more and chosen else None
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeRedditServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    @property
+    def state(self) -> FakeRedditState:
+        return self.server.state
+
+    def setup(self) -> None:
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    def _authorized(self, path: str) -> bool:
+        if path == "/api/v1/access_token":
+            return True
+        auth = self.headers.get("Authorization", "")
+        return auth.removeprefix("bearer ") in self.state.tokens
+
+    def _ratelimit_headers(self) -> tuple[bool, dict[str, str]]:
+        cfg = self.state.config
+        with self.state.lock:
+            now = time.time()
+            if now - self.state.window_start >= cfg.window:
+                self.state.window_start = now
+                self.state.window_used = 0
+            self.state.window_used += 1
+            self.state.requests += 1
+            used = self.state.window_used
+            reset = cfg.window - (now - self.state.window_start)
+        headers = {
+            "X-Ratelimit-Used": str(used),
+            "X-Ratelimit-Remaining": f"{max(0, cfg.ratelimit - used):.1f}",
+            "X-Ratelimit-Reset": str(int(reset)),
+        }
+        return used > cfg.ratelimit, headers
+
+    def _send(self, status: int, body: Any) -> None:
+        cfg = self.state.config
+        if cfg.latency or cfg.jitter:
+            time.sleep(cfg.latency + random.uniform(0, cfg.jitter))
+        limited, headers = self._ratelimit_headers()
+        if limited and cfg.enforce_ratelimit:
+            status, body = 429, {"message": "Too Many Requests"}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode())
+            query.update({k: v[-1] for k, v in form.items()})
+        path = parts.path.rstrip("/")
+        if not self._authorized(path):
+            self._send(401, {"message": "Unauthorized", "error": 401})
+            return
+        for pattern, handler in ROUTES[method]:
+            if m := re.fullmatch(pattern, path):
+                try:
+                    status, body = handler(self, query, *m.groups())
+                except KeyError:
+                    status, body = 404, {"message": "Not Found"}
+                self._send(status, body)
+                return
+        self._send(404, {"message": "Not Found", "error": 404})
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+    # --- handlers ---
+
+    def token(self, query):
+        with self.state.lock:
+            self.state.logins += 1
+            token = f"fake-token-{self.state.logins}"
+            self.state.tokens.add(token)
+        return 200, {
+            "access_token": token,
+            "expires_in": 86400,
+            "scope": "*",
+            "token_type": "bearer",
+        }
+
+    def me(self, query):
+        unread = sum(1 for m in self.state.messages if m["new"])
+        return 200, {"name": "bot", "id": "bot", "inbox_count": unread}
+
+    def about(self, query, sub):
+        return 200, thing("t5", {
+            "display_name": self.state.config.subreddit,
+            "id": "sub",
+            "name": "t5_sub",
+            "user_is_moderator": True,
+        })
+
+    def moderators(self, query, sub):
+        return 200, thing("UserList", {"children": [
+            {
+                "name": m,
+                "id": f"t2_{m}",
+                "date": self.state.window_start,
+                "mod_permissions": ["all"],
+            }
+            for m in self.state.config.moderators
+        ]})
+
+    def _posts_newest_first(self) -> list[dict[str, Any]]:
+        with self.state.lock:
+            return [self.state.posts[i] for i in reversed(self.state.order)]
+
+    def new(self, query, sub):
+        query.setdefault("limit", "100")
+        body = page(self._posts_newest_first(), "t3", query)
+        now = time.time()
+        with self.state.lock:
+            for child in body["data"]["children"]:
+                self.state.listed_at.setdefault(child["data"]["id"], now)
+        return 200, body
+
+    def search(self, query, sub):
+        spans = {"hour": 3600, "day": 86400, "week": 604800}
+        since = time.time() - spans.get(query.get("t", "all"), 1e12)
+        posts = [
+            p for p in self._posts_newest_first() if p["created_utc"] >= since
+        ]
+        if m := re.search(r'author:"?([^"\s]+)', query.get("q", "")):
+            posts = [p for p in posts if p["author"] == m.group(1)]
+        return 200, page(posts, "t3", query)
+
+    def submission(self, query, pid):
+        post = self.state.posts[pid]
+        return 200, [listing([thing("t3", post)]), listing([])]
+
+    def info(self, query):
+        things = []
+        for fullname in query.get("id", "").split(","):
+            kind, _, tid = fullname.partition("_")
+            if kind == "t3" and tid in self.state.posts:
+                things.append(thing("t3", self.state.posts[tid]))
+            elif kind == "t1" and tid in self.state.comments:
+                things.append(thing("t1", self.state.comments[tid]))
+        return 200, listing(things)
+
+    def modlog(self, query, sub):
+        with self.state.lock:
+            entries = sorted(
+                self.state.modlog,
+                key=lambda e: e["created_utc"],
+                reverse=True
+            )
+        if action := query.get("type"):
+            entries = [e for e in entries if e["action"] == action]
+        if mod := query.get("mod"):
+            entries = [e for e in entries if e["mod"] == mod]
+        return 200, page(entries, "modaction", query, key="id")
+
+    def messages(self, query, which="inbox"):
+        with self.state.lock:
+            msgs = list(reversed(self.state.messages))
+        if which == "unread":
+            msgs = [m for m in msgs if m["new"]]
+        return 200, page(msgs, "t4", query)
+
+    def read_message(self, query):
+        ids = set(query.get("id", "").split(","))
+        with self.state.lock:
+            for m in self.state.messages:
+                if m["name"] in ids:
+                    m["new"] = False
+        return 200, {}
+
+    def comment(self, query):
+        parent = query["thing_id"]
+        with self.state.lock:
+            cid = self.state._id()
+            data = {
+                "id": cid,
+                "name": f"t1_{cid}",
+                "body": query.get("text", ""),
+                "author": "bot",
+                "link_id": parent,
+                "parent_id": parent,
+                "created_utc": time.time(),
+                "subreddit": self.state.config.subreddit,
+                "replies": "",
+                "distinguished": None,
+                "stickied": False,
+            }
+            self.state.comments[cid] = data
+        self.state.record("comment", parent)
+        return 200, {"json": {"errors": [], "data": {"things": [
+            thing("t1", data)
+        ]}}}
+
+    def distinguish(self, query):
+        cid = query["id"].partition("_")[2]
+        data = self.state.comments[cid]
+        data["distinguished"] = "moderator"
+        data["stickied"] = query.get("sticky") == "True"
+        self.state.record("distinguish", query["id"])
+        return 200, {"json": {"errors": [], "data": {"things": [
+            thing("t1", data)
+        ]}}}
+
+    def lock(self, query):
+        self.state.record("lock", query["id"])
+        return 200, {}
+
+    def remove(self, query):
+        pid = query["id"].partition("_")[2]
+        post = self.state.posts[pid]
+        post["removed"] = True
+        post["is_robot_indexable"] = False
+        self.state.record("remove", query["id"])
+        return 200, {}
+
+    def _flair_templates(self) -> list[tuple[str, str, str]]:
+        return [
+            ("series-template", self.state.config.series_flair, "Series"),
+            ("other-template", "flair-other", "Other"),
+        ]
+
+    def flairselector(self, query, sub):
+        return 200, {"current": {}, "choices": [
+            {
+                "flair_css_class": css,
+                "flair_template_id": tid,
+                "flair_text": text,
+                "flair_text_editable": False,
+                "flair_position": "left",
+            }
+            for tid, css, text in self._flair_templates()
+        ]}
+
+    def link_flair(self, query, sub):
+        return 200, [
+            {
+                "id": tid,
+                "css_class": css,
+                "text": text,
+                "text_editable": False,
+                "type": "text",
+            }
+            for tid, css, text in self._flair_templates()
+        ]
+
+    def selectflair(self, query, sub):
+        pid = query["link"].partition("_")[2]
+        post = self.state.posts[pid]
+        if query.get("flair_template_id") == "series-template":
+            post["link_flair_css_class"] = self.state.config.series_flair
+            post["link_flair_text"] = "Series"
+        self.state.record("flair", query["link"])
+        return 200, {"json": {"errors": []}}
+
+    def compose(self, query):
+        self.state.record("compose", query.get("to", ""))
+        return 200, {"json": {"errors": []}}
+
+
+SUB = r"/r/([^/]+)"
+ROUTES: dict[str, list[tuple[str, Any]]] = {
+    "GET": [
+        (r"/api/v1/me", Handler.me),
+        (SUB + r"/about", Handler.about),
+        (SUB + r"/about/moderators", Handler.moderators),
+        (SUB + r"/about/log", Handler.modlog),
+        (SUB + r"/new", Handler.new),
+        (SUB + r"/search", Handler.search),
+        (SUB + r"/api/link_flair_v2", Handler.link_flair),
+        (r"/comments/([^/]+)(?:/.*)?", Handler.submission),
+        (r"/api/info", Handler.info),
+        (r"/message/(unread|inbox)", lambda h, q, w: h.messages(q, w)),
+    ],
+    "POST": [
+        (r"/api/v1/access_token", Handler.token),
+        (r"/api/comment", Handler.comment),
+        (r"/api/distinguish(?:/\w+)?", Handler.distinguish),
+        (r"/api/lock", Handler.lock),
+        (r"/api/remove", Handler.remove),
+        (r"/api/compose", Handler.compose),
+        (r"/api/read_message", Handler.read_message),
+        (SUB + r"/api/flairselector", Handler.flairselector),
+        (SUB + r"/api/selectflair", Handler.selectflair),
+    ],
+}
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: ApiConfig | None = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.state = FakeRedditState(config or ApiConfig())
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "FakeRedditServer":
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
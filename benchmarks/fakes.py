@@ -0,0 +1,180 @@
+from collections.abc import Iterable
+from types import SimpleNamespace
+from typing import Any
+
+import random
+import time
+
+from autobot.util.reddit_util import SubredditTool
+from autobot.util.requestor import ApiCalls
+
+import structlog
+
+
+class FakeAuthor(SimpleNamespace):
+    def message(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def __str__(self) -> str:
+        return self.name
+
+
+def fake_post(
+    pid: str,
+    *,
+    title: str = "A story",
+    selftext: str = "A reddit text",
+    author: str = "author1",
+    created: float | None = None,
+    flair: str | None = None,
+    subreddit: str = "nosleep"
+) -> SimpleNamespace:
+    """Something that looks enough like a praw Submission for AutoBot."""
+    return SimpleNamespace(
+        id=pid,
+        name=f"t3_{pid}",
+        title=title,
+        selftext=selftext,
+        author=FakeAuthor(name=author),
+        created_utc=created if created is not None else time.time(),
+        subreddit=SimpleNamespace(display_name=subreddit),
+        shortlink=f"https://redd.it/{pid}",
+        link_flair_css_class=flair,
+    )
+
+
+class FakeSubredditTool(SubredditTool):
+    """A SubredditTool that serves posts from memory and records the
+    actions AutoBot takes instead of sending them to Reddit. Every method
+    that would be a request is counted in `api_calls`."""
+
+    def __init__(
+        self,
+        posts: Iterable[SimpleNamespace] = (),
+        subreddit: str = "nosleep"
+    ) -> None:
+        self.logger = structlog.get_logger()
+        self.read_only = True
+        self.subreddit = SimpleNamespace(display_name=subreddit)
+        self.api_calls = ApiCalls("fake")
+        self.posts = {p.id: p for p in posts}
+        self.deleted: set[str] = set()
+        self.actions: list[tuple[str, str]] = []
+
+    def _call(self, endpoint: str) -> None:
+        self.api_calls.record(endpoint, "fake", "200", 0.0)
+
+    def add_posts(self, posts: Iterable[SimpleNamespace]) -> None:
+        for p in posts:
+            self.posts[p.id] = p
+
+    def _newest_first(self) -> list[SimpleNamespace]:
+        return sorted(
+            self.posts.values(),
+            key=lambda p: p.created_utc,
+            reverse=True
+        )
+
+    def is_post_deleted(self, post_id: str) -> bool:
+        self._call("GET /comments/{id}")
+        return post_id in self.deleted or post_id not in self.posts
+
+    def submission(self, post_id: str) -> SimpleNamespace:
+        return self.posts[post_id]
+
+    def retrieve_new_posts(self, *, before=None):
+        self._call("GET /r/{name}/new")
+        newest = self._newest_first()
+        if before is not None and before.id not in self.deleted:
+            ids = [p.id for p in newest]
+            if before.id in ids:
+                newest = newest[:ids.index(before.id)]
+        return iter(newest[:100])
+
+    def search_recent_posts(self):
+        self._call("GET /r/{name}/search")
+        hour_ago = time.time() - 3600
+        return iter(
+            [p for p in self._newest_first() if p.created_utc >= hour_ago]
+        )
+
+    def send_series_pm(self, post, msg: str) -> None:
+        self._call("POST /api/compose")
+        self.actions.append(("series_pm", post.id))
+
+    def add_comment(self, post, msg: str, **kwargs: Any) -> None:
+        self._call("POST /api/comment")
+        self.actions.append(("comment", post.id))
+
+    def delete_post(self, post) -> None:
+        self._call("POST /api/remove")
+        self.deleted.add(post.id)
+        self.actions.append(("remove", post.id))
+
+    def set_series_flair(self, post, *, name: str = "flair-series") -> None:
+        self._call("POST /api/selectflair")
+        post.link_flair_css_class = name
+        self.actions.append(("flair", post.id))
+
+
+TAGS = (
+    "", "", "", "", "[Part 1]", "(Part 2)", "{Pt. 3}", "|Vol 2|", "[Update]",
+    "[Finale]", "[Final]", "[12]", "(update #2)", "[True Story]", "[OC]",
+    "(part four)", "[2/3]", "[NSFW]"
+)
+WORDS = (
+    "the house at the end of the road",
+    "something lives in my attic",
+    "I work nights at a gas station",
+    "my daughter keeps drawing a man",
+    "don't answer the phone after midnight",
+    "we found a door in the basement",
+)
+
+
+def story_title(rng: random.Random) -> str:
+    title = rng.choice(WORDS).capitalize()
+    tag = rng.choice(TAGS)
+    if rng.random() < 0.03:
+        title = f"NSFW {title}"
+    return f"{title} {tag}".strip()
+
+
+def story_body(rng: random.Random, paragraphs: int = 30) -> str:
+    words = " ".join(WORDS).split()
+    out = []
+    for _ in range(paragraphs):
+        n = rng.randint(20, 180)
+        if rng.random() < 0.01:
+            n = 400
+        para = " ".join(rng.choice(words) for _ in range(n))
+        if rng.random() < 0.01:
+            para = "    " + para
+        out.append(para)
+    return "\n\n".join(out)
+
+
+def generate_posts(
+    count: int,
+    *,
+    seed: int = 0,
+    authors: int | None = None,
+    start: float | None = None,
+    spacing: float = 1.0
+) -> list[SimpleNamespace]:
+    """`count` posts with a realistic mix of tags, bodies and repeat
+    authors, `spacing` seconds apart and ending at `start` (now by
+    default)."""
+    rng = random.Random(seed)
+    authors = authors or max(1, int(count * 0.8))
+    end = start if start is not None else time.time()
+    return [
+        fake_post(
+            f"p{seed}x{i}",
+            title=story_title(rng),
+            selftext=story_body(rng),
+            author=f"author{rng.randrange(authors)}",
+            created=end - (count - i) * spacing
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1,342 @@
+"""Runs the real AutoBot and ReportService against the local Reddit
+stand-in in benchmarks.fake_api while new posts arrive at a target rate.
+
+    python -m benchmarks.loadgen [--rates 0.05,0.2,1,5] [--duration 60]
+                                 [--interval 15] [--latency-ms 50]
+                                 [--report-requests 10] [--redis-url URL]
+
+Each rate is a fresh subreddit fed for --duration seconds while the bot
+cycles every --interval, exactly as it does live but with every request
+going over HTTP through praw. The bot keeps up with a rate if every post
+submitted before its last cycle started was read from /new and its cycles
+fit in the interval. The output lists, per rate, how long posts waited to
+be seen and acted on, and the highest rate the bot kept up with."""
+from dataclasses import dataclass, field
+from typing import Any
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+
+from autobot.autobot import AutoBot
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fake_api import (
+    ApiConfig, FakeRedditServer, FakeRedditState, live_settings
+)
+from benchmarks.fakes import story_body, story_title
+from benchmarks.suite import ROOT, TEMPLATE_DIR, new_redis
+from moderation.activity import ReportService
+from moderation.metrics import job_context
+
+import structlog
+
+
+class PostGenerator(threading.Thread):
+    """Submits posts to the stand-in as a Poisson process at `rate` per
+    second, with the same mix of titles and bodies as the benchmarks."""
+
+    def __init__(
+        self,
+        state: FakeRedditState,
+        rate: float,
+        *,
+        seed: int = 0,
+        authors: int = 500
+    ) -> None:
+        super().__init__(name="loadgen", daemon=True)
+        self.state = state
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.authors = authors
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.rng.expovariate(self.rate)):
+            self.state.add_post(
+                story_title(self.rng),
+                story_body(self.rng, paragraphs=self.rng.randint(5, 40)),
+                f"author{self.rng.randrange(self.authors)}"
+            )
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def percentiles(values: list[float]) -> dict[str, float | None]:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    values = sorted(values)
+    return {
+        "p50": statistics.median(values),
+        "p95": values[math.ceil(0.95 * len(values)) - 1],
+        "max": values[-1],
+    }
+
+
+@dataclass
+class Step:
+    rate: float
+    interval: float
+    posts: int = 0
+    missed: int = 0
+    cycles: list[float] = field(default_factory=list)
+    seen_latency: list[float] = field(default_factory=list)
+    action_latency: list[float] = field(default_factory=list)
+    actions: dict[str, int] = field(default_factory=dict)
+    api_calls: int = 0
+    ratelimit_remaining: float | None = None
+
+    @property
+    def keeps_up(self) -> bool:
+        slow = percentiles(self.cycles)["p95"] or 0.0
+        return self.missed == 0 and slow <= self.interval
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "posts_per_second": self.rate,
+            "posts": self.posts,
+            "missed": self.missed,
+            "keeps_up": self.keeps_up,
+            "cycle_seconds": percentiles(self.cycles),
+            "seen_latency_seconds": percentiles(self.seen_latency),
+            "action_latency_seconds": percentiles(self.action_latency),
+            "actions": self.actions,
+            "api_calls_per_cycle": self.api_calls / max(len(self.cycles), 1),
+            "ratelimit_remaining": self.ratelimit_remaining,
+        }
+
+
+def run_step(
+    rate: float,
+    *,
+    duration: float,
+    interval: float,
+    api: ApiConfig,
+    redis_url: str | None = None,
+    seed: int = 0
+) -> Step:
+    """Feeds a fresh stand-in at `rate` posts/s for `duration` seconds
+    while a live AutoBot moderates it."""
+    server = FakeRedditServer(api).start()
+    state = server.state
+    try:
+        bot = AutoBot(
+            live_settings(server.url),
+            new_redis(redis_url),
+            MessageBuilder(TEMPLATE_DIR)
+        )
+        # the first cycle logs in and looks up the subreddit
+        bot.fetch_new()
+        calls = bot.reddit.api_calls
+        mark = calls.total
+        step = Step(rate, interval)
+        gen = PostGenerator(state, rate, seed=seed)
+        gen.start()
+        started = time.time()
+        while True:
+            last_cycle = time.time()
+            begin = time.perf_counter()
+            bot.fetch_new()
+            bot.process_previous()
+            elapsed = time.perf_counter() - begin
+            step.cycles.append(elapsed)
+            if last_cycle + interval - started >= duration:
+                break
+            time.sleep(max(0.0, interval - elapsed))
+        gen.stop()
+        step.api_calls = calls.spent_since(mark)
+        step.ratelimit_remaining = calls.remaining
+
+        first_action: dict[str, float] = {}
+        for t, action, fullname in state.actions:
+            first_action.setdefault(fullname, t)
+            step.actions[action] = step.actions.get(action, 0) + 1
+        for pid in state.order:
+            post = state.posts[pid]
+            created = post["created_utc"]
+            step.posts += 1
+            if pid in state.listed_at:
+                step.seen_latency.append(state.listed_at[pid] - created)
+            elif created < last_cycle:
+                step.missed += 1
+            if post["name"] in first_action:
+                step.action_latency.append(
+                    first_action[post["name"]] - created
+                )
+        return step
+    finally:
+        server.stop()
+
+
+def run_report(
+    requests: int,
+    *,
+    api: ApiConfig,
+    modlog: int = 2000,
+    redis_url: str | None = None,
+    seed: int = 0
+) -> dict[str, Any]:
+    """Answers `requests` ad-hoc activity PMs against a mod log of
+    `modlog` entries from this month."""
+    server = FakeRedditServer(api).start()
+    state = server.state
+    rng = random.Random(seed)
+    mods = [m for m in api.moderators if m != "bot"]
+    now = time.time()
+    for _ in range(modlog):
+        state.add_mod_action(
+            rng.choice(mods),
+            rng.choice(ReportService.actions),
+            now - rng.uniform(0, 7 * 86400)
+        )
+    bodies = itertools.cycle(["", "activity all", "activity " + mods[0]])
+    for i, body in zip(range(requests), bodies):
+        state.add_message(mods[i % len(mods)], "moderator activity", body)
+    try:
+        log = structlog.get_logger()
+        svc = ReportService(
+            live_settings(server.url),
+            ROOT / "moderation" / "templates",
+            log,
+            new_redis(redis_url)
+        )
+        svc.delivery.start()
+        mark = svc.api_calls.total
+        begin = time.perf_counter()
+        with job_context("adhoc"):
+            svc.process_adhoc_requests()
+        swept = time.perf_counter() - begin
+        svc.delivery.join(timeout=60)
+        delivered = time.perf_counter() - begin
+        svc.delivery.stop()
+        return {
+            "requests": requests,
+            "modlog_entries": modlog,
+            "sweep_seconds": swept,
+            "delivered_seconds": delivered,
+            "replies": sum(a == "compose" for _, a, _ in state.actions),
+            "api_calls": svc.api_calls.spent_since(mark),
+        }
+    finally:
+        server.stop()
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen")
+    parser.add_argument(
+        "--rates",
+        default="0.05,0.2,1,5",
+        help="Comma separated posts/s to try, in increasing order.",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=60,
+        help="Seconds to run each rate for.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=15,
+        help="Seconds between bot cycles (run_bot.py uses 15).",
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=50,
+        help="Added to every API response.",
+    )
+    parser.add_argument(
+        "--jitter-ms",
+        type=float,
+        default=20,
+        help="Up to this much more is added at random.",
+    )
+    parser.add_argument(
+        "--ratelimit",
+        type=int,
+        default=1000,
+        help="Requests allowed per 10 minute window.",
+    )
+    parser.add_argument(
+        "--enforce-ratelimit",
+        action="store_true",
+        help="Answer requests over the limit with a 429.",
+    )
+    parser.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="Try every rate even after the bot falls behind.",
+    )
+    parser.add_argument(
+        "--report-requests",
+        type=int,
+        default=10,
+        help="Ad-hoc PMs for the report service to answer (0 to skip).",
+    )
+    parser.add_argument(
+        "--redis-url",
+        help="Use this Redis (it gets flushed!) instead of fakeredis.",
+    )
+    return parser
+
+
+def main() -> int:
+    args = create_argparser().parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    api = ApiConfig(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        ratelimit=args.ratelimit,
+        enforce_ratelimit=args.enforce_ratelimit,
+    )
+    steps = []
+    for rate in (float(r) for r in args.rates.split(",")):
+        step = run_step(
+            rate,
+            duration=args.duration,
+            interval=args.interval,
+            api=api,
+            redis_url=args.redis_url
+        )
+        steps.append(step)
+        print(
+            f"{rate:8.3f} posts/s  posts={step.posts:5} "
+            f"missed={step.missed:4} "
+            f"cycle_p95={percentiles(step.cycles)['p95']:.3f}s "
+            f"{'ok' if step.keeps_up else 'BEHIND'}",
+            file=sys.stderr
+        )
+        if not step.keeps_up and not args.keep_going:
+            break
+
+    doc: dict[str, Any] = {
+        "interval": args.interval,
+        "latency_ms": args.latency_ms,
+        "sustainable_posts_per_second": max(
+            (s.rate for s in steps if s.keeps_up), default=0.0
+        ),
+        "steps": [s.as_dict() for s in steps],
+    }
+    if args.report_requests:
+        doc["report"] = run_report(
+            args.report_requests,
+            api=api,
+            redis_url=args.redis_url
+        )
+    print(json.dumps(doc, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
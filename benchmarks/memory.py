@@ -0,0 +1,150 @@
+"""Compares the resident memory of the bot and report service run as two
+processes (as supervisor.conf used to) with `run_bot.py --report-service`
+running both in one.
+
+    python -m benchmarks.memory [--posts 200] [--requests 5]
+
+Each setup starts in a fresh interpreter, points at the local Reddit
+stand-in, runs one bot cycle and/or one ad-hoc report sweep, and reports
+its peak and current RSS. Redis is fakeredis in every process, so the
+figures include a copy of it per process, like a real client would."""
+from typing import Any
+
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+
+from benchmarks.fake_api import ApiConfig, FakeRedditServer, live_settings
+
+MODES = ("bot", "report", "combined")
+
+
+def rss_kib() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(mode: str, url: str) -> dict[str, Any]:
+    """Runs one setup the way its entry point would. Imports happen here
+    so each process only loads what its setup needs."""
+    import fakeredis
+    import structlog
+
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    cfg = live_settings(url)
+    rd = fakeredis.FakeRedis(decode_responses=True)
+    bot = svc = None
+    if mode in ("bot", "combined"):
+        from autobot.autobot import AutoBot
+        from autobot.util.messages.templater import MessageBuilder
+        from autobot.util.requestor import IdleGate
+        from benchmarks.suite import TEMPLATE_DIR
+
+        gate = IdleGate() if mode == "combined" else None
+        bot = AutoBot(cfg, rd, MessageBuilder(TEMPLATE_DIR), gate=gate)
+    if mode in ("report", "combined"):
+        from benchmarks.suite import ROOT
+        from moderation.activity import ReportService
+        from moderation.metrics import job_context
+
+        shared: dict[str, Any] = {}
+        if bot:
+            shared = {
+                "reddit": bot.reddit.reddit,
+                "api_calls": bot.reddit.api_calls,
+            }
+        svc = ReportService(
+            cfg,
+            ROOT / "moderation" / "templates",
+            structlog.get_logger(),
+            rd,
+            **shared
+        )
+    if bot:
+        bot.fetch_new()
+        bot.process_previous()
+    if svc:
+        svc.delivery.start()
+        with job_context("adhoc"):
+            svc.process_adhoc_requests()
+        svc.delivery.join(timeout=60)
+        svc.delivery.stop()
+    return {
+        "rss_kib": rss_kib(),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def measure(mode: str, url: str) -> dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--child", mode, url],
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory")
+    parser.add_argument(
+        "--posts",
+        type=int,
+        default=200,
+        help="Posts on the stand-in for the bot cycle.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=5,
+        help="Ad-hoc PMs for the report sweep to answer.",
+    )
+    parser.add_argument(
+        "--child",
+        nargs=2,
+        metavar=("MODE", "URL"),
+        help=argparse.SUPPRESS,
+    )
+    return parser
+
+
+def main() -> int:
+    args = create_argparser().parse_args()
+    if args.child:
+        print(json.dumps(child(*args.child)))
+        return 0
+
+    from benchmarks.fakes import story_body, story_title
+    import random
+
+    rng = random.Random(0)
+    server = FakeRedditServer(ApiConfig(ratelimit=10**9)).start()
+    try:
+        for i in range(args.posts):
+            server.state.add_post(
+                story_title(rng), story_body(rng), f"author{i % 50}"
+            )
+        for i in range(args.requests):
+            server.state.add_message("mod1", "moderator activity", "")
+        results = {m: measure(m, server.url) for m in MODES}
+    finally:
+        server.stop()
+
+    separate = sum(results[m]["rss_kib"] for m in ("bot", "report"))
+    combined = results["combined"]["rss_kib"]
+    results["two_processes_rss_kib"] = separate
+    results["saved_kib"] = separate - combined
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Replays a SubredditTool trace through AutoBot on a virtual clock.
+
+    python -m benchmarks.replay TRACE.jsonl [--redis-url URL]
+    python -m benchmarks.replay --synthesize-days 7 [--write-trace OUT]
+
+Traces are recorded by running the bot with `run_bot.py --record`. Each
+recorded /new read starts a cycle; the clock is set to when it was
+recorded, so time limits and activity caching behave as they did live.
+The report lists the decisions made, the API calls the bot would have
+spent and how long each cycle took for real."""
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+
+from autobot.autobot import AutoBot
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fakes import FakeSubredditTool, fake_post, generate_posts
+from benchmarks.suite import TEMPLATE_DIR, bench_settings, new_redis
+
+import structlog
+
+
+class VirtualClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@dataclass
+class Cycle:
+    t: float
+    new: list[str]
+    search: list[str] = field(default_factory=list)
+    posts: list[dict[str, Any]] = field(default_factory=list)
+    deleted: dict[str, bool] = field(default_factory=dict)
+
+
+def load_trace(lines: Iterable[str]) -> list[Cycle]:
+    """Groups trace lines into cycles. Post contents and deleted lookups
+    recorded before a cycle's /new read are applied when it starts."""
+    cycles: list[Cycle] = []
+    posts: list[dict[str, Any]] = []
+    deleted: dict[str, bool] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        event = json.loads(line)
+        call = event["call"]
+        if call == "post":
+            posts.append(event["post"])
+        elif call == "is_post_deleted":
+            deleted[event["id"]] = event["result"]
+        elif call == "retrieve_new_posts":
+            cycles.append(Cycle(event["t"], event["result"], posts=posts,
+                                deleted=deleted))
+            posts, deleted = [], {}
+        elif call == "search_recent_posts" and cycles:
+            cycles[-1].search = event["result"]
+            cycles[-1].posts += posts
+            cycles[-1].deleted.update(deleted)
+            posts, deleted = [], {}
+    return cycles
+
+
+class ReplaySubredditTool(FakeSubredditTool):
+    """Answers AutoBot's reads from the current cycle of a trace."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.cycle: Cycle | None = None
+        self.lookups: dict[str, bool] = {}
+
+    def start(self, cycle: Cycle) -> None:
+        self.cycle = cycle
+        for data in cycle.posts:
+            post = fake_post(
+                data["id"],
+                title=data["title"] or "",
+                selftext=data["selftext"] or "",
+                author=data["author"] or "[deleted]",
+                created=data["created_utc"],
+                flair=data["link_flair_css_class"],
+                subreddit=data["subreddit"]
+            )
+            self.posts[post.id] = post
+        self.lookups.update(cycle.deleted)
+
+    def _listing(self, ids: list[str]) -> Iterator[SimpleNamespace]:
+        return iter([self.posts[i] for i in ids if i in self.posts])
+
+    def retrieve_new_posts(self, *, before=None):
+        self._call("GET /r/{name}/new")
+        return self._listing(self.cycle.new if self.cycle else [])
+
+    def search_recent_posts(self):
+        self._call("GET /r/{name}/search")
+        return self._listing(self.cycle.search if self.cycle else [])
+
+    def is_post_deleted(self, post_id: str) -> bool:
+        self._call("GET /comments/{id}")
+        if post_id in self.deleted:
+            return True
+        return self.lookups.get(post_id, post_id not in self.posts)
+
+
+@dataclass
+class Report:
+    cycles: int = 0
+    virtual_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    posts_seen: int = 0
+    decisions: Counter = field(default_factory=Counter)
+    api_calls: Counter = field(default_factory=Counter)
+    cycle_seconds: list[float] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        timings = sorted(self.cycle_seconds) or [0.0]
+        return {
+            "cycles": self.cycles,
+            "virtual_seconds": self.virtual_seconds,
+            "wall_seconds": self.wall_seconds,
+            "speedup": self.virtual_seconds / max(self.wall_seconds, 1e-9),
+            "posts_seen": self.posts_seen,
+            "decisions": dict(self.decisions),
+            "api_calls": dict(self.api_calls),
+            "api_calls_per_cycle":
+                sum(self.api_calls.values()) / max(self.cycles, 1),
+            "cycle_seconds": {
+                "median": statistics.median(timings),
+                "p95": timings[int(0.95 * (len(timings) - 1))],
+                "max": timings[-1],
+            },
+        }
+
+
+def replay(
+    cycles: list[Cycle],
+    redis_url: str | None = None
+) -> Report:
+    clock = VirtualClock()
+    tool = ReplaySubredditTool()
+    bot = AutoBot(
+        bench_settings(),
+        new_redis(redis_url),
+        MessageBuilder(TEMPLATE_DIR),
+        reddit=tool,
+        clock=clock
+    )
+    report = Report()
+    started = time.perf_counter()
+    for cycle in cycles:
+        clock.now = cycle.t
+        tool.start(cycle)
+        begin = time.perf_counter()
+        bot.fetch_new()
+        bot.process_previous()
+        report.cycle_seconds.append(time.perf_counter() - begin)
+    report.wall_seconds = time.perf_counter() - started
+    report.cycles = len(cycles)
+    if cycles:
+        report.virtual_seconds = cycles[-1].t - cycles[0].t
+    report.posts_seen = len(tool.posts)
+    report.decisions = Counter(action for action, _ in tool.actions)
+    report.api_calls = Counter(tool.api_calls.by_endpoint)
+    return report
+
+
+def synthesize(
+    days: float,
+    *,
+    posts_per_hour: float = 8,
+    interval: int = 30,
+    seed: int = 0,
+    start: float = 1_700_000_000
+) -> Iterator[str]:
+    """A trace of `days` of traffic read every `interval` seconds, with
+    posts arriving at random at `posts_per_hour`."""
+    rng = random.Random(seed)
+    end = start + days * 86400
+    count = int(days * 24 * posts_per_hour)
+    posts = generate_posts(count, seed=seed)
+    for p in posts:
+        p.created_utc = rng.uniform(start, end)
+    posts.sort(key=lambda p: p.created_utc)
+
+    def line(t: float, call: str, **data: Any) -> str:
+        return json.dumps({"t": t, "call": call, **data})
+
+    listed = 0
+    t = start
+    while t < end:
+        while listed < len(posts) and posts[listed].created_utc <= t:
+            p = posts[listed]
+            yield line(p.created_utc, "post", post={
+                "id": p.id, "name": p.name, "title": p.title,
+                "selftext": p.selftext, "created_utc": p.created_utc,
+                "shortlink": p.shortlink, "link_flair_css_class": None,
+                "author": p.author.name, "subreddit": "nosleep",
+            })
+            listed += 1
+        # /new is read with 'before' set to the newest post, so it mostly
+        # returns what arrived since the last read
+        hour = [p for p in posts[max(0, listed - 100):listed]
+                if p.created_utc >= t - 3600]
+        new = [p.id for p in hour if p.created_utc > t - 2 * interval]
+        yield line(t, "retrieve_new_posts", before=None, result=new[::-1])
+        yield line(t, "search_recent_posts",
+                   result=[p.id for p in reversed(hour)])
+        t += interval
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay")
+    parser.add_argument("trace", nargs="?", type=Path)
+    parser.add_argument(
+        "--synthesize-days",
+        type=float,
+        help="Replay this many days of synthetic traffic instead.",
+    )
+    parser.add_argument(
+        "--write-trace",
+        type=Path,
+        help="Also write the synthetic trace here.",
+    )
+    parser.add_argument(
+        "--redis-url",
+        help="Use this Redis (it gets flushed!) instead of fakeredis.",
+    )
+    return parser
+
+
+def main() -> int:
+    parser = create_argparser()
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    if args.synthesize_days:
+        lines = list(synthesize(args.synthesize_days))
+        if args.write_trace:
+            args.write_trace.write_text("\n".join(lines) + "\n")
+    elif args.trace:
+        lines = args.trace.read_text().splitlines()
+    else:
+        parser.error("a trace or --synthesize-days is required")
+    report = replay(load_trace(lines), args.redis_url)
+    print(json.dumps(report.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import datetime
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from autobot.autobot import AutoBot, PostAnalyzer
+from autobot.config import Settings
+from autobot.metrics import timed
+from autobot.models import DataStore, Submission
+from autobot.util.messages.templater import MessageBuilder
+from benchmarks.fakes import (
+    FakeSubredditTool, fake_post, generate_posts, story_title
+)
+
+import fakeredis
+import redis
+
+ROOT = Path(__file__).resolve().parent.parent
+CORPUS_DIR = ROOT / "autobot" / "tests" / "files"
+TEMPLATE_DIR = ROOT / "autobot" / "util" / "messages" / "templates"
+
+
+@dataclass
+class Case:
+    """A benchmark: `setup` builds fresh state for each repetition and only
+    `op(state)` is timed. `items` is how many things one op handles, for
+    per-item figures."""
+    name: str
+    setup: Callable[[], Any]
+    op: Callable[[Any], Any]
+    items: int = 1
+    repeat: int = 20
+
+
+def new_redis(url: str | None) -> redis.Redis:
+    if url:
+        rd = redis.Redis.from_url(url, decode_responses=True)
+        rd.flushdb()
+        return rd
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def bench_settings() -> Settings:
+    return Settings.model_construct(
+        subreddit="nosleep",
+        development_mode=True
+    )
+
+
+def analyzer_cases() -> list[Case]:
+    analyzer = PostAnalyzer("flair-series")
+    corpus = [
+        fake_post(p.stem, title=f"{p.stem} [Part 1]", selftext=p.read_text())
+        for p in sorted(CORPUS_DIR.glob("*.md"))
+    ]
+    words = " ".join(p.selftext for p in corpus).split()
+    rng = random.Random(1)
+    huge = "\n\n".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(20, 200)))
+        for _ in range(3000)
+    )
+    degenerate = {
+        "huge_body": huge,
+        "one_paragraph": " ".join(words * 40),
+        "blank_lines": "\n \n" * 100_000,
+        "indented": "\t    line\n" * 50_000,
+        "trailing_spaces": "word  \n" * 100_000,
+    }
+
+    def run_all(posts):
+        for p in posts:
+            analyzer.analyze(p)
+
+    cases = [
+        Case(
+            "analyze.corpus",
+            lambda: corpus,
+            run_all,
+            items=len(corpus),
+        )
+    ]
+    for name, body in degenerate.items():
+        post = fake_post(name, title="A story [Part 1]", selftext=body)
+        cases.append(
+            Case(f"analyze.{name}", [post].copy, run_all, repeat=5)
+        )
+
+    rng = random.Random(2)
+    titles = [story_title(rng) for _ in range(10_000)]
+    nasty = [
+        "[" * 2000,
+        "(" + "a" * 10_000,
+        "[" + "] [".join("part 1" for _ in range(2000)) + "]",
+        "|" * 5000,
+    ]
+
+    def categorize(ts):
+        for t in ts:
+            analyzer.categorize_tags(t)
+
+    cases += [
+        Case("categorize_tags.titles", lambda: titles, categorize,
+             items=len(titles), repeat=5),
+        Case("categorize_tags.degenerate", lambda: nasty, categorize,
+             items=len(nasty), repeat=5),
+    ]
+    return cases
+
+
+def datastore_cases(redis_url: str | None) -> list[Case]:
+    n = 1000
+    start = datetime.datetime(2023, 11, 14, tzinfo=datetime.timezone.utc)
+    subs = [
+        Submission(
+            id=f"s{i}",
+            author=f"author{i}",
+            submitted=start + datetime.timedelta(seconds=i)
+        )
+        for i in range(n)
+    ]
+
+    def empty():
+        return DataStore(new_redis(redis_url), Submission)
+
+    def filled():
+        db = empty()
+        for s in subs:
+            db.persist(s.id, s, ttl=3600)
+        return db
+
+    def persist(db):
+        for s in subs:
+            db.persist(s.id, s, ttl=3600)
+
+    def get(db):
+        for s in subs:
+            db.get(s.id)
+
+    def get_many(db):
+        list(db.get_many([s.id for s in subs]))
+
+    return [
+        Case("datastore.persist", empty, persist, items=n, repeat=5),
+        Case("datastore.get", filled, get, items=n, repeat=5),
+        Case("datastore.get_many", filled, get_many, items=n, repeat=5),
+    ]
+
+
+def template_cases() -> list[Case]:
+    mb = MessageBuilder(TEMPLATE_DIR)
+    link = "https://redd.it/abc"
+    modmail = "https://www.reddit.com/message/compose?to=%2Fr%2Fnosleep"
+
+    def render(_):
+        for _ in range(100):
+            mb.create_approval_msg(link)
+            mb.create_title_approval_msg(link)
+            mb.create_post_a_day_msg(link, "1 hours", modmail)
+            mb.create_deleted_post_msg(
+                link,
+                modmail_link=modmail,
+                reapproval_modmail=modmail,
+                has_nsfw_title=True,
+                invalid_tags="[bad]"
+            )
+            mb.create_series_msg(link)
+            mb.create_series_comment(link)
+
+    return [Case("templates.render", lambda: None, render, items=600)]
+
+
+def metrics_cases() -> list[Case]:
+    @timed("benchmark")
+    def noop() -> None:
+        pass
+
+    def calls(_):
+        for _ in range(20000):
+            noop()
+
+    # per_item is the cost of one instrumented call
+    return [Case("metrics.timed_call", lambda: None, calls, items=20000)]
+
+
+def startup_cases() -> list[Case]:
+    cmd = [sys.executable, "-c", "import run_bot"]
+
+    def compiled():
+        # so bytecode is written before anything is timed
+        subprocess.run(cmd, cwd=ROOT, check=True)
+
+    def start(_):
+        subprocess.run(cmd, cwd=ROOT, check=True)
+
+    # a fresh interpreter importing run_bot, interpreter startup included
+    return [Case("startup.import", compiled, start, repeat=5)]
+
+
+def cycle_cases(redis_url: str | None) -> list[Case]:
+    cases = []
+    for n in (10, 100, 1000):
+        def setup(n=n):
+            # /new only returns the latest 100, so bigger cycles are
+            # several pages' worth of posts processed in one go
+            tool = FakeSubredditTool(generate_posts(n, seed=n))
+            tool.retrieve_new_posts = (
+                lambda *, before=None, t=tool: iter(t._newest_first())
+            )
+            return AutoBot(
+                bench_settings(),
+                new_redis(redis_url),
+                MessageBuilder(TEMPLATE_DIR),
+                reddit=tool
+            )
+
+        def cycle(bot):
+            bot.fetch_new()
+            bot.process_previous()
+
+        cases.append(
+            Case(f"cycle.{n}", setup, cycle, items=n,
+                 repeat=3 if n == 1000 else 10)
+        )
+    return cases
+
+
+def all_cases(redis_url: str | None = None) -> list[Case]:
+    return (
+        analyzer_cases()
+        + datastore_cases(redis_url)
+        + template_cases()
+        + metrics_cases()
+        + startup_cases()
+        + cycle_cases(redis_url)
+    )
+
+
+def time_case(case: Case, repeat: int | None = None) -> list[float]:
+    """One run of a benchmark: the timings of its repetitions."""
+    timings = []
+    for _ in range(repeat or case.repeat):
+        state = case.setup()
+        start = time.perf_counter()
+        case.op(state)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(case: Case, runs: list[list[float]]) -> dict[str, float]:
+    """Sums up several runs of a benchmark. `median` is the median of the
+    runs' medians, and `mad` the median absolute deviation of all their
+    timings from it, which is how noisy the benchmark is."""
+    timings = [t for run in runs for t in run]
+    median = statistics.median(statistics.median(run) for run in runs)
+    return {
+        "median": median,
+        "mad": statistics.median(abs(t - median) for t in timings),
+        "min": min(timings),
+        "max": max(timings),
+        "repeat": len(timings),
+        "runs": len(runs),
+        "items": case.items,
+        "per_item": median / case.items,
+    }
+
+
+def run_case(
+    case: Case,
+    repeat: int | None = None,
+    runs: int = 1
+) -> dict[str, float]:
+    return summarize(case, [time_case(case, repeat) for _ in range(runs)])
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float = 0.1,
+    noise: float = 3.0
+) -> list[tuple[str, float, float, float]]:
+    """Benchmarks whose median is more than `tolerance` slower than the
+    baseline and slower by more than `noise` times the two results' MADs
+    together, so a benchmark only fails for a slowdown its own jitter
+    doesn't explain. Returned as (name, baseline, current, ratio)."""
+    regressions = []
+    for name, r in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before = baseline[name]["median"]
+        ratio = r["median"] / before if before else float("inf")
+        spread = baseline[name].get("mad", 0.0) + r.get("mad", 0.0)
+        if (
+            ratio > 1 + tolerance
+            and r["median"] - before > noise * spread
+        ):
+            regressions.append((name, before, r["median"], ratio))
+    return regressions
@@ -1,28 +1,55 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import PurePath
 from typing import ClassVar, Sequence
 
+import contextvars
 import dataclasses
 import datetime
-import random
-import re
+import threading
 import time
 
 from autobot.config import Settings
+from autobot.leader import Lease
+from autobot.models import PostVolume
+from autobot.util.client import make_reddit, user_is_moderator
+from autobot.util.messages.templater import template_lookup
+from autobot.util.requestor import ApiCalls, IdleGate
+from moderation.cache import SummaryCache, Tally
+from moderation.checkpoint import ModeratorDelivery, WeeklyRunStore
+from moderation.commands import (
+    ActivityCommand, Command, CommandError, PostsCommand, parse_command
+)
+from moderation.delivery import (
+    Delivery, DeliveryBatch, DeliveryQueue, TokenBucket
+)
+from moderation.inbox import InboxCursor
+from moderation.ledger import FILTER_MAX_MODERATORS, ModLogLedger
+from moderation.metrics import (
+    current_job, inbox_messages, inbox_sweep_duration, job_context,
+    observe_pages, summary_duration
+)
+from moderation.roster import ModeratorRoster
+from moderation.scheduler import Every, Job, Scheduler, Weekly
 
-from mako.lookup import TemplateLookup
-from praw.exceptions import RedditAPIException
-from praw.models import Redditor
+from praw.models import Message, Redditor
+from prometheus_client import Counter
 
 import praw
 import redis
-import schedule
 import structlog
 
 
+summary_cache_counter = Counter(
+    "report_summary_cache",
+    "Activity summary cache lookups",
+    ["layer", "result"]
+)
+
+
 @dataclass
 class ModActivity:
     moderator: str
@@ -39,32 +66,109 @@ class ReportService:
     exempt_mods: ClassVar[Sequence[str]] = ("nosleepautobot", "automoderator")
     actions: ClassVar[Sequence[str]] = ('approvelink', 'removelink', 'approvecomment', 'removecomment')
     individual_template: ClassVar[str] = "individual_mod_activity_report.md.template"
+    activity_template: ClassVar[str] = "activity_report.md.template"
+    posts_template: ClassVar[str] = "post_report.md.template"
+    invalid_template: ClassVar[str] = "invalid_command.md.template"
     per_user_retries: ClassVar[int] = 10
 
     def __init__(
         self,
         config: Settings,
         template_dir: PurePath,
-        logger: structlog.BoundLogger
+        logger: structlog.BoundLogger,
+        rd: redis.Redis | None = None,
+        *,
+        reddit: praw.Reddit | None = None,
+        api_calls: ApiCalls | None = None,
+        gate: IdleGate | None = None
     ) -> None:
-        self.redis = redis.from_url(config.redis_url, decode_responses=True)
-        self.reddit = praw.Reddit(
-            user_agent=config.user_agent,
-            client_id=config.client_id,
-            client_secret=config.client_secret,
-            username=config.reddit_username,
-            password=config.reddit_password
+        self.redis = rd or redis.from_url(
+            config.redis_url, decode_responses=True
+        )
+        # the combined runtime passes in the bot's client, so both share
+        # one connection pool and rate limit budget
+        self.api_calls = api_calls or ApiCalls("report")
+        self.reddit = reddit or make_reddit(
+            config, self.api_calls, self.redis
+        )
+        # praw clients can't be shared between threads, so each report
+        # worker reads the mod log through one of its own, counted and
+        # gated like the main one; the OAuth token comes from Redis
+        self.worker_client: Callable[[], praw.Reddit] | None = (
+            lambda: make_reddit(config, self.api_calls, self.redis, gate=gate)
         )
+        self.local = threading.local()
 
-        self.mako = TemplateLookup([template_dir])
+        cache = config.template_cache_dir
+        self.mako = template_lookup(
+            template_dir,
+            (
+                self.individual_template,
+                self.activity_template,
+                self.posts_template,
+                self.invalid_template,
+            ),
+            module_directory=PurePath(cache, "reports") if cache else None,
+            filesystem_checks=config.development_mode
+        )
 
-        self.subreddit = self.reddit.subreddit(config.subreddit)
+        self.subreddit = self.reddit.subreddit(config.report_subreddit())
         self.log = logger
 
-        if not self.subreddit.user_is_moderator:
+        if not user_is_moderator(
+            self.reddit,
+            self.subreddit.display_name,
+            client=self.api_calls.client,
+            rd=self.redis,
+            ttl=config.moderator_check_ttl
+        ):
             raise AssertionError("User is not moderator of subreddit.")
 
-        self.moderators = list(self.subreddit.moderator())
+        self.moderators = ModeratorRoster(
+            self.subreddit.moderator,
+            ttl=config.report_roster_ttl
+        )
+        self.inbox_cursor = InboxCursor(
+            self.redis,
+            self.subreddit.display_name
+        )
+        self.inbox_page_size = config.report_inbox_page_size
+        # newest item of an unread backlog being worked off a page per
+        # sweep; the cursor only moves to it once the backlog is gone
+        self.inbox_backlog: Message | None = None
+        self.workers = config.report_workers
+        self.bucket = TokenBucket(
+            config.report_pm_rate,
+            config.report_pm_burst
+        )
+        # with leader election, only the instance holding this lease runs
+        # the report jobs and sends PMs; its own lease, since the bot's
+        # leader and the report service's may be different processes
+        self.lease = Lease(
+            self.redis,
+            f"reportservice.{self.subreddit.display_name}",
+            ttl=config.leader_lease_ttl
+        ) if config.leader_election else None
+        self.leading = False
+        self.delivery = DeliveryQueue(
+            self.bucket,
+            logger,
+            max_attempts=self.per_user_retries,
+            fence=self.lease.check if self.lease else None
+        )
+        self.runs = WeeklyRunStore(self.redis, self.subreddit.display_name)
+        self.volume = PostVolume(self.redis, self.subreddit.display_name)
+        self.scheduler = Scheduler(logger, api_calls=self.api_calls)
+        self.inbox_poll = config.report_inbox_poll
+        self.job_jitter = config.report_job_jitter
+        self.missed_run_policy = config.report_missed_run_policy
+        self.summaries = SummaryCache(
+            self.redis,
+            self.subreddit.display_name,
+            bucket=config.report_summary_bucket,
+            prefix_ttl=config.report_summary_ttl
+        )
+        self.active_runs: set[str] = set()
 
     def get_ts(self) -> tuple[datetime.datetime, datetime.datetime]:
         """Convenience method that returns UTC dates for beginning
@@ -78,143 +182,648 @@ class ReportService:
         )
         return (month_start, today)
 
-    def _handle_rate_limit(self, ex: RedditAPIException) -> None:
-        units = {
-            "second": 1,
-            "seconds": 1,
-            "minute": 60,
-            "minutes": 60,
-            "hour": 3600,
-            "hours": 3600
-        }
-        m = re.search(
-                r"(?P<number>[0-9]+) (?P<unit>\w+)s? before trying.*\.$",
-                ex.message,
-                re.IGNORECASE
+    def _start_worker(self) -> None:
+        if self.worker_client:
+            self.local.subreddit = self.worker_client().subreddit(
+                self.subreddit.display_name
             )
-        if not m:
-            self.log.error(
-                "Unable to parse rate limit message",
-                msg=ex.message
-            )
-            return
-
-        self.log.info("Rate limit found", limit=m)
-        delay = int(m["number"]) * units[m["unit"]]
-        # sleep with jitter - reddit has multiple rate limits in place
-        # for the API calls that surround report generation, so there
-        # may be subsequent rate limits after the first one
-        time.sleep(delay + random.randint(2, 100))
 
-    def summarize_and_send(self, moderator: Redditor, msg_title: str) -> None:
+    def summarize(self, moderator: Redditor) -> str:
+        """Renders the activity report for a single moderator."""
         template = self.mako.get_template(self.individual_template)
-        for _ in range(self.per_user_retries):
-            try:
-                activity = self.generate_summary(moderator.name)
-                message = template.render(**dataclasses.asdict(activity))
-                moderator.message(subject=msg_title, message=message)
-                break
-            except RedditAPIException as e:
-                self.log.error("Received exception", ex=e)
-                rate_limited = False
-                for subex in e.items:
-                    if subex.error_type == "RATELIMIT":
-                        rate_limited = True
-                        self._handle_rate_limit(e)
-                if not rate_limited:
-                    break
-
-    def gen_all_reports(self) -> None:
-        self.log.info("ReportService preparing to generate all reports.")
-        for mod in self.moderators:
-            if mod.name.lower() in self.exempt_mods:
-                continue
-
-            self.summarize_and_send(
-                mod,
-                f"r/{self.subreddit.display_name} moderation minimum activity reminder"
-            )
+        activity = self.generate_summary(moderator.name)
+        return template.render(**dataclasses.asdict(activity))
 
-    def generate_summary(self, moderator: str) -> ModActivity:
-        self.log.info(f"Generating mod report for {moderator}.")
+    def gen_all_reports(
+        self,
+        on_finished: Callable[[list[Delivery]], None] | None = None,
+        *,
+        moderators: Sequence[Redditor] | None = None,
+        on_update: Callable[[Delivery], None] | None = None
+    ) -> None:
+        """Generates every moderator's report (or just `moderators`') on a
+        bounded thread pool and hands each one to the delivery queue as soon
+        as it's ready. `on_update` is called when a PM is queued and again
+        when it completes; `on_finished` fires once every PM has been
+        delivered or given up on.
 
-        start, now = self.get_ts()
-        start_ts = int(start.timestamp())
+        Each worker has a praw client of its own, so their mod log reads
+        run side by side."""
+        self.log.info("ReportService preparing to generate all reports.")
+        title = (
+            f"r/{self.subreddit.display_name} "
+            "moderation minimum activity reminder"
+        )
+        batch = DeliveryBatch(on_finished or (lambda _: None))
+        mods = [
+            m for m in (self.moderators if moderators is None else moderators)
+            if m.name.lower() not in self.exempt_mods
+        ]
+        with ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="report",
+            initializer=self._start_worker
+        ) as pool:
+            # copy the context so summaries are labeled with this job
+            futures = [
+                (m, pool.submit(contextvars.copy_context().run,
+                                self.summarize, m))
+                for m in mods
+            ]
+            for mod, fut in futures:
+                try:
+                    message = fut.result()
+                except Exception:
+                    self.log.exception(
+                        "Unable to generate report",
+                        moderator=mod.name
+                    )
+                    continue
+                d = Delivery(mod, title, message, "weekly", on_update)
+                if on_update:
+                    on_update(d)
+                self.delivery.submit(batch.add(d))
+        batch.close()
 
-        action_days = set()
-        action_counts: dict[str, int] = defaultdict(int)
+    def _tally(
+        self,
+        moderator: str,
+        since: int,
+        until: int,
+        split: int | None = None
+    ) -> tuple[Tally, Tally]:
+        """Counts a moderator's actions in (since, until]. The mod log is
+        newest first, so iteration stops as soon as it passes `since`.
+        Actions at or before `split` go in the first tally, later ones in
+        the second."""
+        closed, current = Tally(), Tally()
+        # a report worker's own client, if this runs on one
+        subreddit = getattr(self.local, "subreddit", self.subreddit)
         for action in self.actions:
-            mod_actions = self.subreddit.mod.log(
+            mod_actions = subreddit.mod.log(
                 action=action,
                 mod=moderator,
                 limit=500
             )
+            read = 0
             for a in mod_actions:
-                if a.created_utc > start_ts:
-                    action_counts[action] += 1
-                    ds = datetime.datetime.fromtimestamp(
-                            a.created_utc,
-                            tz=datetime.timezone.utc)
-                    action_days.add(ds.toordinal())
+                read += 1
+                if a.created_utc <= since:
+                    break
+                if a.created_utc > until:
+                    continue
+                t = closed if split and a.created_utc <= split else current
+                t.counts[action] += 1
+                ds = datetime.datetime.fromtimestamp(
+                        a.created_utc,
+                        tz=datetime.timezone.utc)
+                t.days.add(ds.toordinal())
+            observe_pages(read)
+        return closed, current
+
+    def _boundary(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> datetime.datetime:
+        """Where the closed (cacheable) days of a window end."""
+        _, now = self.get_ts()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return max(start, min(end, midnight))
+
+    def _uncached_since(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> datetime.datetime | None:
+        """How far back the mod log has to be read to summarize this
+        window, or None if it's entirely cached."""
+        if self.summaries.get_window(moderator, start, end):
+            return None
+        boundary = self._boundary(start, end)
+        if cached := self.summaries.get_closed(moderator, start, boundary):
+            return cached[1]
+        return start
+
+    def generate_summary(
+        self,
+        moderator: str,
+        start: datetime.datetime | None = None,
+        end: datetime.datetime | None = None,
+        ledger: ModLogLedger | None = None
+    ) -> ModActivity:
+        """Summarizes a moderator's activity between `start` and `end`
+        (the current month by default). Closed days come from the summary
+        cache when possible; only the still-open day is re-read from the
+        mod log, or from `ledger` if it covers the window."""
+        with summary_duration.labels(current_job.get()).time():
+            return self._generate_summary(moderator, start, end, ledger)
+
+    def _generate_summary(
+        self,
+        moderator: str,
+        start: datetime.datetime | None,
+        end: datetime.datetime | None,
+        ledger: ModLogLedger | None
+    ) -> ModActivity:
+        month_start, now = self.get_ts()
+        start = start or month_start
+        end = end or now
+
+        def tally_fn(
+            moderator: str,
+            since: int,
+            until: int,
+            split: int | None = None
+        ) -> tuple[Tally, Tally]:
+            if ledger and ledger.covers(since, until, moderator):
+                return ledger.tally(moderator, since, until, split)
+            return self._tally(moderator, since, until, split)
+
+        if (window := self.summaries.get_window(moderator, start, end)):
+            summary_cache_counter.labels("window", "hit").inc()
+            self.log.info(
+                "Summary cache hit",
+                moderator=moderator,
+                layer="window"
+            )
+            tally = window
+        else:
+            summary_cache_counter.labels("window", "miss").inc()
+            boundary = self._boundary(start, end)
+            prefix = self.summaries.get_closed(moderator, start, boundary)
+            if prefix:
+                summary_cache_counter.labels("prefix", "hit").inc()
+                self.log.info(
+                    "Summary cache hit",
+                    moderator=moderator,
+                    layer="prefix"
+                )
+                # days that closed since the prefix was stored extend it
+                closed, until = prefix
+                newly_closed, current = tally_fn(
+                    moderator,
+                    int(until.timestamp()),
+                    int(end.timestamp()),
+                    split=int(boundary.timestamp())
+                )
+                if until < boundary:
+                    closed += newly_closed
+                    self.summaries.put_closed(
+                        moderator, start, boundary, closed
+                    )
+            else:
+                summary_cache_counter.labels("prefix", "miss").inc()
+                self.log.info(f"Generating mod report for {moderator}.")
+                closed, current = tally_fn(
+                    moderator,
+                    int(start.timestamp()),
+                    int(end.timestamp()),
+                    split=int(boundary.timestamp())
+                )
+                self.summaries.put_closed(moderator, start, boundary, closed)
+            tally = closed + current
+            self.summaries.put_window(moderator, start, end, tally)
+
         return ModActivity(
                 moderator=moderator,
                 begin=start,
-                end=now,
-                active_days=len(action_days),
-                **action_counts)
+                end=end,
+                active_days=len(tally.days),
+                **tally.counts)
+
+    def _window(
+        self,
+        start: datetime.datetime | None,
+        end: datetime.datetime | None
+    ) -> tuple[datetime.datetime, datetime.datetime]:
+        """Turns a command's (inclusive) date range into a window, which
+        defaults to the current month."""
+        month_start, now = self.get_ts()
+        if end:
+            end = min(now, end + datetime.timedelta(days=1))
+        return (start or month_start, end or now)
+
+    def _targets(self, cmd: ActivityCommand) -> tuple[list[str], list[str]]:
+        """Resolves the moderators an activity command asks about into
+        (moderator names, invalid users)."""
+        mods = {m.name.lower(): m.name for m in self.moderators}
+        if cmd.wants_all():
+            names = [
+                n for k, n in mods.items() if k not in self.exempt_mods
+            ]
+            return names, []
+
+        names, invalid = [], []
+        for user in cmd.users:
+            if user in self.exempt_mods:
+                continue
+            if user in mods:
+                if mods[user] not in names:
+                    names.append(mods[user])
+            else:
+                invalid.append(user)
+        return names, invalid
+
+    def _ledger_for(self, cmds: Sequence[Command]) -> ModLogLedger | None:
+        """Works out the single stretch of mod log that answers every
+        uncached part of `cmds`, so it's read once per inbox sweep no
+        matter how many requests or moderators are involved. It's filtered
+        to the moderators involved when there are only a few of them."""
+        since: datetime.datetime | None = None
+        until: datetime.datetime | None = None
+        # None once every moderator's actions are needed
+        names: set[str] | None = set()
+        for cmd in cmds:
+            begin, end = self._window(cmd.start, cmd.end)
+            if isinstance(cmd, PostsCommand):
+                needed = [begin]
+                names = None
+            else:
+                uncached = {
+                    n: t for n in self._targets(cmd)[0]
+                    if (t := self._uncached_since(n, begin, end))
+                }
+                needed = list(uncached.values())
+                if names is not None:
+                    names.update(n.lower() for n in uncached)
+            if not needed:
+                continue
+            since = min([since, *needed] if since else needed)
+            until = max(until, end) if until else end
+
+        if since is None or until is None:
+            return None
+        if names is not None and len(names) > FILTER_MAX_MODERATORS:
+            names = None
+        self.log.info(
+            "Building mod log ledger for ad-hoc requests",
+            since=since.isoformat(),
+            until=until.isoformat(),
+            moderators=sorted(names) if names is not None else "all"
+        )
+        return ModLogLedger(
+            self.subreddit,
+            self.actions,
+            int(since.timestamp()),
+            int(until.timestamp()),
+            names
+        )
+
+    def answer(
+        self,
+        author: str,
+        raw: str,
+        cmd: Command | CommandError,
+        ledger: ModLogLedger | None = None
+    ) -> str:
+        """Renders the reply to a single ad-hoc request."""
+        if isinstance(cmd, CommandError):
+            template = self.mako.get_template(self.invalid_template)
+            return template.render(command=raw, reason=str(cmd))
+
+        _, now = self.get_ts()
+        begin, end = self._window(cmd.start, cmd.end)
+        if isinstance(cmd, PostsCommand):
+            since, until = int(begin.timestamp()), int(end.timestamp())
+            if not (ledger and ledger.covers(since, until)):
+                ledger = ModLogLedger(
+                    self.subreddit, self.actions, since, until
+                )
+            approved = ledger.daily("approvelink", since, until)
+            removed = ledger.daily("removelink", since, until)
+            first = begin.date()
+            last = (end - datetime.timedelta(seconds=1)).date()
+            volume = self.volume.range(first, last)
+            days = [
+                {
+                    "date": datetime.date.fromordinal(o),
+                    "volume": volume.get(datetime.date.fromordinal(o)),
+                    "approved": approved[o],
+                    "removed": removed[o],
+                }
+                for o in range(first.toordinal(), last.toordinal() + 1)
+            ]
+            template = self.mako.get_template(self.posts_template)
+            return template.render(
+                subreddit=self.subreddit.display_name,
+                begin=begin,
+                end=end,
+                generated=now,
+                days=days
+            )
+
+        if cmd.personal:
+            template = self.mako.get_template(self.individual_template)
+            activity = self.generate_summary(author, begin, end, ledger)
+            return template.render(**dataclasses.asdict(activity))
+
+        names, invalid = self._targets(cmd)
+        activities = [
+            self.generate_summary(n, begin, end, ledger) for n in names
+        ]
+        template = self.mako.get_template(self.activity_template)
+        return template.render(
+            begin=begin,
+            end=end,
+            generated=now,
+            activities=activities,
+            invalid_users=invalid
+        )
+
+    def _inbox_page(
+        self
+    ) -> tuple[list[Message], list[Message], bool, Message | None]:
+        """Reads one page of the inbox: the oldest items after the cursor,
+        or if there are none, the newest unread items. Returns (unread
+        items to handle, oldest first; unread items at or before the
+        cursor that were already handled; whether there may be more to
+        read; the item the cursor moves to once the page has been handled,
+        if it can move yet)."""
+        cursor = self.inbox_cursor.get()
+        page: list[Message] = []
+        if cursor:
+            page = list(self.reddit.inbox.all(
+                limit=self.inbox_page_size,
+                params={"before": cursor[0]}
+            ))
+        more = len(page) >= self.inbox_page_size
+        cursor_page = bool(page)
+        fresh = [m for m in page if m.new]
+        stale = []
+        if not page:
+            # nothing newer than the cursor (or no cursor yet), so check
+            # for anything left unread behind it. Everything on the page
+            # is marked read, so each sweep works off one page of a
+            # backlog, newest first
+            unread = list(self.reddit.inbox.unread(limit=self.inbox_page_size))
+            more = len(unread) >= self.inbox_page_size
+            for m in unread:
+                if cursor and m.created_utc <= cursor[1]:
+                    stale.append(m)
+                else:
+                    fresh.append(m)
+            page = fresh
+            if self.inbox_backlog:
+                page = [*page, self.inbox_backlog]
+        newest = max(page, key=lambda m: m.created_utc, default=None)
+        if more and not cursor_page:
+            # older unread items are still to come, and the cursor can't
+            # pass them until they've been answered
+            self.inbox_backlog, newest = newest, None
+        else:
+            self.inbox_backlog = None
+        fresh.sort(key=lambda m: m.created_utc)
+        return fresh, stale, more, newest
 
     def process_adhoc_requests(self) -> None:
-        mark_queue = []
-        reqs = defaultdict(list)
-        for msg in self.reddit.inbox.unread(limit=None):
+        """Answers unread "moderator activity" PMs from moderators, one
+        bounded page of the inbox at a time. The mod log data all of them
+        need is fetched once, up front."""
+        job = current_job.get()
+        started = time.perf_counter()
+        fresh, mark_queue, more, newest = self._inbox_page()
+        inbox_messages.labels(job, "stale").inc(len(mark_queue))
+        reqs: list[tuple[Message, str, Command | CommandError]] = []
+        mod_names = self.moderators.names()
+        for msg in fresh:
             if (not msg.author
-                    or msg.author.name.lower() not in self.moderators):
+                    or msg.author.name.lower() not in mod_names
+                    or msg.subject.strip().lower() != "moderator activity"):
                 self.log.info(
                     "Ignoring message",
                     author=msg.author,
                     subject=msg.subject
                 )
+                inbox_messages.labels(job, "ignored").inc()
                 mark_queue.append(msg)
+                continue
 
-            if msg.subject.strip().lower() != "moderator activity":
+            raw = next(iter(msg.body.strip().splitlines()), "")
+            try:
+                cmd: Command | CommandError = parse_command(
+                    msg.body,
+                    msg.author.name
+                )
+            except CommandError as e:
+                cmd = e
+            # several identical requests from a moderator get one answer
+            if any(
+                m.author.name.lower() == msg.author.name.lower() and c == cmd
+                for m, _, c in reqs
+            ):
+                inbox_messages.labels(job, "duplicate").inc()
                 mark_queue.append(msg)
-            else:
-                reqs[msg.author].append(msg)
+                continue
+            reqs.append((msg, raw, cmd))
 
-        # process all of a moderator's requests as a single unit
-        for mod, msgs in reqs.items():
+        ledger = self._ledger_for(
+            [c for _, _, c in reqs if not isinstance(c, CommandError)]
+        )
+        title = f"Your requested activity for r/{self.subreddit.display_name}"
+        for msg, raw, cmd in reqs:
             self.log.info(
                 "Processing ad-hoc activity request",
-                moderator=mod.name
+                moderator=msg.author.name,
+                command=raw
             )
-            self.summarize_and_send(
-                mod,
-                f"Your requested activity for r/{self.subreddit.display_name}"
+            try:
+                reply = self.answer(msg.author.name, raw, cmd, ledger)
+            except Exception:
+                self.log.exception(
+                    "Unable to answer ad-hoc request",
+                    moderator=msg.author.name,
+                    command=raw
+                )
+            else:
+                self.delivery.submit(
+                    Delivery(msg.author, title, reply, "adhoc")
+                )
+            inbox_messages.labels(job, "handled").inc()
+            mark_queue.append(msg)
+        if mark_queue:
+            # praw sends these 25 at a time
+            self.reddit.inbox.mark_read(mark_queue)
+        if newest:
+            # only now is the whole page handled; if the sweep fails
+            # before this, the same page is read again next time
+            self.inbox_cursor.advance(newest.fullname, newest.created_utc)
+        inbox_sweep_duration.labels(job).observe(
+            time.perf_counter() - started
+        )
+        if more and "adhoc" in self.scheduler.jobs:
+            self.log.info("More inbox items to read, sweeping again")
+            self.scheduler.trigger("adhoc")
+
+    def _dispatch_weekly(self, run_id: str, names: Sequence[str]) -> None:
+        """Sends the weekly report to the named moderators, checkpointing
+        each delivery in the run's Redis hash as it happens."""
+        wanted = {n.lower() for n in names}
+        mods = [m for m in self.moderators if m.name.lower() in wanted]
+        found = {m.name.lower() for m in mods}
+        for name in names:
+            if name.lower() not in found:
+                self.runs.record(
+                    run_id,
+                    name,
+                    ModeratorDelivery(
+                        status="failed",
+                        error="no longer a moderator"
+                    )
+                )
+
+        def update(d: Delivery) -> None:
+            self.runs.record(
+                run_id,
+                d.recipient.name,
+                ModeratorDelivery.from_delivery(d)
             )
-            mark_queue.extend(msgs)
-        self.reddit.inbox.mark_read(mark_queue)
+
+        def finished(deliveries: list[Delivery]) -> None:
+            _, now = self.get_ts()
+            self.runs.finish(run_id, int(now.timestamp()))
+            self.active_runs.discard(run_id)
+            self.log.info(
+                "Finished weekly activity report",
+                run_id=run_id,
+                latest_run=int(now.timestamp()),
+                delivered=sum(d.delivered for d in deliveries),
+                failed=sum(not d.delivered for d in deliveries))
+
+        self.active_runs.add(run_id)
+        self.gen_all_reports(
+            on_finished=finished,
+            moderators=mods,
+            on_update=update
+        )
+
+    def resume_weekly_report(self) -> bool:
+        """Resumes an unfinished weekly run, only sending to moderators
+        whose report hasn't been delivered yet. Returns True if there was
+        a run to resume."""
+        run_id = self.runs.current_run()
+        if not run_id or run_id in self.active_runs:
+            return False
+        if self._abandon_stale(run_id):
+            return False
+        pending = self.runs.undelivered(run_id)
+        self.log.info(
+            "Resuming weekly report run",
+            run_id=run_id,
+            pending=pending
+        )
+        self._dispatch_weekly(run_id, pending)
+        return True
+
+    def _abandon_stale(self, run_id: str) -> bool:
+        """Abandons an unfinished run from a week or more ago, which a
+        new run replaces. Returns whether it did."""
+        _, now = self.get_ts()
+        if not self.runs.is_abandoned(run_id, now):
+            return False
+        self.log.warning("Abandoning stale weekly report run", run_id=run_id)
+        self.runs.abandon(run_id)
+        return True
 
     def run_weekly_report(self) -> None:
-        key = f"reportservice.{self.subreddit.display_name}.weekly.last_run"
         month_start, now = self.get_ts()
-        last_run = self.redis.get(key)
-        if not last_run or int(last_run) < int(now.timestamp()):
-            self.log.info("Running weekly job report", last_run=last_run)
-            self.gen_all_reports()
+        last_run = self.runs.last_run()
+        current = self.runs.current_run()
+        if current and current not in self.active_runs:
+            if self._abandon_stale(current):
+                current = None
+        if current:
+            self.log.info("Weekly report run in progress", run_id=current)
+            self.resume_weekly_report()
+        elif not last_run or int(last_run) < int(now.timestamp()):
+            run_id = self.runs.new_run_id(now)
             self.log.info(
-                "Finished weekly activity report",
-                previous_run=last_run,
-                latest_run=int(now.timestamp()))
-            self.redis.set(key, int(now.timestamp()))
+                "Running weekly job report",
+                last_run=last_run,
+                run_id=run_id
+            )
+            names = [
+                m.name for m in self.moderators
+                if m.name.lower() not in self.exempt_mods
+            ]
+            self.runs.start_run(run_id, names)
+            self._dispatch_weekly(run_id, names)
         else:
             self.log.info("Skipping running weekly report", last_run=last_run)
 
+    def inbox_has_mail(self) -> bool:
+        """Cheap check for unread PMs: a single /api/v1/me call instead of
+        listing the inbox."""
+        return self.reddit.user.me(use_cache=False).inbox_count > 0
+
+    def _last_weekly_run(self) -> float | None:
+        last_run = self.runs.last_run()
+        return float(last_run) if last_run else None
+
+    def is_leader(self) -> bool:
+        """Whether this instance should run the report jobs right now.
+        Without a lease it always should. On becoming the leader it
+        resumes whatever weekly run was left unfinished; on losing the
+        lease it forgets the runs it had going, whose undelivered PMs are
+        now the new leader's."""
+        leading = self.lease.acquire() if self.lease else True
+        if leading and not self.leading:
+            self.leading = True
+            with job_context("weekly"):
+                self.resume_weekly_report()
+        elif not leading and self.leading:
+            self.leading = False
+            self.active_runs.clear()
+        return leading
+
+    def _if_leader(self, func: Callable[[], None]) -> Callable[[], None]:
+        def run() -> None:
+            if self.is_leader():
+                func()
+            else:
+                self.log.debug("Standing by", job=current_job.get())
+        return run
+
+    def add_jobs(self, interval: int = 600) -> None:
+        """Schedules the ad-hoc and weekly jobs and the inbox poll, each
+        of which only does anything on the leader."""
+        self.scheduler.add(Job(
+            "adhoc",
+            self._if_leader(self.process_adhoc_requests),
+            Every(interval),
+            jitter=self.job_jitter,
+            missed="run_once"
+        ))
+        self.scheduler.add(Job(
+            "weekly",
+            self._if_leader(self.run_weekly_report),
+            Weekly(4, "12:01"),
+            jitter=self.job_jitter,
+            missed=self.missed_run_policy,
+            grace=3600,
+            last_run=self._last_weekly_run
+        ))
+        # a standby also polls for the lease here, and takes over within
+        # report_inbox_poll seconds of the leader going away
+        self.scheduler.watch(
+            "adhoc",
+            lambda: self.is_leader() and self.inbox_has_mail(),
+            self.inbox_poll
+        )
+
     def run(self, interval: int = 600) -> None:
-        schedule.every(interval).seconds.do(self.process_adhoc_requests)
-        schedule.every().friday.at("12:01").do(self.run_weekly_report)
-
-        while True:
-            self.log.info("[report service] Running pending report jobs.")
-            schedule.run_pending()
-            self.log.info("[report service] Sleeping the report service.")
-            time.sleep(interval)
+        """Runs the report service forever. Ad-hoc requests are handled
+        every `interval` seconds, or as soon as the inbox poll notices
+        unread mail; the weekly report goes out Fridays at 12:01 UTC."""
+        if self.lease:
+            self.lease.start()
+        self.delivery.start()
+        self.is_leader()
+        self.add_jobs(interval)
+        self.log.info("[report service] Starting scheduler.")
+        try:
+            self.scheduler.run_forever()
+        finally:
+            if self.lease:
+                self.lease.stop()
@@ -3,14 +3,17 @@
 from collections import defaultdict
 import os
 import sys
-import json
 import time
 import logging
 import datetime
 import argparse
 
-import praw
-import requests
+from autobot.config import Settings
+from autobot.models import PostVolume
+from autobot.util.client import make_reddit
+from autobot.util.requestor import ApiCalls
+
+import redis
 
 USER_AGENT = 'r/nosleep moderator tools v1.0 (owner: u/SofaAssassin)'
 
@@ -52,30 +55,10 @@ Examples of this command are...
 '''
 
 def total_posts_in_range(subreddit, begin, end):
-    """A wrapper around the PushShift API to get total number of posts in a
-    particular subreddit for between `begin` and `end`. The dates are
-    inclusive.
-
-    PushShift will return a JSON doc that looks like this, with data keyed by
-    Unix timestamp (in UTC) and the number of submissions on that day.
-
-    The example input would be:
-    subreddit="nosleep"
-    begin="2019-08-01"
-    end="2019-08-02"
-    {
-        "aggs": {
-            "created_utc": [
-                {
-                    "doc_count": 153,
-                    "key": 1564617600
-                },
-                {
-                    "doc_count": 126,
-                    "key": 1564704000
-                }
-            ]
-    }
+    """Get the total number of posts in a particular subreddit between
+    `begin` and `end` (dates are inclusive) from the per-day counters
+    AutoBot keeps in Redis. This used to ask PushShift, which no longer
+    serves this data.
 
     The output is going to be a dictionary with key based on ordinal mapped
     to post count on that day, like this:
@@ -85,27 +68,9 @@ def total_posts_in_range(subreddit, begin, end):
         710000: 200
     }
     """
-
-    tf = "%Y-%m-%d"
-    d_end = end + datetime.timedelta(days=1)
-
-    params = {
-        "size": 0,
-        "aggs": "created_utc",
-        "frequency": "day",
-        "subreddit": subreddit,
-        "after": begin.strftime("%Y-%m-%d"),
-        "before": d_end.strftime("%Y-%m-%d")
-    }
-    r = requests.get("https://api.pushshift.io/reddit/submission/search",
-                     params=params)
-
-    data = json.loads(r.text)
-    counts = {}
-    for c in data["aggs"]["created_utc"]:
-        o = datetime.datetime.utcfromtimestamp(c["key"]).toordinal()
-        counts[o] = c["doc_count"]
-    return counts
+    rd = redis.Redis.from_url(os.environ['REDIS_URL'], decode_responses=True)
+    volume = PostVolume(rd, subreddit).range(begin.date(), end.date())
+    return {d.toordinal(): c['submitted'] for d, c in volume.items()}
 
 def _parser():
     parser = argparse.ArgumentParser(description='Run activity reports for users')
@@ -158,11 +123,12 @@ class ActionReporter(object):
     def __init__(self):
         self.approved_users = [u.lower() for u in os.environ['AUTOBOT_APPROVED_OPS'].strip().split(',')]
         logging.info('ActionReporter approved users: {}'.format(self.approved_users))
-        self.reddit = praw.Reddit(user_agent=USER_AGENT,
-                                  client_id=os.environ['AUTOBOT_CLIENT_ID'],
-                                  client_secret=os.environ['AUTOBOT_CLIENT_SECRET'],
-                                  username=os.environ['AUTOBOT_REDDIT_USERNAME'],
-                                  password=os.environ['AUTOBOT_REDDIT_PASSWORD'])
+        # the AUTOBOT_* variables are the bot's settings, so this shares
+        # its client setup and cached OAuth token
+        rd = redis.Redis.from_url(os.environ['REDIS_URL'], decode_responses=True)
+        self.reddit = make_reddit(Settings(user_agent=USER_AGENT),
+                                  ApiCalls('activity_tracker'),
+                                  rd)
 
         self.subreddit = self.reddit.subreddit(os.environ['AUTOBOT_SUBREDDIT'])
 
@@ -0,0 +1,134 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+import datetime
+import json
+
+import redis
+
+
+@dataclass
+class Tally:
+    """Mod action counts and the (ordinal) days they happened on."""
+    counts: Counter = field(default_factory=Counter)
+    days: set[int] = field(default_factory=set)
+
+    def __add__(self, other: "Tally") -> "Tally":
+        return Tally(self.counts + other.counts, self.days | other.days)
+
+    def as_dict(self) -> dict:
+        return {"counts": dict(self.counts), "days": sorted(self.days)}
+
+    def dumps(self) -> str:
+        return json.dumps(self.as_dict())
+
+    @classmethod
+    def loads(cls, raw: str) -> "Tally":
+        data = json.loads(raw)
+        return cls(Counter(data["counts"]), set(data["days"]))
+
+
+def _ts(d: datetime.datetime) -> int:
+    return int(d.timestamp())
+
+
+class SummaryCache:
+    """Caches moderator activity tallies in Redis at two granularities.
+
+    * window - the full tally for (moderator, window start, window end
+      bucket), so repeat requests within `bucket` seconds are free.
+    * prefix - the tally of the closed days of a window, i.e. from the
+      window start up to a midnight UTC, keyed on (moderator, window
+      start) alone. Closed days can't change, so this lives for
+      `prefix_ttl`; once another day has closed, the prefix is extended
+      by just that day rather than read again from the window start.
+    """
+
+    def __init__(
+        self,
+        rd: redis.Redis,
+        subreddit: str,
+        *,
+        bucket: int = 600,
+        prefix_ttl: int = 60 * 60 * 48
+    ) -> None:
+        self.rd = rd
+        self.prefix = f"reportservice.{subreddit}.summary"
+        self.bucket = bucket
+        self.prefix_ttl = prefix_ttl
+
+    def _window_key(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> str:
+        return (
+            f"{self.prefix}.window.{moderator.lower()}."
+            f"{_ts(start)}.{_ts(end) // self.bucket}"
+        )
+
+    def _prefix_key(
+        self,
+        moderator: str,
+        start: datetime.datetime
+    ) -> str:
+        return f"{self.prefix}.closed.{moderator.lower()}.{_ts(start)}"
+
+    def _get(self, key: str) -> Tally | None:
+        if raw := self.rd.get(key):
+            return Tally.loads(raw)
+        return None
+
+    def get_window(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> Tally | None:
+        return self._get(self._window_key(moderator, start, end))
+
+    def put_window(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        tally: Tally
+    ) -> None:
+        self.rd.set(
+            self._window_key(moderator, start, end),
+            tally.dumps(),
+            ex=self.bucket
+        )
+
+    def get_closed(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        boundary: datetime.datetime
+    ) -> tuple[Tally, datetime.datetime] | None:
+        """The cached tally of a window's closed days and where it ends,
+        which is at or before `boundary` (earlier if days have closed
+        since it was stored)."""
+        raw = self.rd.get(self._prefix_key(moderator, start))
+        if not raw:
+            return None
+        until = datetime.datetime.fromtimestamp(
+            json.loads(raw)["until"], tz=datetime.timezone.utc
+        )
+        if until > boundary:
+            return None
+        return Tally.loads(raw), until
+
+    def put_closed(
+        self,
+        moderator: str,
+        start: datetime.datetime,
+        boundary: datetime.datetime,
+        tally: Tally
+    ) -> None:
+        self.rd.set(
+            self._prefix_key(moderator, start),
+            json.dumps({"until": _ts(boundary), **tally.as_dict()}),
+            ex=self.prefix_ttl
+        )
@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+
+from moderation.delivery import Delivery
+
+from pydantic import BaseModel, field_serializer
+import redis
+
+
+class ModeratorDelivery(BaseModel):
+    """Delivery state of one moderator's report within a weekly run."""
+    status: str = "pending"
+    attempts: int = 0
+    queued: datetime | None = None
+    delivered: datetime | None = None
+    error: str | None = None
+
+    @field_serializer("queued", "delivered")
+    def serialize_ts(self, ts: datetime | None, _info):
+        return int(ts.timestamp()) if ts else None
+
+    def finished(self) -> bool:
+        return self.status in ("delivered", "failed")
+
+    @classmethod
+    def from_delivery(cls, d: Delivery) -> "ModeratorDelivery":
+        if d.delivered:
+            status = "delivered"
+        elif d.error:
+            status = "failed"
+        else:
+            status = "queued"
+        return cls(
+            status=status,
+            attempts=d.attempts,
+            queued=datetime.fromtimestamp(d.queued_at, tz=timezone.utc),
+            delivered=(
+                datetime.fromtimestamp(d.delivered_at, tz=timezone.utc)
+                if d.delivered_at else None
+            ),
+            error=d.error
+        )
+
+
+class WeeklyRunStore:
+    """Checkpoints weekly report runs in Redis.
+
+    Each run gets an ID and a hash keyed by moderator name holding that
+    moderator's ModeratorDelivery, so that a restarted service can pick up
+    a run where it left off instead of re-sending (or skipping) everyone.
+
+    Keys used, for subreddit `sub`:
+
+    * reportservice.sub.weekly.last_run - timestamp of the last finished run
+    * reportservice.sub.weekly.current_run - ID of the unfinished run,
+      expiring with the run's own keys
+    * reportservice.sub.weekly.latest_run - ID of the most recent run
+    * reportservice.sub.weekly.run.ID - per-moderator delivery states
+    * reportservice.sub.weekly.run.ID.meta - run start/finish times
+
+    A run that's been unfinished for longer than `max_age` (a week, when
+    the next one is due) is considered abandoned.
+    """
+
+    def __init__(
+        self,
+        rd: redis.Redis,
+        subreddit: str,
+        ttl: int = 60 * 60 * 24 * 30,
+        max_age: int = 60 * 60 * 24 * 7
+    ) -> None:
+        self.rd = rd
+        self.prefix = f"reportservice.{subreddit}.weekly"
+        self.ttl = ttl
+        self.max_age = max_age
+
+    @staticmethod
+    def new_run_id(now: datetime) -> str:
+        return now.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def _run_key(self, run_id: str) -> str:
+        return f"{self.prefix}.run.{run_id}"
+
+    def _meta_key(self, run_id: str) -> str:
+        return f"{self.prefix}.run.{run_id}.meta"
+
+    def last_run(self) -> str | None:
+        return self.rd.get(f"{self.prefix}.last_run")
+
+    def current_run(self) -> str | None:
+        return self.rd.get(f"{self.prefix}.current_run")
+
+    def latest_run(self) -> str | None:
+        return self.rd.get(f"{self.prefix}.latest_run")
+
+    def start_run(self, run_id: str, moderators: list[str]) -> None:
+        states = {m: ModeratorDelivery().model_dump_json() for m in moderators}
+        pipe = self.rd.pipeline()
+        if states:
+            pipe.hset(self._run_key(run_id), mapping=states)
+            pipe.expire(self._run_key(run_id), self.ttl)
+        pipe.hset(
+            self._meta_key(run_id),
+            mapping={"started": int(datetime.now(timezone.utc).timestamp())}
+        )
+        pipe.expire(self._meta_key(run_id), self.ttl)
+        pipe.set(f"{self.prefix}.current_run", run_id, ex=self.ttl)
+        pipe.set(f"{self.prefix}.latest_run", run_id)
+        pipe.execute()
+
+    def record(
+        self,
+        run_id: str,
+        moderator: str,
+        state: ModeratorDelivery
+    ) -> None:
+        self.rd.hset(
+            self._run_key(run_id),
+            moderator,
+            state.model_dump_json()
+        )
+
+    def states(self, run_id: str) -> dict[str, ModeratorDelivery]:
+        raw = self.rd.hgetall(self._run_key(run_id))
+        return {
+            m: ModeratorDelivery.model_validate_json(v)
+            for m, v in sorted(raw.items())
+        }
+
+    def meta(self, run_id: str) -> dict[str, int]:
+        raw = self.rd.hgetall(self._meta_key(run_id))
+        return {k: int(v) for k, v in raw.items()}
+
+    def is_abandoned(self, run_id: str, now: datetime) -> bool:
+        """Whether an unfinished run started more than `max_age` ago, or
+        its state has expired."""
+        started = self.meta(run_id).get("started")
+        return started is None or now.timestamp() - started > self.max_age
+
+    def abandon(self, run_id: str) -> None:
+        """Gives up on an unfinished run so a new one can start."""
+        pipe = self.rd.pipeline()
+        pipe.hset(
+            self._meta_key(run_id),
+            "abandoned",
+            int(datetime.now(timezone.utc).timestamp())
+        )
+        pipe.expire(self._meta_key(run_id), self.ttl)
+        pipe.delete(f"{self.prefix}.current_run")
+        pipe.execute()
+
+    def undelivered(self, run_id: str) -> list[str]:
+        return [m for m, s in self.states(run_id).items() if not s.finished()]
+
+    def finish(self, run_id: str, last_run: int) -> None:
+        pipe = self.rd.pipeline()
+        pipe.hset(
+            self._meta_key(run_id),
+            "finished",
+            int(datetime.now(timezone.utc).timestamp())
+        )
+        pipe.set(f"{self.prefix}.last_run", last_run)
+        pipe.delete(f"{self.prefix}.current_run")
+        pipe.execute()
+
+
+def _fmt_ts(ts: datetime | int | None) -> str:
+    if ts is None:
+        return "-"
+    if isinstance(ts, int):
+        ts = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_status(store: WeeklyRunStore, run_id: str | None = None) -> str:
+    """Human readable progress of a weekly run (the latest by default)."""
+    run_id = run_id or store.latest_run()
+    if not run_id:
+        return "No weekly report runs recorded."
+
+    states = store.states(run_id)
+    meta = store.meta(run_id)
+    counts = {"delivered": 0, "failed": 0}
+    for s in states.values():
+        if s.status in counts:
+            counts[s.status] += 1
+    in_progress = "finished" not in meta
+    lines = [
+        f"Weekly run {run_id} "
+        f"({'in progress' if in_progress else 'finished'})",
+        f"Started: {_fmt_ts(meta.get('started'))} UTC, "
+        f"finished: {_fmt_ts(meta.get('finished'))} UTC",
+        f"{counts['delivered']}/{len(states)} delivered, "
+        f"{counts['failed']} failed, "
+        f"{len(states) - sum(counts.values())} pending",
+        "",
+        f"{'moderator':<24} {'status':<10} {'attempts':>8} "
+        f"{'queued':<19} {'delivered':<19} {'wait':>7}",
+    ]
+    for mod, s in states.items():
+        wait = "-"
+        if s.queued and s.delivered:
+            wait = f"{int((s.delivered - s.queued).total_seconds())}s"
+        lines.append(
+            f"{mod:<24} {s.status:<10} {s.attempts:>8} "
+            f"{_fmt_ts(s.queued):<19} {_fmt_ts(s.delivered):<19} {wait:>7}"
+        )
+        if s.error:
+            lines.append(f"{'':<24} error: {s.error}")
+    return "\n".join(lines)
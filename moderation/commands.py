@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+
+import argparse
+import datetime
+
+
+class CommandError(Exception):
+    """Raised when a command sent by PM can't be understood."""
+    ...
+
+
+@dataclass
+class ActivityCommand:
+    """`activity [--start DATE --end DATE] [all | USER...]`"""
+    users: list[str] = field(default_factory=list)
+    start: datetime.datetime | None = None
+    end: datetime.datetime | None = None
+    # set for a bare "moderator activity" PM, which gets the sender's own
+    # monthly report like it always has
+    personal: bool = False
+
+    def wants_all(self) -> bool:
+        return bool(self.users) and self.users[0] == "all"
+
+
+@dataclass
+class PostsCommand:
+    """`posts --start DATE --end DATE`"""
+    start: datetime.datetime
+    end: datetime.datetime
+
+
+Command = ActivityCommand | PostsCommand
+
+
+class _Parser(argparse.ArgumentParser):
+    def error(self, message: str):
+        raise CommandError(message)
+
+
+def valid_date(d: str) -> datetime.datetime:
+    try:
+        return datetime.datetime.strptime(d, "%Y-%m-%d").replace(
+            tzinfo=datetime.timezone.utc
+        )
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{d} is an invalid date")
+
+
+def command_parser() -> argparse.ArgumentParser:
+    """Generates a parser for the commands that can be sent in PM."""
+    parser = _Parser(prog="", add_help=False)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    activity = subparsers.add_parser("activity", add_help=False)
+    activity.add_argument("--start", type=valid_date)
+    activity.add_argument("--end", type=valid_date)
+    activity.add_argument("users", type=str, nargs="*")
+
+    posts = subparsers.add_parser("posts", add_help=False)
+    posts.add_argument("--start", type=valid_date, required=True)
+    posts.add_argument("--end", type=valid_date, required=True)
+    return parser
+
+
+def parse_command(body: str, author: str) -> Command:
+    """Parses the first line of a "moderator activity" PM. A message that
+    doesn't start with a known command is a request for the author's own
+    activity this month."""
+    lines = body.strip().splitlines()
+    raw = lines[0].strip().lower() if lines else ""
+    words = raw.split()
+    if not words or words[0] not in ("activity", "posts"):
+        return ActivityCommand(users=[author.lower()], personal=True)
+
+    args = command_parser().parse_args(words)
+    if args.start and args.end and args.start > args.end:
+        raise CommandError("`--start` must not be after `--end`.")
+
+    if args.command == "posts":
+        return PostsCommand(args.start, args.end)
+
+    if bool(args.start) != bool(args.end):
+        raise CommandError(
+            "You must specify `--start` and `--end` together if you want "
+            "to use date ranges."
+        )
+    users = [u for arg in args.users for u in arg.split(",") if u]
+    return ActivityCommand(users or [author.lower()], args.start, args.end)
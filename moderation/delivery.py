@@ -0,0 +1,347 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+
+from autobot.leader import NotLeader
+from moderation.metrics import delivery_latency, ratelimit_sleep
+
+from praw.exceptions import RedditAPIException
+from praw.models import Redditor
+
+import structlog
+
+
+RATE_LIMIT_UNITS = {
+    "second": 1,
+    "seconds": 1,
+    "minute": 60,
+    "minutes": 60,
+    "hour": 3600,
+    "hours": 3600
+}
+
+
+def parse_rate_limit(message: str) -> int | None:
+    """Extracts the number of seconds Reddit wants us to wait from a
+    RATELIMIT message, e.g. '...Take a break for 5 minutes before trying
+    again.' Returns None if the message can't be understood."""
+    m = re.search(
+        r"(?P<number>[0-9]+) (?P<unit>\w+)s? before trying.*\.$",
+        message,
+        re.IGNORECASE
+    )
+    if not m or m["unit"].lower() not in RATE_LIMIT_UNITS:
+        return None
+    return int(m["number"]) * RATE_LIMIT_UNITS[m["unit"].lower()]
+
+
+class TokenBucket:
+    """A token bucket shared by everything that sends PMs.
+
+    Tokens refill at `rate` per second up to `capacity`. When Reddit
+    answers with a RATELIMIT the bucket is closed for the advertised delay
+    and the refill rate is halved; every successful send nudges the rate
+    back up towards the configured maximum."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        *,
+        min_rate: float | None = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.blocked_until = 0.0
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - max(self.updated, self.blocked_until))
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(now, self.updated)
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available and returns 0, otherwise
+        returns the number of seconds until one should be."""
+        with self.lock:
+            now = self.clock()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def penalize(self, delay: float) -> None:
+        """Closes the bucket for `delay` seconds and halves the rate."""
+        with self.lock:
+            now = self.clock()
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.tokens = 0.0
+            self.updated = now
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self) -> None:
+        """Additively recovers the rate after a successful send."""
+        with self.lock:
+            step = self.max_rate / 8
+            self.rate = min(self.max_rate, self.rate + step)
+
+
+@dataclass
+class Delivery:
+    """A single PM waiting to go out, plus what happened to it."""
+
+    recipient: Redditor
+    subject: str
+    message: str
+    job: str = "adhoc"
+    on_complete: Callable[["Delivery"], None] | None = None
+    attempts: int = 0
+    delivered: bool = False
+    error: str | None = None
+    queued_at: float = field(default_factory=time.time)
+    delivered_at: float | None = None
+
+
+class DeliveryBatch:
+    """Groups deliveries so that a callback fires once every one of them
+    has either been delivered or given up on."""
+
+    def __init__(self, on_finished: Callable[[list[Delivery]], None]) -> None:
+        self.on_finished = on_finished
+        self.deliveries: list[Delivery] = []
+        self.pending = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def add(self, delivery: Delivery) -> Delivery:
+        inner = delivery.on_complete
+
+        def complete(d: Delivery) -> None:
+            if inner:
+                inner(d)
+            self._done()
+
+        delivery.on_complete = complete
+        with self.lock:
+            self.deliveries.append(delivery)
+            self.pending += 1
+        return delivery
+
+    def close(self) -> None:
+        """Signals that no more deliveries will be added."""
+        with self.lock:
+            self.closed = True
+            finished = self.pending == 0
+        if finished:
+            self.on_finished(self.deliveries)
+
+    def _done(self) -> None:
+        with self.lock:
+            self.pending -= 1
+            finished = self.closed and self.pending == 0
+        if finished:
+            self.on_finished(self.deliveries)
+
+
+class DeliveryQueue:
+    """Sends PMs from a background thread, paced by a shared TokenBucket.
+
+    A rate limited delivery is put back on the queue to be retried once
+    the advertised delay has passed, so callers never sleep on Reddit's
+    behalf. If given, `fence` is called right before each send and raises
+    NotLeader when this instance may no longer send; the delivery is then
+    dropped without completing, for the new leader to pick up."""
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        logger: structlog.BoundLogger,
+        *,
+        max_attempts: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        fence: Callable[[], object] | None = None
+    ) -> None:
+        self.bucket = bucket
+        self.log = logger
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.fence = fence
+        self.heap: list[tuple[float, int, Delivery]] = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.thread: threading.Thread | None = None
+        self.stopping = False
+        self.in_flight = 0
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopping = False
+        self.thread = threading.Thread(
+            target=self._work,
+            name="pm-delivery",
+            daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def submit(self, delivery: Delivery, delay: float = 0.0) -> Delivery:
+        with self.cond:
+            due = self.clock() + delay
+            heapq.heappush(self.heap, (due, next(self.seq), delivery))
+            self.cond.notify_all()
+        return delivery
+
+    def pending(self) -> int:
+        with self.cond:
+            return len(self.heap) + self.in_flight
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Waits for the queue to drain. Returns False on timeout."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.cond:
+            while self.heap or self.in_flight:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        return False
+                self.cond.wait(remaining)
+        return True
+
+    def _next(self) -> Delivery | None:
+        with self.cond:
+            while not self.stopping:
+                if not self.heap:
+                    self.cond.wait()
+                    continue
+                wait = self.heap[0][0] - self.clock()
+                if wait <= 0:
+                    wait = self.bucket.try_acquire()
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                _, _, delivery = heapq.heappop(self.heap)
+                self.in_flight += 1
+                return delivery
+        return None
+
+    def _work(self) -> None:
+        while (delivery := self._next()) is not None:
+            try:
+                self._deliver(delivery)
+            finally:
+                with self.cond:
+                    self.in_flight -= 1
+                    self.cond.notify_all()
+
+    def _finish(self, delivery: Delivery) -> None:
+        if delivery.on_complete:
+            try:
+                delivery.on_complete(delivery)
+            except Exception:
+                self.log.exception(
+                    "Delivery callback failed",
+                    recipient=delivery.recipient.name
+                )
+
+    def _deliver(self, delivery: Delivery) -> None:
+        if self.fence:
+            try:
+                self.fence()
+            except NotLeader:
+                self.log.warning(
+                    "No longer the leader, dropping delivery",
+                    recipient=delivery.recipient.name
+                )
+                return
+        delivery.attempts += 1
+        try:
+            delivery.recipient.message(
+                subject=delivery.subject,
+                message=delivery.message
+            )
+        except RedditAPIException as e:
+            delays = [
+                parse_rate_limit(item.message or "")
+                for item in e.items
+                if item.error_type == "RATELIMIT"
+            ]
+            if not delays:
+                self.log.error(
+                    "Received exception",
+                    ex=e,
+                    recipient=delivery.recipient.name
+                )
+                delivery.error = str(e)
+                self._finish(delivery)
+                return
+
+            known = [d for d in delays if d is not None]
+            if len(known) != len(delays):
+                self.log.error(
+                    "Unable to parse rate limit message",
+                    msg=[item.message for item in e.items]
+                )
+            delay = max(known, default=60)
+            ratelimit_sleep.labels(delivery.job).observe(delay)
+            self.bucket.penalize(delay)
+            if delivery.attempts >= self.max_attempts:
+                self.log.error(
+                    "Giving up on rate limited delivery",
+                    recipient=delivery.recipient.name,
+                    attempts=delivery.attempts
+                )
+                delivery.error = "RATELIMIT"
+                self._finish(delivery)
+                return
+
+            # reddit has multiple rate limits in place for the API calls
+            # that surround report generation, so there may be subsequent
+            # rate limits after the first one - add jitter
+            retry_in = delay + random.randint(2, 100)
+            self.log.info(
+                "Rate limit found",
+                recipient=delivery.recipient.name,
+                delay=delay,
+                retry_in=retry_in
+            )
+            self.submit(delivery, retry_in)
+            return
+        except Exception as e:
+            self.log.exception(
+                "Problem delivering message",
+                recipient=delivery.recipient.name
+            )
+            delivery.error = str(e)
+            self._finish(delivery)
+            return
+
+        self.bucket.reward()
+        delivery.delivered = True
+        delivery.delivered_at = time.time()
+        delivery_latency.labels(delivery.job).observe(
+            delivery.delivered_at - delivery.queued_at
+        )
+        self._finish(delivery)
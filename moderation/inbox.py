@@ -0,0 +1,26 @@
+import json
+
+import redis
+
+
+class InboxCursor:
+    """Persisted position (fullname and creation time) of the newest inbox
+    item the report service has processed. Anything at or before it has
+    already been handled, even if it's somehow still unread."""
+
+    def __init__(self, rd: redis.Redis, subreddit: str) -> None:
+        self.rd = rd
+        self.key = f"reportservice.{subreddit}.inbox.cursor"
+
+    def get(self) -> tuple[str, float] | None:
+        if raw := self.rd.get(self.key):
+            data = json.loads(raw)
+            return data["name"], data["created"]
+        return None
+
+    def advance(self, name: str, created: float) -> None:
+        """Moves the cursor forward; never backwards."""
+        current = self.get()
+        if current and current[1] >= created:
+            return
+        self.rd.set(self.key, json.dumps({"name": name, "created": created}))
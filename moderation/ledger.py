@@ -0,0 +1,115 @@
+from collections import Counter, defaultdict
+from typing import Collection, Sequence
+
+import datetime
+import itertools
+
+from moderation.cache import Tally
+from moderation.metrics import observe_pages
+
+import praw
+
+# past this many moderators, one unfiltered read of the mod log is cheaper
+# than a filtered read per moderator
+FILTER_MAX_MODERATORS = 3
+
+
+def _ordinal(ts: float) -> int:
+    return datetime.datetime.fromtimestamp(
+        ts,
+        tz=datetime.timezone.utc
+    ).toordinal()
+
+
+class ModLogLedger:
+    """Moderators' actions of the given types in (since, until], read from
+    the subreddit's mod log once and then answered locally.
+
+    With `moderators`, the mod log is read filtered to each of them, which
+    is cheap for a handful of moderators; without, it's read unfiltered,
+    once per action type, covering everyone (e.g. for `activity all`)."""
+
+    def __init__(
+        self,
+        subreddit: praw.models.Subreddit,
+        actions: Sequence[str],
+        since: int,
+        until: int,
+        moderators: Collection[str] | None = None
+    ) -> None:
+        self.subreddit = subreddit
+        self.actions = actions
+        self.since = since
+        self.until = until
+        self.moderators = (
+            None if moderators is None else {m.lower() for m in moderators}
+        )
+        self.entries: dict[str, list[tuple[str, float]]] = defaultdict(list)
+        self.fetched = False
+
+    def fetch(self) -> int:
+        """Reads the mod log (newest first) back to `since`. Returns the
+        number of entries kept."""
+        kept = 0
+        filters = (
+            [{}] if self.moderators is None
+            else [{"mod": m} for m in sorted(self.moderators)]
+        )
+        for action, mod in itertools.product(self.actions, filters):
+            read = 0
+            for a in self.subreddit.mod.log(action=action, limit=None, **mod):
+                read += 1
+                if a.created_utc <= self.since:
+                    break
+                if a.created_utc > self.until:
+                    continue
+                self.entries[str(a.mod).lower()].append(
+                    (action, a.created_utc)
+                )
+                kept += 1
+            observe_pages(read)
+        self.fetched = True
+        return kept
+
+    def covers(
+        self,
+        since: int,
+        until: int,
+        moderator: str | None = None
+    ) -> bool:
+        """Whether the ledger has `moderator`'s actions in (since, until],
+        or everyone's if `moderator` is None."""
+        if not (self.since <= since and until <= self.until):
+            return False
+        if self.moderators is None:
+            return True
+        return moderator is not None and moderator.lower() in self.moderators
+
+    def tally(
+        self,
+        moderator: str,
+        since: int,
+        until: int,
+        split: int | None = None
+    ) -> tuple[Tally, Tally]:
+        """Same contract as ReportService._tally."""
+        if not self.fetched:
+            self.fetch()
+        closed, current = Tally(), Tally()
+        for action, ts in self.entries.get(moderator.lower(), []):
+            if since < ts <= until:
+                t = closed if split and ts <= split else current
+                t.counts[action] += 1
+                t.days.add(_ordinal(ts))
+        return closed, current
+
+    def daily(self, action: str, since: int, until: int) -> Counter:
+        """Counts of `action` across all moderators, by ordinal day."""
+        if not self.fetched:
+            self.fetch()
+        counts: Counter = Counter()
+        for entries in self.entries.values():
+            for a, ts in entries:
+                if a == action and since < ts <= until:
+                    counts[_ordinal(ts)] += 1
+        return counts
@@ -0,0 +1,72 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import math
+
+from prometheus_client import Counter, Histogram
+
+
+# Which job ("weekly", "adhoc") the current code is running on behalf of.
+# The scheduler sets this around each job; thread pools need to copy the
+# context into their workers for it to carry over.
+current_job: ContextVar[str] = ContextVar("report_job", default="none")
+
+LISTING_PAGE_SIZE = 100
+
+summary_duration = Histogram(
+    "report_generate_summary_seconds",
+    "Time taken to generate a moderator's activity summary",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+modlog_pages = Histogram(
+    "report_modlog_pages",
+    "Mod log listing pages fetched per listing read",
+    ["job"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+ratelimit_sleep = Histogram(
+    "report_ratelimit_sleep_seconds",
+    "Delays imposed by RATELIMIT responses when sending PMs",
+    ["job"],
+    buckets=(1, 10, 30, 60, 120, 300, 600, 1800, 3600)
+)
+delivery_latency = Histogram(
+    "report_pm_delivery_seconds",
+    "Time from a PM being queued to it being delivered",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+)
+inbox_sweep_duration = Histogram(
+    "report_inbox_sweep_seconds",
+    "Time taken to sweep the inbox for ad-hoc requests",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+job_api_calls = Histogram(
+    "report_job_api_calls",
+    "Reddit API requests made by each run of a job",
+    ["job"],
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+inbox_messages = Counter(
+    "report_inbox_messages",
+    "Inbox items seen by ad-hoc sweeps, by what happened to them",
+    ["job", "outcome"]
+)
+
+
+@contextmanager
+def job_context(job: str) -> Iterator[None]:
+    token = current_job.set(job)
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+def observe_pages(items_read: int) -> None:
+    """Records how many listing pages reading `items_read` items took."""
+    pages = max(1, math.ceil(items_read / LISTING_PAGE_SIZE))
+    modlog_pages.labels(current_job.get()).observe(pages)
@@ -0,0 +1,52 @@
+from collections.abc import Callable, Iterable, Iterator
+
+import threading
+import time
+
+from praw.models import Redditor
+
+
+class ModeratorRoster:
+    """A subreddit's moderators, keyed by lowercased name and reloaded with
+    `loader` once they're more than `ttl` seconds old, so that roster
+    changes are picked up without restarting the service."""
+
+    def __init__(
+        self,
+        loader: Callable[[], Iterable[Redditor]],
+        ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.loaded_at: float | None = None
+        self.mods: dict[str, Redditor] = {}
+
+    def _current(self) -> dict[str, Redditor]:
+        with self.lock:
+            now = self.clock()
+            if self.loaded_at is None or now - self.loaded_at >= self.ttl:
+                self.mods = {m.name.lower(): m for m in self.loader()}
+                self.loaded_at = now
+            return self.mods
+
+    def refresh(self) -> None:
+        with self.lock:
+            self.loaded_at = None
+
+    def names(self) -> set[str]:
+        return set(self._current())
+
+    def get(self, name: str) -> Redditor | None:
+        return self._current().get(name.lower())
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name.lower() in self._current()
+
+    def __iter__(self) -> Iterator[Redditor]:
+        return iter(list(self._current().values()))
+
+    def __len__(self) -> int:
+        return len(self._current())
@@ -0,0 +1,224 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Literal
+
+import datetime
+import random
+import threading
+import time
+
+from autobot.util.requestor import ApiCalls
+from autobot.util.scope import spending
+from moderation.metrics import job_api_calls, job_context
+
+from prometheus_client import Histogram
+
+import structlog
+
+
+scheduler_lag = Histogram(
+    "report_scheduler_lag_seconds",
+    "How late a scheduled job started compared to when it was due",
+    ["job"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 300, 600, 3600)
+)
+
+MissedRunPolicy = Literal["run_once", "skip"]
+
+
+class Every:
+    """Runs every `seconds` seconds."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    def next_after(self, ts: float) -> float:
+        return ts + self.seconds
+
+    def previous(self, ts: float) -> float | None:
+        return None
+
+
+class Weekly:
+    """Runs once a week on `weekday` (Monday is 0) at `at` ("HH:MM") UTC."""
+
+    def __init__(self, weekday: int, at: str) -> None:
+        self.weekday = weekday
+        hour, minute = at.split(":")
+        self.at = datetime.time(int(hour), int(minute))
+
+    def _occurrence(self, ts: float, weeks: int) -> datetime.datetime:
+        now = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
+        day = now.date() + datetime.timedelta(
+            days=(self.weekday - now.weekday()) + 7 * weeks
+        )
+        return datetime.datetime.combine(
+            day,
+            self.at,
+            tzinfo=datetime.timezone.utc
+        )
+
+    def next_after(self, ts: float) -> float:
+        occ = self._occurrence(ts, 0)
+        if occ.timestamp() <= ts:
+            occ = self._occurrence(ts, 1)
+        return occ.timestamp()
+
+    def previous(self, ts: float) -> float | None:
+        occ = self._occurrence(ts, 0)
+        if occ.timestamp() > ts:
+            occ = self._occurrence(ts, -1)
+        return occ.timestamp()
+
+
+Schedule = Every | Weekly
+
+
+@dataclass
+class Job:
+    """A scheduled job.
+
+    `missed` decides what happens when a job starts more than `grace`
+    seconds late (e.g. a long job ran over it) or, if `last_run` is given,
+    when the process was down over its last due time: run_once runs it a
+    single time to catch up, skip waits for the next due time."""
+    name: str
+    func: Callable[[], None]
+    schedule: Schedule
+    jitter: float = 0.0
+    missed: MissedRunPolicy = "run_once"
+    grace: float = 60.0
+    last_run: Callable[[], float | None] | None = None
+    due: float = field(default=0.0, init=False)
+
+    def plan(self, after: float) -> None:
+        self.due = self.schedule.next_after(after)
+        if self.jitter:
+            self.due += random.uniform(0, self.jitter)
+
+
+@dataclass
+class Watcher:
+    """Polls a cheap `check` every `interval` seconds and runs `job` right
+    away whenever it returns True."""
+    job: str
+    check: Callable[[], bool]
+    interval: float
+    due: float = 0.0
+
+
+class Scheduler:
+    """Runs jobs on their schedule, sleeping exactly until the next one is
+    due (or the next watcher poll) instead of waking up on a fixed tick.
+    `wake` can be called from any thread to re-evaluate immediately. If
+    `api_calls` is given, the Reddit requests each job run made are
+    logged; they're counted under the job's own scope, so calls others
+    make on a shared client don't land on it."""
+
+    def __init__(
+        self,
+        logger: structlog.BoundLogger,
+        clock: Callable[[], float] = time.time,
+        api_calls: ApiCalls | None = None
+    ) -> None:
+        self.log = logger
+        self.clock = clock
+        self.api_calls = api_calls
+        self.jobs: dict[str, Job] = {}
+        self.watchers: list[Watcher] = []
+        self.event = threading.Event()
+        self.stopped = False
+
+    def add(self, job: Job) -> Job:
+        now = self.clock()
+        job.plan(now)
+        prev = job.schedule.previous(now)
+        if job.last_run and prev is not None:
+            last = job.last_run()
+            # a job that has never run isn't considered to have missed one
+            if last is not None and last < prev and job.missed == "run_once":
+                self.log.info(
+                    "Job missed its last run, catching up",
+                    job=job.name,
+                    last_run=last,
+                    missed_due=prev
+                )
+                job.due = now
+        self.jobs[job.name] = job
+        self.wake()
+        return job
+
+    def watch(self, job: str, check: Callable[[], bool], interval: float):
+        self.watchers.append(Watcher(job, check, interval, self.clock()))
+        self.wake()
+
+    def wake(self) -> None:
+        self.event.set()
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.wake()
+
+    def trigger(self, name: str) -> None:
+        """Makes a job due right now."""
+        self.jobs[name].due = self.clock()
+        self.wake()
+
+    def _run(self, job: Job, now: float) -> None:
+        lag = max(0.0, now - job.due)
+        scheduler_lag.labels(job.name).observe(lag)
+        # plan the next run first so the job can trigger itself again
+        job.plan(now)
+        if lag > job.grace and job.missed == "skip":
+            self.log.info("Skipping missed job run", job=job.name, lag=lag)
+            return
+        self.log.info("Running scheduled job", job=job.name, lag=lag)
+        scope = f"job.{job.name}"
+        mark = self.api_calls.count(scope) if self.api_calls else 0
+        try:
+            with job_context(job.name), spending(scope):
+                job.func()
+        except Exception:
+            self.log.exception("Scheduled job failed", job=job.name)
+        if self.api_calls:
+            spent = self.api_calls.spent_since(mark, scope)
+            job_api_calls.labels(job.name).observe(spent)
+            self.log.info(
+                "Scheduled job finished",
+                job=job.name,
+                api_calls=spent,
+                ratelimit_remaining=self.api_calls.remaining
+            )
+
+    def _poll(self, watcher: Watcher, now: float) -> None:
+        watcher.due = now + watcher.interval
+        try:
+            fire = watcher.check()
+        except Exception:
+            self.log.exception("Watcher check failed", job=watcher.job)
+            return
+        if fire:
+            self.trigger(watcher.job)
+
+    def run_pending(self) -> float:
+        """Runs everything that's due and returns the time the next thing
+        will be."""
+        now = self.clock()
+        for w in self.watchers:
+            if w.due <= now:
+                self._poll(w, now)
+        for job in sorted(self.jobs.values(), key=lambda j: j.due):
+            if job.due <= self.clock():
+                self._run(job, self.clock())
+        upcoming = [j.due for j in self.jobs.values()]
+        upcoming += [w.due for w in self.watchers]
+        return min(upcoming, default=self.clock() + 3600)
+
+    def run_forever(self) -> None:
+        while not self.stopped:
+            self.event.clear()
+            next_due = self.run_pending()
+            delay = max(0.0, next_due - self.clock())
+            if delay:
+                self.log.debug("Scheduler sleeping", seconds=delay)
+                self.event.wait(delay)
@@ -1,43 +1,32 @@
 #!/usr/bin/env python3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, cast
 
 import argparse
-import logging
+import signal
 import sys
+import threading
+import time
 import traceback
 
+from autobot import STARTED
 from autobot.autobot import AutoBot
 from autobot.config import Settings
+from autobot.leader import Lease
+from autobot.logs import configure_logging, configure_structlog
+from autobot.metrics import startup_seconds
+from autobot.util.gate import IdleGate
 from autobot.util.messages.templater import MessageBuilder
 
 from prometheus_client import start_http_server
 import redis
 import structlog
 
+if TYPE_CHECKING:
+    from autobot.util.reddit_util import SubredditTool
 
-def configure_structlog() -> None:
-    procs: list[Any] = [
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.UnicodeDecoder(),
-    ]
-
-    if sys.stderr.isatty():
-        procs.append(structlog.dev.ConsoleRenderer())
-    else:
-        procs.append(structlog.processors.JSONRenderer())
-
-    structlog.configure(
-        processors=procs,
-        wrapper_class=structlog.stdlib.BoundLogger,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        cache_logger_on_first_use=True,
-    )
+ROOT = Path(__file__).resolve().parent
 
 
 def create_argparser() -> argparse.ArgumentParser:
@@ -56,9 +45,91 @@ def create_argparser() -> argparse.ArgumentParser:
         default=30,
         help="Seconds to wait between run cycles, if 'forever' is specified.",
     )
+    parser.add_argument(
+        "--profile-dir",
+        required=False,
+        help=(
+            "Enables profiling: SIGUSR1 profiles the next cycles and "
+            "results are written here and served under /profiles/ on the "
+            "metrics port. Defaults to the profile_dir setting."
+        ),
+    )
+    parser.add_argument(
+        "--profile-cycles",
+        required=False,
+        type=int,
+        default=0,
+        help="Profile this many cycles right away (needs a profile dir).",
+    )
+    parser.add_argument(
+        "--report-service",
+        required=False,
+        action="store_true",
+        help=(
+            "Also run the report service in this process. It shares the "
+            "bot's Reddit client, Redis connection and metrics port, and "
+            "only talks to Reddit while the bot is between cycles."
+        ),
+    )
+    parser.add_argument(
+        "--startup-check",
+        required=False,
+        action="store_true",
+        help=(
+            "Exit with an error if the bot is ready to moderate later "
+            "than the startup_budget setting allows, instead of logging "
+            "a warning."
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        required=False,
+        type=Path,
+        help=(
+            "Append what the bot reads from and does to Reddit to this "
+            "JSONL trace, for python -m benchmarks.replay."
+        ),
+    )
     return parser
 
 
+class SlowStartup(Exception):
+    """Raised with --startup-check when startup overran its budget."""
+    ...
+
+
+def check_startup(
+    settings: Settings,
+    log: structlog.BoundLogger,
+    *,
+    strict: bool = False
+) -> float:
+    """Records how long it took from the first autobot import to now, when
+    the bot is ready to moderate: it's about to fetch new posts or, with
+    leader election, try for the lease. Time spent as a standby doesn't
+    count. Over `startup_budget`, raises SlowStartup if `strict`, or logs
+    a warning."""
+    started = time.perf_counter() - STARTED
+    startup_seconds.set(started)
+    log.info(
+        "Startup finished",
+        seconds=started,
+        budget=settings.startup_budget
+    )
+    if started > settings.startup_budget:
+        if strict:
+            raise SlowStartup(
+                f"Startup took {started:.2f}s, over its budget of "
+                f"{settings.startup_budget}s"
+            )
+        log.warning(
+            "Startup took longer than its budget",
+            seconds=started,
+            budget=settings.startup_budget
+        )
+    return started
+
+
 def uncaught_ex_handler(ex_type, value, tb) -> None:
     log = structlog.get_logger()
     log.critical("Got an uncaught exception")
@@ -66,28 +137,95 @@ def uncaught_ex_handler(ex_type, value, tb) -> None:
     log.critical(f"{ex_type}: {value}")
 
 
+def handle_shutdown(bot: AutoBot) -> None:
+    """Stops the bot on SIGINT (what fly sends on deploys) or SIGTERM. The
+    bot finishes the post in hand and flushes its checkpoint; a second
+    signal interrupts it right away."""
+    def stop(signum, frame) -> None:
+        if bot.stopping.is_set():
+            raise KeyboardInterrupt
+        bot.stop()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+
+def warm_up(
+    settings: Settings,
+    rd: redis.Redis,
+    gate: IdleGate | None = None
+) -> tuple["SubredditTool", MessageBuilder]:
+    """Does the parts of startup that don't depend on each other at once:
+    pinging Redis, logging in to Reddit with the moderator check and
+    flair index, and importing Mako and compiling the templates. Most of
+    it is waiting on the network, so the threads overlap well. praw is
+    imported on its thread too."""
+    def reddit() -> "SubredditTool":
+        from autobot.util.reddit_util import SubredditTool
+
+        tool = SubredditTool(settings, rd, gate=gate)
+        tool.warm()
+        return tool
+
+    cache = settings.template_cache_dir
+    with ThreadPoolExecutor(3, thread_name_prefix="warm-up") as pool:
+        ping = pool.submit(rd.ping)
+        tool = pool.submit(reddit)
+        mb = pool.submit(
+            MessageBuilder,
+            ROOT / "autobot" / "util" / "messages" / "templates",
+            module_directory=Path(cache, "messages") if cache else None,
+            filesystem_checks=settings.development_mode
+        )
+        ping.result()
+        return tool.result(), mb.result()
+
+
+def start_report_service(
+    settings: Settings,
+    rd: redis.Redis,
+    bot: AutoBot
+) -> None:
+    """Runs the report service on a thread, importing and building it
+    there so it doesn't hold up the bot's first cycle. With leader
+    election on, the service holds its own lease, so of several processes
+    only one runs the report jobs."""
+    def run() -> None:
+        from moderation.activity import ReportService
+
+        svc = ReportService(
+            settings,
+            ROOT / "moderation" / "templates",
+            structlog.get_logger(),
+            rd,
+            reddit=bot.reddit.reddit,
+            api_calls=bot.reddit.api_calls,
+            gate=bot.gate
+        )
+        svc.run(interval=600)
+
+    threading.Thread(target=run, name="report-service", daemon=True).start()
+
+
 def transform_and_roll_out() -> None:
+    parser = create_argparser()
+    args = parser.parse_args()
+
     settings = Settings()
 
-    configure_structlog()
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=logging.INFO,
-    )
+    configure_structlog(settings.log_sample_rates)
+    configure_logging(use_queue=settings.log_queue)
     log = structlog.get_logger()
     sys.excepthook = uncaught_ex_handler
 
-    parser = create_argparser()
-    args = parser.parse_args()
-
     rd = redis.Redis.from_url(str(settings.redis_url), decode_responses=True)
-    cd = Path(__file__).resolve().parent
-    td = cd / "autobot" / "util" / "messages" / "templates"
     log_params = {
         "development_mode": settings.development_mode,
-        "template_directory": str(td),
-        "moderating_subreddit": settings.subreddit,
+        "moderating_subreddits": settings.subreddits(),
+        "subreddit_settings": {
+            k: v.model_dump(exclude_none=True)
+            for k, v in settings.subreddit_settings.items()
+        },
         "enforcing_timelimit": settings.enforce_timelimit,
         "timelimit": settings.post_timelimit,
         "reddit_user": settings.reddit_username,
@@ -95,10 +233,56 @@ def transform_and_roll_out() -> None:
         "ignoring_older_than": settings.ignore_older_than,
     }
     log.info("Bot starting", **log_params)
-    mb = MessageBuilder(td)
 
-    start_http_server(9091)
-    AutoBot(settings, rd, mb).run(args.forever, args.interval)
+    lease = None
+    if settings.leader_election:
+        lease = Lease(
+            rd,
+            f"autobot.{settings.subreddit}",
+            ttl=settings.leader_lease_ttl
+        )
+        lease.start()
+        log.info("Leader election enabled", holder=lease.holder)
+
+    gate = IdleGate() if args.report_service else None
+    tool, mb = warm_up(settings, rd, gate)
+    bot = AutoBot(settings, rd, mb, reddit=tool, lease=lease, gate=gate)
+    handle_shutdown(bot)
+    if args.report_service:
+        start_report_service(settings, rd, bot)
+        log.info("Report service running in the bot process")
+    if args.record:
+        from autobot.util.recorder import TraceRecorder
+
+        # passes everything it doesn't record through to the tool
+        bot.reddit = cast(
+            "SubredditTool", TraceRecorder(bot.reddit, args.record)
+        )
+        log.info("Recording trace", path=str(args.record))
+    profile_dir = args.profile_dir or settings.profile_dir
+    if profile_dir:
+        from autobot.profiling import CycleProfiler, start_metrics_server
+
+        profiler = CycleProfiler(Path(profile_dir))
+        profiler.arm(args.profile_cycles)
+        signal.signal(
+            signal.SIGUSR1,
+            lambda *_: profiler.arm(settings.profile_cycles)
+        )
+        bot.profiler = profiler
+        start_metrics_server(9091, Path(profile_dir))
+        log.info("Profiling enabled", profile_dir=profile_dir)
+    else:
+        start_http_server(9091)
+
+    bot.on_started = lambda: check_startup(
+        settings, log, strict=args.startup_check
+    )
+    try:
+        bot.run(args.forever, args.interval)
+    finally:
+        if lease:
+            lease.stop()
 
 
 if __name__ == "__main__":
@@ -1,50 +1,52 @@
 from pathlib import Path
-from typing import Any
 
-import logging
+import argparse
 import sys
 
 from autobot.config import Settings
+from autobot.logs import configure_logging, configure_structlog
 from moderation.activity import ReportService
+from moderation.checkpoint import WeeklyRunStore, format_status
 
+from prometheus_client import start_http_server
+import redis
 import structlog
 
 
-def configure_structlog() -> None:
-    procs: list[Any] = [
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.UnicodeDecoder()
-    ]
-
-    if sys.stderr.isatty():
-        procs.append(structlog.dev.ConsoleRenderer())
-    else:
-        procs.append(structlog.processors.JSONRenderer())
-
-    structlog.configure(
-        processors=procs,
-        wrapper_class=structlog.stdlib.BoundLogger,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        cache_logger_on_first_use=True,
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="run_report_service.py")
+    parser.add_argument(
+        "--status",
+        nargs="?",
+        const="",
+        metavar="RUN_ID",
+        help=(
+            "Show per-moderator progress of a weekly report run (the latest "
+            "one if RUN_ID isn't given) and exit."
+        ),
     )
+    return parser
+
+
+def show_status(cfg: Settings, run_id: str) -> None:
+    rd = redis.Redis.from_url(str(cfg.redis_url), decode_responses=True)
+    runs = WeeklyRunStore(rd, cfg.report_subreddit())
+    print(format_status(runs, run_id or None))
 
 
 if __name__ == '__main__':
-    configure_structlog()
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=logging.INFO
-    )
-    log = structlog.get_logger()
+    args = create_argparser().parse_args()
+    if args.status is not None:
+        show_status(Settings(), args.status)
+        sys.exit(0)
+
     cfg = Settings()
+    configure_structlog(cfg.log_sample_rates)
+    configure_logging(use_queue=cfg.log_queue)
+    log = structlog.get_logger()
 
-    log.info("Report service starting")
+    log.info("Report service starting", metrics_port=cfg.report_metrics_port)
+    start_http_server(cfg.report_metrics_port)
 
     cd = Path(__file__).resolve().parent
     td = cd / "moderation" / "templates"